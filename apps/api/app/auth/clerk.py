@@ -125,3 +125,16 @@ async def get_optional_user(
         return None
     # If a token IS provided, validate it normally
     return await get_current_user(credentials)
+
+
+async def get_admin_user(current_user: dict = Depends(get_current_user)) -> dict:
+    """
+    Like get_current_user, but only for STATS_ADMIN_USER_IDS (any user under
+    DEV_SKIP_AUTH). Raises HTTPException(403) for other signed-in users.
+    """
+    if settings.dev_skip_auth or current_user.get("sub") in settings.stats_admin_user_ids:
+        return current_user
+    raise HTTPException(
+        status_code=403,
+        detail={"error": "forbidden", "message": "Admin access required"},
+    )
@@ -7,17 +7,119 @@ class Settings(BaseSettings):
     neo4j_uri: str = "bolt://localhost:7687"
     neo4j_username: str = "neo4j"
     neo4j_password: str
+    # Async driver pool — graph I/O no longer runs in worker threads, so this
+    # (not the default thread pool) bounds concurrent Neo4j sessions
+    neo4j_max_connection_pool_size: int = 50
+    neo4j_connection_acquisition_timeout: float = 30.0
+    # Upper bound on execute_write's managed retries (jittered backoff) for
+    # transient errors before the failure reaches the caller
+    neo4j_max_transaction_retry_time: float = 30.0
+    # How entity properties are stored: "json" (one JSON string per node) or
+    # "native" (typed node properties + amount_usd_value, indexable). Reads
+    # handle both; `python -m app.graph.migrate_properties` converts old nodes.
+    neo4j_property_storage: str = "json"
+    # Link every persisted entity to a cross-session Canonical node MERGEd on
+    # (type, normalized slug), so cross-graph lookups are index seeks
+    neo4j_canonical_entities: bool = False
+    # Group commit (app.graph.batcher): persists from concurrent requests are
+    # written together after at most neo4j_group_commit_delay_ms, or as soon
+    # as neo4j_group_commit_max_graphs are waiting
+    neo4j_group_commit: bool = False
+    neo4j_group_commit_max_graphs: int = 32
+    neo4j_group_commit_delay_ms: float = 5.0
+    # Write-behind (app.graph.journal): generated graphs go to a local SQLite
+    # journal and the response returns at once; a background replayer drains
+    # the journal into Neo4j. The path must be on a persistent volume (the
+    # image sets /data/graph-journal.sqlite3, a directory owned by its user).
+    neo4j_write_behind: bool = False
+    neo4j_journal_path: str = "graph-journal.sqlite3"
+    neo4j_journal_batch: int = 32
+    neo4j_journal_interval: float = 1.0
+    neo4j_journal_max_backoff: float = 60.0
+    # Retention sweeper (app.graph.retention) — enable on one instance only.
+    # 0 days disables a class; orphan sweeps need Supabase.
+    retention_enabled: bool = False
+    retention_interval: int = 3600
+    retention_anonymous_days: int = 7
+    # The Supabase history insert is fire-and-forget: a graph whose insert
+    # failed looks orphaned, so wait well past anyone noticing before deleting
+    retention_orphan_days: int = 30
+    retention_sessions_per_round: int = 100
+    retention_batch_rows: int = 1000
+    retention_pause: float = 1.0
+    retention_max_rounds: int = 50
+    # History-reload cache (app.graph.cache): per-worker tier in front of an
+    # optional Redis tier (graph_cache_redis_ttl = 0 keeps it in process)
+    graph_cache_local_bytes: int = 16 * 1024 * 1024
+    graph_cache_local_ttl: int = 3600
+    graph_cache_redis_ttl: int = 86400
     clerk_secret_key: str = ""
     clerk_authorized_party: str = ""
     clerk_frontend_api: str = ""
     # Dev-only: skip Clerk JWT validation. Never set in production.
     dev_skip_auth: bool = False
+    # Clerk user ids (sub) allowed to read /stats — its per-host scrape
+    # counters show which sites other users submit. Empty: nobody.
+    stats_admin_user_ids: list[str] = []
     # Supabase (Phase 3 — AUTH-03, AUTH-04)
     supabase_url: str = ""
     supabase_key: str = ""  # sb_secret_... or service_role key (server-side only, never anon)
+    # Redis backend for rate limiting and the scrape cache: "upstash" | "resp"
+    redis_backend: str = "upstash"
     # Upstash Redis (Phase 4 — RATE-01, RATE-03, AI-02)
     upstash_redis_rest_url: str = ""
     upstash_redis_rest_token: str = ""
+    # Native Redis (REDIS_BACKEND=resp), e.g. redis://localhost:6379/0
+    redis_url: str = ""
+    redis_max_connections: int = 20
+    # Hybrid rate limiting: decide clear-cut cases in process, reconcile with
+    # Redis near the quota boundary (see HybridRatelimit for the overshoot bound)
+    ratelimit_hybrid: bool = False
+    ratelimit_local_margin: int = 1
+    # Scrape cache — in-process LRU tier in front of Redis (0 bytes disables it)
+    scrape_local_cache_bytes: int = 32 * 1024 * 1024
+    scrape_local_cache_ttl: int = 300
+    # Publish force_refresh rewrites so other workers drop their local copy.
+    # Receiving needs a pub/sub capable client (not the Upstash REST client).
+    scrape_cache_invalidation: bool = False
+    # URL canonicalization for scrape cache keys (app/scraper/canonical.py)
+    scrape_tracking_params: list[str] = [
+        "utm_*", "fbclid", "gclid", "dclid", "msclkid", "yclid", "twclid", "igshid",
+        "mc_cid", "mc_eid", "_hsenc", "_hsmi", "mkt_tok", "ref_src", "ref_url", "cmpid", "s_cid",
+    ]
+    scrape_canonical_strip_www: bool = True
+    # Also cache a scrape under the page's <link rel="canonical"> (same host only)
+    scrape_follow_rel_canonical: bool = True
+    # Remember scrape_failed pages (paywall, 4xx, non-HTML) for this long
+    scrape_negative_ttl: int = 300
+    # Per-host circuit breaker: fail fast after N consecutive timeouts /
+    # connect errors, for cooldown seconds
+    scrape_breaker_threshold: int = 3
+    scrape_breaker_cooldown: int = 60
+    # Concurrent fetches per destination host; JSON overrides per host,
+    # e.g. {"coindesk.com": 2}. Requests queue up to the timeout, then 503.
+    scrape_host_concurrency: int = 4
+    scrape_host_limits: dict[str, int] = {}
+    scrape_host_queue_timeout: float = 5.0
+    # Cross-page boilerplate model: drop paragraphs seen on >= min_pages and
+    # >= ratio of a domain's scraped pages (0 min_pages disables it). Counts
+    # decay by the factor per page scraped from that domain.
+    scrape_boilerplate_min_pages: int = 5
+    scrape_boilerplate_ratio: float = 0.5
+    scrape_boilerplate_decay: float = 0.98
+    # Reuse a previous URL extraction when the scraped content's SimHash
+    # similarity is at least this (0 disables); index entries live neardup_ttl
+    neardup_threshold: float = 0.92
+    neardup_ttl: int = 7 * 86400
+    # Background ingestion of RSS/Atom feeds and sitemaps (app/ingest).
+    # Runs inside the API when ingest_enabled, or as `python -m app.ingest`.
+    ingest_enabled: bool = False
+    ingest_feeds: list[str] = []
+    ingest_interval: int = 900
+    ingest_concurrency: int = 2
+    ingest_tokens_per_hour: int = 200_000
+    ingest_max_urls_per_feed: int = 50
+    ingest_seen_ttl: int = 30 * 86400
     # Observability (Phase 5)
     sentry_dsn: str = ""
     environment: str = "development"
@@ -1,11 +1,11 @@
 from fastapi import Request
-from neo4j import Driver
+from neo4j import AsyncDriver
 from supabase import Client
 
-from app.auth.clerk import get_current_user, get_optional_user  # noqa: F401 — re-exported for routers
+from app.auth.clerk import get_admin_user, get_current_user, get_optional_user  # noqa: F401 — re-exported for routers
 
 
-def get_neo4j_driver(request: Request) -> Driver:
+def get_neo4j_driver(request: Request) -> AsyncDriver:
     """
     Returns the singleton Neo4j driver from app.state (SEC-04).
     The driver is created once in the lifespan context manager in main.py
@@ -15,12 +15,31 @@ def get_neo4j_driver(request: Request) -> Driver:
     return request.app.state.neo4j_driver
 
 
+def get_graph_writer(request: Request):
+    """Returns the group-commit GraphWriteBatcher from app.state, or None when
+    NEO4J_GROUP_COMMIT is off (each request persists on its own)."""
+    return getattr(request.app.state, "graph_writer", None)
+
+
+def get_graph_journal(request: Request):
+    """Returns the write-behind GraphJournal from app.state, or None when
+    NEO4J_WRITE_BEHIND is off (graphs are persisted before responding)."""
+    return getattr(request.app.state, "graph_journal", None)
+
+
 def get_redis_client(request: Request):
-    """Returns the singleton Upstash Redis client from app.state (RATE-01, RATE-03).
-    Returns None if Upstash Redis is not configured."""
+    """Returns the singleton Redis client from app.state (RATE-01, RATE-03) —
+    Upstash REST or RespRedis, depending on REDIS_BACKEND.
+    Returns None if Redis is not configured."""
     return getattr(request.app.state, "redis", None)
 
 
+def get_rate_limiters(request: Request):
+    """Returns the (anon, auth) rate limiters built in lifespan (RATE-01).
+    Returns None if Redis is not configured."""
+    return getattr(request.app.state, "rate_limiters", None)
+
+
 def get_supabase_client(request: Request) -> Client | None:
     """Returns the singleton Supabase client from app.state (AUTH-03, AUTH-04).
     Returns None if Supabase is not configured (dev without credentials).
@@ -35,7 +54,7 @@ def get_supabase_client(request: Request) -> Client | None:
 #   @router.post("/api/generate")
 #   async def generate(
 #       body: GenerateRequest,
-#       driver: Driver = Depends(get_neo4j_driver),
+#       driver: AsyncDriver = Depends(get_neo4j_driver),
 #       current_user: dict = Depends(get_current_user),
 #   ):
 #       user_id = current_user.get("sub")
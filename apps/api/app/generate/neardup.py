@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+SIMHASH_BITS = 64
+SHINGLE_WORDS = 3
+# Candidates read per lookup / fingerprints kept per LSH bucket
+MAX_CANDIDATES = 32
+MAX_BUCKET_SIZE = 64
+NEARDUP_FORMAT_VERSION = 1
+
+_WORD = re.compile(r"\w+")
+_stats: Counter = Counter()
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over lowercase word 3-gram shingles — texts that differ
+    only in a wrapper (bylines, footers, a few edited sentences) land a few
+    bits apart."""
+    words = _WORD.findall(text.lower())
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    # Bit strings of the shingle hashes, most significant bit first; each
+    # output bit is set when most shingles have it set (column majority).
+    rows = [
+        format(int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big"), "064b")
+        for s in shingles
+    ]
+    fingerprint = 0
+    for column in zip(*rows):
+        fingerprint = fingerprint << 1 | (column.count("1") * 2 > len(rows))
+    return fingerprint
+
+
+def similarity(a: int, b: int) -> float:
+    """1.0 for identical fingerprints, falling linearly with Hamming distance."""
+    return 1 - (a ^ b).bit_count() / SIMHASH_BITS
+
+
+def _bands(threshold: float) -> list[tuple[int, int]]:
+    """
+    (shift, width) bit ranges for LSH. Fingerprints within the threshold
+    differ in at most d bits, so with d + 1 bands at least one band is
+    identical (pigeonhole) — every true match shares a bucket.
+    """
+    max_distance = int((1 - threshold) * SIMHASH_BITS)
+    count = min(SIMHASH_BITS, max_distance + 1)
+    bands, shift = [], 0
+    for i in range(count):
+        width = SIMHASH_BITS // count + (1 if i < SIMHASH_BITS % count else 0)
+        bands.append((shift, width))
+        shift += width
+    return bands
+
+
+def _bucket_keys(fingerprint: int, threshold: float) -> list[str]:
+    return [
+        f"neardup:v{NEARDUP_FORMAT_VERSION}:b{i}:{fingerprint >> shift & ((1 << width) - 1):x}"
+        for i, (shift, width) in enumerate(_bands(threshold))
+    ]
+
+
+def _entry_key(fingerprint: int) -> str:
+    return f"neardup:v{NEARDUP_FORMAT_VERSION}:e:{fingerprint:016x}"
+
+
+@dataclass
+class NearDuplicate:
+    nodes: list[dict]
+    edges: list[dict]
+    similarity: float
+
+
+_CANDIDATES = """
+local seen, out = {}, {}
+for _, key in ipairs(KEYS) do
+    for _, member in ipairs(redis.call("SMEMBERS", key)) do
+        if not seen[member] and #out < tonumber(ARGV[1]) then
+            seen[member] = true
+            out[#out + 1] = member
+        end
+    end
+end
+return out
+"""
+
+_INDEX = """
+for _, key in ipairs(KEYS) do
+    redis.call("SADD", key, ARGV[1])
+    if redis.call("SCARD", key) > tonumber(ARGV[3]) then
+        redis.call("SPOP", key)
+    end
+    redis.call("EXPIRE", key, ARGV[2])
+end
+return 1
+"""
+
+
+def find_near_duplicate(redis, text: str) -> NearDuplicate | None:
+    """
+    Looks up a previous extraction of content similar to text (syndicated
+    copies of one press release). One EVAL reads the LSH buckets; only a
+    candidate above settings.neardup_threshold costs a second GET.
+    Returns None when disabled, on a miss, or if Redis fails.
+    """
+    threshold = settings.neardup_threshold
+    if redis is None or threshold <= 0:
+        return None
+    fingerprint = simhash(text)
+    try:
+        members = redis.eval(_CANDIDATES, _bucket_keys(fingerprint, threshold), [MAX_CANDIDATES])
+        best, best_similarity = None, threshold
+        for member in members if isinstance(members, list) else []:
+            candidate = int(member, 16)
+            score = similarity(fingerprint, candidate)
+            if score >= best_similarity:
+                best, best_similarity = candidate, score
+        if best is None:
+            _stats["misses"] += 1
+            return None
+        value = redis.get(_entry_key(best))
+        entry = json.loads(value) if value is not None else None
+        if not isinstance(entry, dict) or not isinstance(entry.get("nodes"), list):
+            _stats["misses"] += 1
+            return None
+    except Exception:
+        logger.warning("Near-duplicate lookup failed", exc_info=True)
+        return None
+    _stats["hits"] += 1
+    return NearDuplicate(nodes=entry["nodes"], edges=entry["edges"], similarity=round(best_similarity, 4))
+
+
+def index_extraction(redis, text: str, nodes: list[dict], edges: list[dict]) -> None:
+    """Stores an extraction under text's SimHash for settings.neardup_ttl."""
+    threshold = settings.neardup_threshold
+    if redis is None or threshold <= 0:
+        return
+    fingerprint = simhash(text)
+    ttl = settings.neardup_ttl
+    try:
+        redis.set(
+            _entry_key(fingerprint),
+            json.dumps({"nodes": nodes, "edges": edges, "ts": int(time.time())}, separators=(",", ":")),
+            ex=ttl,
+        )
+        redis.eval(_INDEX, _bucket_keys(fingerprint, threshold), [f"{fingerprint:016x}", ttl, MAX_BUCKET_SIZE])
+    except Exception:
+        logger.warning("Near-duplicate index update failed", exc_info=True)
+
+
+def neardup_stats() -> dict:
+    return {"hits": _stats["hits"], "misses": _stats["misses"]}
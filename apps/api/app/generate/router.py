@@ -1,13 +1,17 @@
 import asyncio
 import logging
 import time
-from fastapi import APIRouter, Depends, HTTPException, Request
-from neo4j import Driver
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from neo4j import AsyncDriver
 
-from app.dependencies import get_current_user, get_optional_user, get_neo4j_driver, get_supabase_client, get_redis_client
+from app.dependencies import (
+    get_current_user, get_optional_user, get_neo4j_driver, get_supabase_client, get_redis_client, get_rate_limiters,
+    get_graph_writer, get_graph_journal,
+)
 from app.ratelimit.limiter import check_rate_limit
 from app.generate.schemas import GenerateRequest, GenerateResponse
 from app.generate.service import run_generate_pipeline, _is_url
+from app.graph.cache import cache_graph, etag_matches, get_cached_graph, record_not_modified, stored_graph
 from app.graph.repository import get_graph_by_session
 
 logger = logging.getLogger(__name__)
@@ -20,9 +24,12 @@ async def generate(
     request: Request,
     body: GenerateRequest,
     current_user: dict | None = Depends(get_optional_user),
-    driver: Driver = Depends(get_neo4j_driver),
+    driver: AsyncDriver = Depends(get_neo4j_driver),
     supabase=Depends(get_supabase_client),
     redis=Depends(get_redis_client),
+    limiters=Depends(get_rate_limiters),
+    graph_writer=Depends(get_graph_writer),
+    graph_journal=Depends(get_graph_journal),
 ) -> GenerateResponse:
     """
     Generate a VC knowledge graph from text or URL input (AI-01, AI-02, AI-03).
@@ -41,7 +48,7 @@ async def generate(
     if not openai_key:
         # Check per-user daily rate limit (RATE-01)
         ip = request.client.host if request.client else "127.0.0.1"
-        await asyncio.to_thread(check_rate_limit, redis, user_id, ip)
+        await asyncio.to_thread(check_rate_limit, limiters, user_id, ip)
 
     result = await run_generate_pipeline(
         raw_input=body.input,
@@ -51,6 +58,8 @@ async def generate(
         redis=redis,
         openai_api_key=openai_key,
         force_refresh=body.force_refresh,
+        graph_writer=graph_writer,
+        graph_journal=graph_journal,
     )
 
     processing_ms = int((time.time() - start) * 1000)
@@ -77,16 +86,40 @@ async def generate(
 
 @router.get("/generate/session/{session_id}")
 async def get_session(
+    request: Request,
     session_id: str,
     current_user: dict = Depends(get_current_user),
-    driver: Driver = Depends(get_neo4j_driver),
-) -> dict:
-    """Retrieve a previously generated graph by session_id (FE-03: history reload)."""
+    driver: AsyncDriver = Depends(get_neo4j_driver),
+    redis=Depends(get_redis_client),
+    graph_journal=Depends(get_graph_journal),
+) -> Response:
+    """
+    Retrieve a previously generated graph by session_id (FE-03: history reload).
+    Persisted graphs never change, so the serialized response is cached
+    (app.graph.cache) and carries a content-hash ETag — a matching
+    If-None-Match is answered with 304 and no body. In write-behind mode,
+    graphs not yet replayed into Neo4j are read from the journal.
+    """
     user_id = current_user.get("sub", "")
-    graph = await asyncio.to_thread(get_graph_by_session, driver, session_id, user_id=user_id)
-    if graph is None:
+    entry = await asyncio.to_thread(get_cached_graph, redis, session_id)
+    if entry is None and graph_journal is not None:
+        pending = await asyncio.to_thread(graph_journal.get, session_id)
+        if pending is not None:
+            graph = stored_graph(pending.nodes, pending.edges)
+            entry = await asyncio.to_thread(cache_graph, redis, session_id, pending.user_id, graph)
+    if entry is None:
+        graph = await get_graph_by_session(driver, session_id, user_id=user_id)
+        if graph is not None:
+            owner = graph.pop("created_by")
+            entry = await asyncio.to_thread(cache_graph, redis, session_id, owner, graph)
+    if entry is None or not entry.readable_by(user_id):
         raise HTTPException(status_code=404, detail={
             "error": "not_found",
             "message": "Graph not found",
         })
-    return {"graph": graph, "meta": {"session_id": session_id, "token_count": 0, "source_type": "text", "processing_ms": 0}}
+    # private: per-user data; no-cache: browsers revalidate, cheaply, via ETag
+    headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        record_not_modified()
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
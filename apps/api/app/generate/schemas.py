@@ -100,6 +100,8 @@ class GenerateMeta(BaseModel):
     processing_ms: int
     cache_hit: bool = False
     cache_age_seconds: int | None = None
+    near_duplicate: bool = False        # graph reused from a syndicated copy
+    similarity: float | None = None     # SimHash similarity to that copy
 
 
 class GenerateResponse(BaseModel):
@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import sqlite3
 import time
 import uuid
 from urllib.parse import urlparse
@@ -10,13 +11,24 @@ from fastapi import HTTPException
 from app.config import settings
 from app.generate.schemas import VCKnowledgeGraph
 from app.generate.prompts import SYSTEM_PROMPT
-from app.scraper.scraper import scrape_url
+from app.scraper.canonical import same_site
+from app.scraper.scraper import ScrapeFailed, scrape_url
 from app.scraper.ssrf import validate_input_length
+from app.generate.neardup import find_near_duplicate, index_extraction
+from app.graph.cache import cache_graph, stored_graph
 from app.graph.repository import persist_graph
-from app.ratelimit.cache import get_cached_scrape, cache_scrape
+from app.ratelimit.cache import (
+    lookup_scrape, cache_scrape, acquire_refresh_lock, release_refresh_lock, record_stale_served,
+    cache_scrape_failure, get_scrape_failure, record_revalidated,
+)
 
 logger = logging.getLogger(__name__)
 
+# Cold miss while another request holds the refresh lock: poll the cache this
+# long for its result before scraping anyway.
+LOCK_WAIT_SECONDS = 5.0
+LOCK_POLL_SECONDS = 0.5
+
 # OpenAI client — module-level singleton (one instance per worker process)
 _openai_client: OpenAI | None = None
 
@@ -50,51 +62,104 @@ def _auto_title(raw_input: str) -> str:
         return (text[:60] + "...") if len(text) > 60 else text
 
 
-async def run_generate_pipeline(
-    raw_input: str,
-    driver,
-    user_id: str = "anonymous",    # AI-05: graph ownership
-    supabase=None,                  # AUTH-03/04: pass app.state.supabase or None
-    redis=None,                     # RATE-03: URL scrape cache
-    openai_api_key: str | None = None,  # BYOK: user-provided OpenAI key
-    force_refresh: bool = False,    # CONTEXT.md: bypass URL cache
-) -> dict:
+async def _fetch_url_content(url: str, redis, force_refresh: bool) -> tuple[str, bool, int | None]:
     """
-    Full generate pipeline (AI-01, AI-02, AI-03, AI-04, AI-05).
-    Now accepts user_id for graph ownership and supabase for metadata persistence.
+    URL scrape through the cache with stampede protection (RATE-03).
+    Returns (content, cache_hit, cache_age_seconds). Cache keys and locks use
+    the canonical URL (app/scraper/canonical.py), so tracking-parameter,
+    fragment and www. variants of one article share an entry.
 
-    1. Validate input length (>=200 chars) via validate_input_length()
-    2. Detect source type: URL (starts with http(s)://) or raw text
-    3. If URL: scrape via scrape_url() (includes SSRF guard from Plan 02/03)
-    4. Call GPT-4o via native structured outputs -> VCKnowledgeGraph
-    5. Persist to Neo4j via persist_graph() with session_id + user_id (AI-05)
-    6. AUTH-03: Save graph metadata to Supabase graphs table (authenticated only)
-    7. Return API response matching CONTEXT.md contract
-    """
-    start_ms = int(time.time() * 1000)
+    Fresh hits are served directly. When an entry is stale or picked for early
+    refresh, only the request holding the refresh lock re-scrapes; the others
+    serve the cached copy. A cold miss under contention waits briefly for the
+    lock holder's result instead of hitting the origin again.
 
-    session_id = str(uuid.uuid4())
+    Pages that recently failed with scrape_failed (paywall, 4xx, non-HTML) are
+    kept in a short-lived negative cache and fail again without a fetch.
 
-    cache_hit = False
-    cache_age_seconds = None
+    Refreshes (expiry and force_refresh) are conditional on the cached
+    ETag/Last-Modified; a 304 re-stores the cached text with a new timestamp
+    instead of downloading and re-extracting the page.
+    """
+    cached = await asyncio.to_thread(lookup_scrape, redis, url)
+    previous = cached  # validators for a conditional refresh
+    if force_refresh:
+        cached = None  # never served in place of a forced refresh
+    else:
+        if cached is not None and not cached.refresh:
+            return cached.text, True, cached.seconds_ago
+        if cached is None:
+            failure = await asyncio.to_thread(get_scrape_failure, redis, url)
+            if failure is not None:
+                raise HTTPException(status_code=400, detail=failure)
 
-    if _is_url(raw_input):
-        source_type = "url"
-        # RATE-03: Check URL cache before scraping (Phase 4)
+    token = await asyncio.to_thread(acquire_refresh_lock, redis, url)
+    if token is None and redis is not None:
+        if cached is not None:
+            record_stale_served()
+            return cached.text, True, cached.seconds_ago
         if not force_refresh:
-            cached_text, cache_age = await asyncio.to_thread(get_cached_scrape, redis, raw_input.strip())
-            if cached_text is not None:
-                content = cached_text
-                cache_hit = True
-                cache_age_seconds = cache_age
-        if not cache_hit:
-            content = await scrape_url(raw_input.strip())
-            await asyncio.to_thread(cache_scrape, redis, raw_input.strip(), content)
-    else:
-        source_type = "text"
-        validate_input_length(raw_input)
-        content = raw_input[:32_000]  # cap at 32k even for direct text (AI-02)
+            deadline = time.monotonic() + LOCK_WAIT_SECONDS
+            while time.monotonic() < deadline:
+                await asyncio.sleep(LOCK_POLL_SECONDS)
+                waited = await asyncio.to_thread(lookup_scrape, redis, url)
+                if waited is not None and not waited.stale:
+                    return waited.text, True, waited.seconds_ago
 
+    try:
+        started = time.monotonic()
+        try:
+            page = await scrape_url(
+                url,
+                etag=previous.etag if previous else None,
+                last_modified=previous.last_modified if previous else None,
+            )
+        except HTTPException as exc:
+            # Origin failing or blocking us — a stale copy beats an error
+            if cached is not None:
+                record_stale_served()
+                return cached.text, True, cached.seconds_ago
+            if isinstance(exc, ScrapeFailed):
+                await asyncio.to_thread(cache_scrape_failure, redis, url, exc.detail)
+            raise
+        compute_ms = int((time.monotonic() - started) * 1000)
+        if page.not_modified and previous is not None:
+            # Origin confirmed the cached copy — extend it, no re-extraction
+            await asyncio.to_thread(
+                cache_scrape, redis, url, previous.text, previous.final_url or page.final_url,
+                compute_ms=compute_ms, etag=page.etag, last_modified=page.last_modified,
+            )
+            record_revalidated()
+            return previous.text, True, 0
+        await asyncio.to_thread(
+            cache_scrape, redis, url, page.text, page.final_url,
+            invalidate=force_refresh, compute_ms=compute_ms, aliases=_cache_aliases(page),
+            etag=page.etag, last_modified=page.last_modified,
+        )
+        return page.text, False, None
+    finally:
+        if token is not None:
+            await asyncio.to_thread(release_refresh_lock, redis, url, token)
+
+
+def _cache_aliases(page) -> list[str]:
+    """Other URLs a scrape can also be cached under: the post-redirect URL and,
+    when enabled, the page's rel=canonical — only if it is on the same host,
+    so a page cannot plant its content under another site's key."""
+    aliases = [page.final_url]
+    canonical = page.canonical_url
+    if (
+        settings.scrape_follow_rel_canonical
+        and canonical
+        and canonical.startswith("https://")
+        and same_site(canonical, page.final_url)
+    ):
+        aliases.append(canonical)
+    return aliases
+
+
+async def _extract_graph(content: str, openai_api_key: str | None) -> tuple[list[dict], list[dict], int]:
+    """GPT-4o extraction (AI-01). Returns (nodes, edges, token_count) as dicts."""
     # AI-01: GPT-4o structured extraction via native structured outputs
     # BYOK: if user provides their own key, use a transient client (never stored/logged)
     byok_client = None
@@ -149,15 +214,90 @@ async def run_generate_pipeline(
     # Serialize to dicts for Neo4j persistence and response
     nodes = [node.model_dump(exclude_none=True) for node in parsed.nodes]
     edges = [edge.model_dump() for edge in parsed.edges]
+    return nodes, edges, token_count
+
+
+async def run_generate_pipeline(
+    raw_input: str,
+    driver,
+    user_id: str = "anonymous",    # AI-05: graph ownership
+    supabase=None,                  # AUTH-03/04: pass app.state.supabase or None
+    redis=None,                     # RATE-03: URL scrape cache
+    openai_api_key: str | None = None,  # BYOK: user-provided OpenAI key
+    force_refresh: bool = False,    # CONTEXT.md: bypass URL cache
+    graph_writer=None,              # GraphWriteBatcher when group commit is on
+    graph_journal=None,             # GraphJournal when write-behind is on
+) -> dict:
+    """
+    Full generate pipeline (AI-01, AI-02, AI-03, AI-04, AI-05).
+    Now accepts user_id for graph ownership and supabase for metadata persistence.
+
+    1. Validate input length (>=200 chars) via validate_input_length()
+    2. Detect source type: URL (starts with http(s)://) or raw text
+    3. If URL: scrape via scrape_url() (includes SSRF guard from Plan 02/03)
+    4. Call GPT-4o via native structured outputs -> VCKnowledgeGraph, unless a
+       near-duplicate of the scraped content was extracted before (reused)
+    5. Persist to Neo4j via persist_graph() with session_id + user_id (AI-05)
+       — or append to the write-behind journal — and warm the history-reload
+       cache with the stored graph
+    6. AUTH-03: Save graph metadata to Supabase graphs table (authenticated only)
+    7. Return API response matching CONTEXT.md contract
+    """
+    start_ms = int(time.time() * 1000)
+
+    session_id = str(uuid.uuid4())
+
+    cache_hit = False
+    cache_age_seconds = None
+
+    if _is_url(raw_input):
+        source_type = "url"
+        # RATE-03: Check URL cache before scraping (Phase 4)
+        content, cache_hit, cache_age_seconds = await _fetch_url_content(
+            raw_input.strip(), redis, force_refresh,
+        )
+    else:
+        source_type = "text"
+        validate_input_length(raw_input)
+        content = raw_input[:32_000]  # cap at 32k even for direct text (AI-02)
+
+    # Syndicated copies of an already extracted article reuse that graph
+    # instead of paying for another GPT-4o call (URL inputs only)
+    near_duplicate = None
+    if source_type == "url" and not force_refresh:
+        near_duplicate = await asyncio.to_thread(find_near_duplicate, redis, content)
+    if near_duplicate is not None:
+        nodes, edges, token_count = near_duplicate.nodes, near_duplicate.edges, 0
+    else:
+        nodes, edges, token_count = await _extract_graph(content, openai_api_key)
+        if source_type == "url":
+            await asyncio.to_thread(index_extraction, redis, content, nodes, edges)
+
+    # Write-behind: journal the graph and respond without waiting for Neo4j —
+    # the replayer persists it. Falls back to a direct write if the journal
+    # cannot be written.
+    journaled = False
+    if graph_journal is not None:
+        try:
+            await asyncio.to_thread(graph_journal.append, session_id, nodes, edges, user_id)
+            journaled = True
+        except sqlite3.Error:
+            logger.warning("Graph journal append failed — persisting directly", exc_info=True)
 
     # Persist to Neo4j with ownership (AI-05) — parameterized Cypher only (SEC-02)
-    try:
-        await asyncio.to_thread(persist_graph, driver, session_id=session_id, nodes=nodes, edges=edges, user_id=user_id)
-    except Exception:
-        raise HTTPException(status_code=503, detail={
-            "error": "service_unavailable",
-            "message": "Graph database unavailable — please try again",
-        })
+    if not journaled:
+        try:
+            if graph_writer is not None:
+                await graph_writer.persist(session_id=session_id, nodes=nodes, edges=edges, user_id=user_id)
+            else:
+                await persist_graph(driver, session_id=session_id, nodes=nodes, edges=edges, user_id=user_id)
+        except Exception:
+            raise HTTPException(status_code=503, detail={
+                "error": "service_unavailable",
+                "message": "Graph database unavailable — please try again",
+            })
+    # Warm the history-reload cache — the first reload skips Neo4j
+    await asyncio.to_thread(cache_graph, redis, session_id, user_id, stored_graph(nodes, edges))
 
     # AUTH-03: Save graph metadata to Supabase (authenticated users only)
     # Fire-and-forget — Supabase failure must never block the API response
@@ -196,5 +336,7 @@ async def run_generate_pipeline(
             "processing_ms": processing_ms,
             "cache_hit": cache_hit,
             "cache_age_seconds": cache_age_seconds,
+            "near_duplicate": near_duplicate is not None,
+            "similarity": near_duplicate.similarity if near_duplicate is not None else None,
         },
     }
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from collections import Counter
+from typing import Any
+
+from neo4j import AsyncDriver
+from neo4j.exceptions import ClientError
+
+from app.graph.repository import graph_params, persist_graphs, rejects_graph
+
+logger = logging.getLogger(__name__)
+
+
+class GraphWriteBatcher:
+    """
+    Group commit for persist_graph (per worker process). Graphs persisted by
+    concurrent requests are collected for up to `max_delay` seconds, or
+    until `max_graphs` are waiting, and written in one transaction — one
+    session and one commit instead of one per request.
+
+    Every caller awaits its own future. A batch Neo4j rejects for its data
+    or statement (rejects_graph — one graph's data) is split and its graphs
+    retried one by one, so only the offending caller fails; connection,
+    transient and security errors (already retried by execute_write, or
+    the same for every graph) fail the whole batch.
+    """
+
+    def __init__(self, driver: AsyncDriver, max_graphs: int = 32, max_delay: float = 0.005):
+        self.driver = driver
+        self.max_graphs = max_graphs
+        self.max_delay = max_delay
+        self.stats: Counter = Counter()
+        self._pending: list[tuple[dict[str, Any], asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._writes: set[asyncio.Task] = set()
+
+    async def persist(
+        self,
+        session_id: str,
+        nodes: list[dict[str, Any]],
+        edges: list[dict[str, Any]],
+        user_id: str = "anonymous",
+    ) -> None:
+        """Same contract as persist_graph — returns once the graph is committed."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((graph_params(session_id, nodes, edges, user_id), future))
+        if len(self._pending) >= self.max_graphs:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._write(batch))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+    async def _write(self, batch: list[tuple[dict[str, Any], asyncio.Future]]) -> None:
+        try:
+            await persist_graphs(self.driver, [graph for graph, _ in batch])
+        except ClientError as exc:
+            if len(batch) == 1 or not rejects_graph(exc):
+                self._settle(batch, exc)
+                return
+            self.stats["split_batches"] += 1
+            logger.warning("Group commit of %d graphs rejected — writing them one by one", len(batch))
+            await asyncio.gather(*(self._write([item]) for item in batch))
+            return
+        except Exception as exc:
+            self._settle(batch, exc)
+            return
+        self.stats["batches"] += 1
+        self.stats["graphs"] += len(batch)
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+        self._settle(batch, None)
+
+    def _settle(self, batch: list[tuple[dict[str, Any], asyncio.Future]], exc: Exception | None) -> None:
+        if exc is not None:
+            self.stats["failed_graphs"] += len(batch)
+        for _, future in batch:
+            if future.done():  # caller cancelled
+                continue
+            if exc is None:
+                future.set_result(None)
+            else:
+                future.set_exception(exc)
+
+    async def close(self) -> None:
+        """Writes whatever is still pending and waits for in-flight batches."""
+        self._flush()
+        await asyncio.gather(*self._writes, return_exceptions=True)
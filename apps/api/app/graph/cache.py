@@ -0,0 +1,142 @@
+import hashlib
+import json
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any
+
+from app.config import settings
+from app.graph.repository import SHARED_OWNERS
+from app.localcache import LocalTTLCache
+
+logger = logging.getLogger(__name__)
+
+# Bump when the cached response layout changes — old entries are never read
+GRAPH_CACHE_FORMAT_VERSION = 1
+
+# Graphs are immutable once persisted, so entries are only dropped when the
+# retention sweeper deletes a graph; the TTLs bound memory. Per worker
+# process, in front of Redis.
+_local = LocalTTLCache(
+    max_bytes=settings.graph_cache_local_bytes,
+    ttl=settings.graph_cache_local_ttl,
+)
+_stats: Counter = Counter()
+
+
+@dataclass(frozen=True)
+class CachedGraph:
+    body: bytes   # serialized GET /api/generate/session/{session_id} response
+    etag: str     # quoted content hash of body
+    owner: str    # created_by of the graph
+
+    def readable_by(self, user_id: str) -> bool:
+        """Same rule as the Cypher ownership check in get_graph_by_session."""
+        return self.owner in (user_id, *SHARED_OWNERS)
+
+
+def _key(session_id: str) -> str:
+    return f"graph:v{GRAPH_CACHE_FORMAT_VERSION}:{session_id}"
+
+
+def _entry(owner: str, body: bytes) -> CachedGraph:
+    return CachedGraph(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"', owner=owner)
+
+
+def session_response(session_id: str, graph: dict[str, list]) -> dict[str, Any]:
+    """The history-reload response for a stored graph."""
+    return {
+        "graph": graph,
+        "meta": {"session_id": session_id, "token_count": 0, "source_type": "text", "processing_ms": 0},
+    }
+
+
+def stored_graph(nodes: list[dict], edges: list[dict]) -> dict[str, list]:
+    """
+    The graph as get_graph_by_session will read it back after persist_graph:
+    nodes merged on id (later duplicates win), edges merged on
+    (source, target, relationship) and dropped when an endpoint is missing.
+    """
+    by_id = {
+        n["id"]: {"id": n["id"], "label": n["label"], "type": n["type"], "properties": n.get("properties") or {}}
+        for n in nodes
+    }
+    seen = set()
+    kept = []
+    for e in edges:
+        key = (e["source"], e["target"], e["relationship"])
+        if e["source"] in by_id and e["target"] in by_id and key not in seen:
+            seen.add(key)
+            kept.append({"source": e["source"], "target": e["target"], "relationship": e["relationship"]})
+    return {"nodes": list(by_id.values()), "edges": kept}
+
+
+def cache_graph(redis, session_id: str, owner: str, graph: dict[str, list]) -> CachedGraph:
+    """Serializes the reload response for graph once and stores it in both tiers."""
+    body = json.dumps(session_response(session_id, graph), separators=(",", ":")).encode()
+    entry = _entry(owner, body)
+    key = _key(session_id)
+    _local.set(key, entry, size=len(body))
+    if redis is not None and settings.graph_cache_redis_ttl > 0:
+        try:
+            redis.set(key, json.dumps({"o": owner, "b": body.decode()}), ex=settings.graph_cache_redis_ttl)
+        except Exception:
+            logger.warning("Graph cache write failed for %s", session_id, exc_info=True)
+    return entry
+
+
+def get_cached_graph(redis, session_id: str) -> CachedGraph | None:
+    """Looks session_id up in process, then in Redis. Ownership is the caller's check."""
+    key = _key(session_id)
+    entry = _local.get(key)
+    if entry is not None:
+        _stats["local_hits"] += 1
+        return entry
+    if redis is not None and settings.graph_cache_redis_ttl > 0:
+        try:
+            value = redis.get(key)
+            stored = json.loads(value) if value is not None else None
+        except Exception:
+            logger.warning("Graph cache read failed for %s", session_id, exc_info=True)
+            stored = None
+        if isinstance(stored, dict) and isinstance(stored.get("b"), str) and isinstance(stored.get("o"), str):
+            body = stored["b"].encode()
+            entry = _entry(stored["o"], body)
+            _local.set(key, entry, size=len(body))
+            _stats["redis_hits"] += 1
+            return entry
+    _stats["misses"] += 1
+    return None
+
+
+def forget_graphs(redis, session_ids: list[str]) -> None:
+    """Drops deleted graphs from Redis and this worker's tier; other workers'
+    in-process copies expire within settings.graph_cache_local_ttl."""
+    keys = [_key(session_id) for session_id in session_ids]
+    for key in keys:
+        _local.pop(key)
+    if redis is not None and keys:
+        try:
+            redis.delete(*keys)
+        except Exception:
+            logger.warning("Graph cache eviction failed", exc_info=True)
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """RFC 9110 weak comparison of an If-None-Match header against etag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def record_not_modified() -> None:
+    _stats["not_modified"] += 1
+
+
+def graph_cache_stats() -> dict:
+    return {
+        "local": _local.stats(),
+        **{name: _stats[name] for name in ("local_hits", "redis_hits", "misses", "not_modified")},
+    }
@@ -0,0 +1,21 @@
+import re
+import unicodedata
+
+# Legal-form suffixes that name the same entity ("Paradigm Capital, Inc." is
+# "Paradigm Capital"). Descriptive words such as "Labs" or "Capital" stay —
+# "Uniswap Labs" and "Uniswap" are different entities.
+_LEGAL_SUFFIXES = {"inc", "llc", "ltd", "limited", "corp", "corporation", "co", "gmbh", "ag", "sa", "plc"}
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def canonical_slug(name: str) -> str | None:
+    """
+    Normalized slug that Canonical nodes are MERGEd on together with the
+    entity type: ASCII-folded, lowercase, punctuation collapsed to "-",
+    trailing legal suffixes dropped. None when nothing is left.
+    """
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+    words = [w for w in _NON_ALNUM.split(ascii_name.lower()) if w]
+    while len(words) > 1 and words[-1] in _LEGAL_SUFFIXES:
+        words.pop()
+    return "-".join(words) or None
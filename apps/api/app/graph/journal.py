@@ -0,0 +1,243 @@
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any
+
+from neo4j import AsyncDriver
+from neo4j.exceptions import ClientError
+
+from app.graph.repository import graph_params, persist_graphs, rejects_graph
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS graphs (
+    session_id TEXT PRIMARY KEY,
+    user_id    TEXT NOT NULL,
+    nodes      TEXT NOT NULL,
+    edges      TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    failed     INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    claimed_by    TEXT,
+    claimed_until REAL NOT NULL DEFAULT 0
+)
+"""
+
+# Rows a replayer leases for itself: every worker process runs a replayer on
+# the shared file, and a row is written to Neo4j by whoever claimed it
+_CLAIM = """
+UPDATE graphs SET claimed_by = ?, claimed_until = ?
+WHERE session_id IN (
+    SELECT session_id FROM graphs
+    WHERE failed = 0 AND claimed_until < ?
+    ORDER BY created_at LIMIT ?
+)
+RETURNING session_id, user_id, nodes, edges, created_at
+"""
+
+
+@dataclass
+class JournalEntry:
+    session_id: str
+    user_id: str
+    nodes: list[dict[str, Any]]
+    edges: list[dict[str, Any]]
+    created_at: float
+
+
+class GraphJournal:
+    """
+    Durable local journal of graphs not yet written to Neo4j (write-behind
+    mode). SQLite in WAL mode with synchronous=FULL: append() returns once
+    the graph is on disk, so a crash or restart loses nothing that was
+    acknowledged. Worker processes on one host share the file; replayers
+    lease rows with claim() so each graph is replayed by one of them.
+
+    Methods block — call them through asyncio.to_thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(graphs)")}
+        for column in ("claimed_by TEXT", "claimed_until REAL NOT NULL DEFAULT 0"):
+            if column.split()[0] not in columns:
+                try:
+                    self._conn.execute(f"ALTER TABLE graphs ADD COLUMN {column}")
+                except sqlite3.OperationalError:
+                    pass  # added by another worker starting at the same time
+        self._lock = threading.Lock()
+
+    def append(self, session_id: str, nodes: list[dict], edges: list[dict], user_id: str) -> None:
+        """Journals a graph. Re-appending a session replaces it and drops any claim."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO graphs (session_id, user_id, nodes, edges, created_at) VALUES (?, ?, ?, ?, ?)",
+                (session_id, user_id, json.dumps(nodes), json.dumps(edges), time.time()),
+            )
+
+    def get(self, session_id: str) -> JournalEntry | None:
+        """A journaled graph, pending or failed — served to history reloads."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT session_id, user_id, nodes, edges, created_at FROM graphs WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+        return _entry(row) if row else None
+
+    def pending(self, limit: int) -> list[JournalEntry]:
+        """Oldest graphs still to be replayed."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT session_id, user_id, nodes, edges, created_at FROM graphs "
+                "WHERE failed = 0 ORDER BY created_at LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [_entry(row) for row in rows]
+
+    def claim(self, owner: str, limit: int, lease: float) -> list[JournalEntry]:
+        """
+        Leases the oldest unclaimed graphs to owner for `lease` seconds and
+        returns them. A lease that runs out (its worker died mid-replay)
+        makes the row claimable again.
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(_CLAIM, (owner, now + lease, now, limit)).fetchall()
+        return sorted((_entry(row) for row in rows), key=lambda e: e.created_at)
+
+    def release(self, session_ids: list[str], owner: str) -> None:
+        """Gives owner's leases back early, after a replay that failed."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE graphs SET claimed_by = NULL, claimed_until = 0 WHERE session_id = ? AND claimed_by = ?",
+                [(s, owner) for s in session_ids],
+            )
+
+    def remove(self, session_ids: list[str], owner: str | None = None) -> None:
+        """Deletes replayed graphs — with owner, only rows it still holds, so a
+        graph re-appended during the replay is kept."""
+        with self._lock:
+            if owner is None:
+                self._conn.executemany("DELETE FROM graphs WHERE session_id = ?", [(s,) for s in session_ids])
+            else:
+                self._conn.executemany(
+                    "DELETE FROM graphs WHERE session_id = ? AND claimed_by = ?", [(s, owner) for s in session_ids],
+                )
+
+    def mark_failed(self, session_id: str, error: str) -> None:
+        """Parks a graph Neo4j rejected; kept for inspection and reloads, never replayed."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE graphs SET failed = 1, last_error = ?, claimed_by = NULL WHERE session_id = ?",
+                (error, session_id),
+            )
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            rows = dict(self._conn.execute("SELECT failed, count(*) FROM graphs GROUP BY failed").fetchall())
+        return {"pending": rows.get(0, 0), "failed": rows.get(1, 0)}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _entry(row) -> JournalEntry:
+    session_id, user_id, nodes, edges, created_at = row
+    return JournalEntry(session_id, user_id, json.loads(nodes), json.loads(edges), created_at)
+
+
+class JournalReplayer:
+    """
+    Drains a GraphJournal into Neo4j in batches of `batch_size`, one
+    transaction per batch. Every `interval` seconds while the journal is
+    empty; after a connection or transient failure (already retried by
+    execute_write) it backs off exponentially, with jitter, up to
+    `max_backoff`. A graph Neo4j rejects outright (a statement or schema
+    error) is parked with mark_failed() so it cannot block the graphs
+    behind it. Other client errors — expired tokens, rotated credentials —
+    are backed off like an outage; they say nothing about the graph.
+
+    Every worker process may run one: rows are claimed for `lease` seconds
+    (longer than a write with the driver's retries takes) before replay.
+    """
+
+    def __init__(
+        self,
+        journal: GraphJournal,
+        driver: AsyncDriver,
+        batch_size: int = 32,
+        interval: float = 1.0,
+        max_backoff: float = 60.0,
+        lease: float = 120.0,
+    ):
+        self.journal = journal
+        self.driver = driver
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self.owner = uuid.uuid4().hex
+        self.stats: Counter = Counter()
+
+    async def run(self) -> None:
+        delay = self.interval
+        while True:
+            try:
+                await self.drain()
+                delay = self.interval
+            except Exception:
+                self.stats["retries"] += 1
+                logger.warning("Graph journal replay failed — retrying in %.0fs", delay, exc_info=True)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+                delay = min(delay * 2, self.max_backoff)
+                continue
+            await asyncio.sleep(self.interval)
+
+    async def drain(self) -> int:
+        """Replays until the journal is empty. Returns the graphs written."""
+        written = 0
+        while entries := await asyncio.to_thread(self.journal.claim, self.owner, self.batch_size, self.lease):
+            try:
+                written += await self._replay(entries)
+            except BaseException:
+                # Let another worker (or the next attempt) pick them up
+                await asyncio.to_thread(self.journal.release, [e.session_id for e in entries], self.owner)
+                raise
+        return written
+
+    async def _replay(self, entries: list[JournalEntry]) -> int:
+        try:
+            await persist_graphs(self.driver, [_params(e) for e in entries])
+        except ClientError as exc:
+            if not rejects_graph(exc):
+                raise
+            if len(entries) > 1:
+                written = 0
+                for entry in entries:
+                    written += await self._replay([entry])
+                return written
+            logger.error("Neo4j rejected journaled graph %s — parked", entries[0].session_id, exc_info=True)
+            await asyncio.to_thread(self.journal.mark_failed, entries[0].session_id, str(exc))
+            self.stats["failed"] += 1
+            return 0
+        await asyncio.to_thread(self.journal.remove, [e.session_id for e in entries], self.owner)
+        self.stats["replayed"] += len(entries)
+        self.stats["batches"] += 1
+        return len(entries)
+
+
+def _params(entry: JournalEntry) -> dict[str, Any]:
+    return graph_params(entry.session_id, entry.nodes, entry.edges, entry.user_id)
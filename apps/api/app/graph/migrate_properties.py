@@ -0,0 +1,37 @@
+"""
+Converts Entity nodes stored with a JSON-string `properties` into native
+node properties (NEO4J_PROPERTY_STORAGE=native). Safe to re-run and to run
+while the API serves traffic.
+
+    uv run python -m app.graph.migrate_properties [--batch-size 1000]
+"""
+import argparse
+import asyncio
+import logging
+
+from neo4j import AsyncGraphDatabase
+
+from app.config import settings
+from app.graph.properties import migrate_to_native
+
+
+async def _migrate(batch_size: int) -> dict[str, int]:
+    driver = AsyncGraphDatabase.driver(settings.neo4j_uri, auth=(settings.neo4j_username, settings.neo4j_password))
+    try:
+        return await migrate_to_native(driver, batch_size=batch_size)
+    finally:
+        await driver.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    counts = asyncio.run(_migrate(args.batch_size))
+    print(f"migrated {counts['migrated']} nodes, skipped {counts['skipped']} (kept as JSON)")
+
+
+if __name__ == "__main__":
+    main()
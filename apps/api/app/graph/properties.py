@@ -0,0 +1,121 @@
+import json
+import logging
+import re
+from typing import Any
+
+from neo4j import AsyncDriver
+
+from app.generate.schemas import NodeProperties
+
+logger = logging.getLogger(__name__)
+
+# Entity properties the extraction can produce — stored as node properties of
+# the same name in native mode (NEO4J_PROPERTY_STORAGE=native)
+PROPERTY_KEYS: tuple[str, ...] = tuple(NodeProperties.model_fields)
+
+_AMOUNT = re.compile(
+    r"(?P<number>\d[\d,]*(?:\.\d+)?)\s*(?P<unit>thousand|million|billion|trillion|bn|[kmbt])?\b",
+    re.IGNORECASE,
+)
+_MULTIPLIERS = {
+    "k": 1e3, "thousand": 1e3,
+    "m": 1e6, "million": 1e6,
+    "b": 1e9, "bn": 1e9, "billion": 1e9,
+    "t": 1e12, "trillion": 1e12,
+}
+
+
+def parse_amount_usd(amount: str | None) -> float | None:
+    """
+    "$50M" -> 50000000.0. Understands k/m/b/bn/t suffixes and spelled-out
+    units ("$2.3 billion", "USD 500K", "$12,500,000"). Ranges and "up to"
+    amounts use the first number. None when no number is found.
+    """
+    if not amount:
+        return None
+    match = _AMOUNT.search(amount)
+    if match is None:
+        return None
+    value = float(match["number"].replace(",", ""))
+    unit = (match["unit"] or "").lower()
+    return value * _MULTIPLIERS.get(unit, 1)
+
+
+def native_properties(properties: dict[str, Any]) -> dict[str, Any] | None:
+    """
+    properties as a map for `SET n += ...` — every PROPERTY_KEYS key
+    (absent ones as null, clearing stale values) plus amount_usd_value.
+    None when something cannot be stored natively (an unknown key or a
+    non-scalar value); the caller then keeps the JSON string.
+    """
+    if any(key not in PROPERTY_KEYS for key in properties):
+        return None
+    if any(not isinstance(value, (str, int, float, bool)) for value in properties.values() if value is not None):
+        return None
+    native = {key: properties.get(key) for key in PROPERTY_KEYS}
+    native["amount_usd_value"] = parse_amount_usd(properties.get("amount_usd"))
+    return native
+
+
+def read_properties(node: dict[str, Any]) -> dict[str, Any]:
+    """The API properties of a node record — JSON-string or native storage."""
+    if isinstance(node.get("properties"), str):
+        return json.loads(node["properties"])
+    return {key: node[key] for key in PROPERTY_KEYS if node.get(key) is not None}
+
+
+# Nodes still holding a JSON-string `properties`, a batch at a time
+_LEGACY_NODES = """
+MATCH (n:Entity)
+WHERE n.properties IS NOT NULL
+RETURN elementId(n) AS element_id, n.properties AS properties
+LIMIT $limit
+"""
+
+_SET_NATIVE = """
+UNWIND $rows AS row
+MATCH (n:Entity) WHERE elementId(n) = row.element_id
+SET n += row.native
+REMOVE n.properties
+"""
+
+
+async def migrate_to_native(driver: AsyncDriver, batch_size: int = 1000) -> dict[str, int]:
+    """
+    Rewrites JSON-string properties as native properties, batch_size nodes
+    per transaction. Safe to re-run and to run while the API serves traffic
+    — reads understand both layouts. Nodes whose properties cannot be stored
+    natively (see native_properties) keep the JSON string and are counted
+    as skipped; a batch made only of those ends the run.
+    """
+    migrated = skipped = 0
+    skip: set[str] = set()
+    while True:
+        async with driver.session() as session:
+            result = await session.run(_LEGACY_NODES, limit=batch_size + len(skip))
+            records = [record async for record in result if record["element_id"] not in skip]
+        if not records:
+            break
+        rows = []
+        for record in records:
+            try:
+                native = native_properties(json.loads(record["properties"]) or {})
+            except (ValueError, AttributeError):
+                native = None
+            if native is None:
+                skip.add(record["element_id"])
+                skipped += 1
+            else:
+                rows.append({"element_id": record["element_id"], "native": native})
+        if not rows:
+            break
+        async with driver.session() as session:
+            await session.execute_write(_set_native, rows)
+        migrated += len(rows)
+        logger.info("Migrated %d nodes to native properties", migrated)
+    return {"migrated": migrated, "skipped": skipped}
+
+
+async def _set_native(tx, rows: list[dict[str, Any]]) -> None:
+    result = await tx.run(_SET_NATIVE, rows=rows)
+    await result.consume()
@@ -1,12 +1,91 @@
+import asyncio
 import json
-import time
 from typing import Any
-from neo4j import Driver
-from neo4j.exceptions import ServiceUnavailable, SessionExpired
-
-
-def persist_graph(
-    driver: Driver,
+from neo4j import AsyncDriver, AsyncManagedTransaction
+from neo4j.exceptions import (
+    ClientError, ConstraintError, CypherSyntaxError, CypherTypeError, ServiceUnavailable, SessionExpired,
+)
+
+from app.config import settings
+from app.graph.canonical import canonical_slug
+from app.graph.properties import native_properties, read_properties
+
+# Pause before the single read retry on a transient connection failure
+# (Aura Free Tier wake-up) — awaited, so it never holds a thread.
+RETRY_BACKOFF_SECONDS = 2
+
+
+# Nodes and edges of any number of graphs in one statement — one graph per
+# persist_graph call, many when GraphWriteBatcher group-commits. MERGE on
+# (session_id, id) makes a replayed write (client retry, duplicate request)
+# a no-op instead of a second copy of the graph. The CALL blocks are unit
+# subqueries: they run once per graph without changing the row count, so
+# the edge block still runs for a graph whose node list is empty. A node
+# carries either a JSON `properties` string or a `native` property map (see
+# graph_params); the other is null/empty, which clears it on rewrite.
+# Nodes with a canonical_slug (NEO4J_CANONICAL_ENTITIES) are linked, in the
+# same transaction, to the cross-session Canonical node for (type, slug).
+PERSIST_GRAPH_CYPHER = """
+UNWIND $graphs AS g
+CALL {
+    WITH g
+    UNWIND g.nodes AS node
+    MERGE (n:Entity {session_id: g.session_id, id: node.id})
+    ON CREATE SET n.created_by = g.user_id,
+                  n.created_at = datetime()
+    SET n.label      = node.label,
+        n.type       = node.type,
+        n.properties = node.properties
+    SET n += node.native
+    WITH n, node
+    WHERE node.canonical_slug IS NOT NULL
+    MERGE (c:Canonical {type: node.type, slug: node.canonical_slug})
+    ON CREATE SET c.label      = node.label,
+                  c.created_at = datetime()
+    MERGE (n)-[:INSTANCE_OF]->(c)
+}
+CALL {
+    WITH g
+    UNWIND g.edges AS edge
+    MATCH (s:Entity {session_id: g.session_id, id: edge.source})
+    MATCH (t:Entity {session_id: g.session_id, id: edge.target})
+    MERGE (s)-[:RELATES_TO {type: edge.relationship, session_id: g.session_id}]->(t)
+}
+"""
+
+
+def graph_params(
+    session_id: str,
+    nodes: list[dict[str, Any]],
+    edges: list[dict[str, Any]],
+    user_id: str = "anonymous",
+) -> dict[str, Any]:
+    """
+    One graph as an element of PERSIST_GRAPH_CYPHER's $graphs. With
+    settings.neo4j_property_storage == "native", entity properties become
+    node properties (plus a numeric amount_usd_value) that Cypher can index
+    and filter; otherwise, or when a node's properties cannot be stored
+    natively, they are one JSON string.
+    """
+    native_mode = settings.neo4j_property_storage == "native"
+    params_nodes = []
+    for n in nodes:
+        properties = n.get("properties") or {}
+        native = native_properties(properties) if native_mode else None
+        params_nodes.append({
+            "id": n["id"],
+            "label": n["label"],
+            "type": n["type"],
+            # Neo4j cannot store nested maps as properties — serialize to JSON string
+            "properties": None if native is not None else json.dumps(properties),
+            "native": native or {},
+            "canonical_slug": canonical_slug(n["label"] or n["id"]) if settings.neo4j_canonical_entities else None,
+        })
+    return {"session_id": session_id, "nodes": params_nodes, "edges": edges, "user_id": user_id}
+
+
+async def persist_graph(
+    driver: AsyncDriver,
     session_id: str,
     nodes: list[dict[str, Any]],
     edges: list[dict[str, Any]],
@@ -18,126 +97,130 @@ def persist_graph(
     Security: ALL Cypher queries use $param syntax — zero string interpolation.
     Scope: All nodes/edges get session_id property for query isolation (CONTEXT.md).
     Ownership: created_by = user_id (Clerk user_id or "anonymous" for trial graphs).
-    Pattern: Uses UNWIND for batch writes — single query per node/edge batch.
+    Pattern: One managed write transaction running PERSIST_GRAPH_CYPHER — a
+    single round trip, all-or-nothing. execute_write retries transient
+    failures (Aura wake-up, leader switch, deadlock) with jittered
+    exponential backoff for up to settings.neo4j_max_transaction_retry_time.
     """
-    # Neo4j cannot store nested maps as properties — serialize to JSON string
-    serialized_nodes = [
-        {**n, "properties": json.dumps(n.get("properties") or {})}
-        for n in nodes
-    ]
+    await persist_graphs(driver, [graph_params(session_id, nodes, edges, user_id)])
 
-    # Retry once on transient connection failures (Aura Free Tier wake-up).
-    max_attempts = 2
-    for attempt in range(max_attempts):
-        try:
-            _persist_graph_inner(driver, session_id, serialized_nodes, edges, user_id)
-            return
-        except (ServiceUnavailable, SessionExpired, OSError):
-            if attempt < max_attempts - 1:
-                time.sleep(2)
-            else:
-                raise
 
+async def persist_graphs(driver: AsyncDriver, graphs: list[dict[str, Any]]) -> None:
+    """Persists several graph_params() graphs in one write transaction."""
+    async with driver.session() as session:
+        await session.execute_write(_write_graphs, graphs)
 
-def _persist_graph_inner(
-    driver: Driver,
-    session_id: str,
-    serialized_nodes: list[dict],
-    edges: list[dict],
-    user_id: str,
-) -> None:
-    with driver.session() as session:
-        session.run(
-            """
-            UNWIND $nodes AS node
-            CREATE (n:Entity {
-                id:         node.id,
-                label:      node.label,
-                type:       node.type,
-                properties: node.properties,
-                session_id: $session_id,
-                created_by: $user_id,
-                created_at: datetime()
-            })
-            """,
-            nodes=serialized_nodes,
-            session_id=session_id,
-            user_id=user_id,
-        )
 
-        session.run(
-            """
-            UNWIND $edges AS edge
-            MATCH (s:Entity {id: edge.source, session_id: $session_id})
-            MATCH (t:Entity {id: edge.target, session_id: $session_id})
-            CREATE (s)-[r:RELATES_TO {
-                type:       edge.relationship,
-                session_id: $session_id
-            }]->(t)
-            """,
-            edges=edges,
-            session_id=session_id,
-        )
+async def _write_graphs(tx: AsyncManagedTransaction, graphs: list[dict[str, Any]]) -> None:
+    result = await tx.run(PERSIST_GRAPH_CYPHER, graphs=graphs)
+    await result.consume()
 
 
-def get_graph_by_session(driver: Driver, session_id: str, user_id: str | None = None) -> dict[str, list] | None:
+def rejects_graph(exc: ClientError) -> bool:
     """
-    Retrieves all nodes and relationships for a session_id.
-    When user_id is provided, verifies ownership — returns None if the graph
-    belongs to a different user.
+    Whether Neo4j refused the statement or its data (Statement/Schema
+    errors) — a retry cannot help, but the other graphs of a batch may
+    still be written. Security errors (expired token, rotated credentials)
+    are not: they fail every graph alike.
+    """
+    if isinstance(exc, (ConstraintError, CypherSyntaxError, CypherTypeError)):
+        return True
+    return (exc.code or "").startswith(("Neo.ClientError.Statement.", "Neo.ClientError.Schema."))
+
+
+# "dev-user" is the legacy dev bypass user_id — allow access for any authenticated user
+SHARED_OWNERS = ("anonymous", "dev-user")
+
+# Nodes and edges of one session as a single record — no record at all when
+# the session is empty or, with $owners set, has a node created_by anyone
+# else. Only the fields the API returns cross the wire — the node projection
+# lists properties.PROPERTY_KEYS for natively stored properties.
+GET_GRAPH_CYPHER = """
+MATCH (n:Entity {session_id: $session_id})
+WITH collect(n) AS nodes
+WHERE size(nodes) > 0
+  AND ($owners IS NULL OR all(n IN nodes WHERE n.created_by IN $owners))
+CALL {
+    MATCH (s:Entity {session_id: $session_id})-[r:RELATES_TO]->(t:Entity)
+    RETURN collect({source: s.id, target: t.id, relationship: r.type}) AS edges
+}
+RETURN [n IN nodes | n {
+           .id, .label, .type, .properties,
+           .aum, .stage_focus, .chain_focus, .token_ticker, .chain, .category,
+           .amount_usd, .stage, .date, .title, .firm, .description
+       }] AS nodes, edges,
+       head(nodes).created_by AS created_by
+"""
+
+
+async def get_graph_by_session(
+    driver: AsyncDriver, session_id: str, user_id: str | None = None,
+) -> dict[str, Any] | None:
+    """
+    Retrieves all nodes and relationships for a session_id in one query,
+    plus the graph's created_by (for the read cache — not part of the API
+    response). When user_id is provided, ownership is checked in Cypher —
+    returns None if the graph belongs to a different user.
     """
     max_attempts = 2
     for attempt in range(max_attempts):
         try:
-            return _get_graph_by_session_inner(driver, session_id, user_id)
+            return await _get_graph_by_session_inner(driver, session_id, user_id)
         except (ServiceUnavailable, SessionExpired, OSError):
             if attempt < max_attempts - 1:
-                time.sleep(2)
+                await asyncio.sleep(RETRY_BACKOFF_SECONDS)
             else:
                 raise
 
 
-def _get_graph_by_session_inner(driver: Driver, session_id: str, user_id: str | None = None) -> dict[str, list] | None:
-    with driver.session() as session:
-        # Fetch nodes
-        node_result = session.run(
-            """
-            MATCH (n:Entity {session_id: $session_id})
-            RETURN n.id AS id, n.label AS label, n.type AS type,
-                   n.properties AS properties, n.session_id AS session_id,
-                   n.created_by AS created_by
-            """,
-            session_id=session_id,
-        )
-        raw_nodes = [dict(record) for record in node_result]
-
-        # No nodes found for this session
-        if not raw_nodes:
-            return None
-
-        # Ownership check: if user_id provided, verify created_by matches
-        # "dev-user" is the legacy dev bypass user_id — allow access for any authenticated user
-        if user_id and raw_nodes[0].get("created_by") not in (user_id, "anonymous", "dev-user"):
-            return None
-
-        nodes = [
-            {
-                "id": n["id"],
-                "label": n["label"],
-                "type": n["type"],
-                "properties": json.loads(n["properties"]) if isinstance(n.get("properties"), str) else (n.get("properties") or {}),
-            }
-            for n in raw_nodes
-        ]
-
-        # Fetch edges
-        edge_result = session.run(
-            """
-            MATCH (s:Entity {session_id: $session_id})-[r:RELATES_TO]->(t:Entity)
-            RETURN s.id AS source, t.id AS target, r.type AS relationship
-            """,
-            session_id=session_id,
-        )
-        edges = [dict(record) for record in edge_result]
+async def _get_graph_by_session_inner(
+    driver: AsyncDriver, session_id: str, user_id: str | None = None,
+) -> dict[str, Any] | None:
+    owners = [user_id, *SHARED_OWNERS] if user_id else None
+    async with driver.session() as session:
+        result = await session.run(GET_GRAPH_CYPHER, session_id=session_id, owners=owners)
+        record = await result.single()
+
+    # Empty session or not owned by user_id
+    if record is None:
+        return None
+
+    nodes = [
+        {
+            "id": n["id"],
+            "label": n["label"],
+            "type": n["type"],
+            "properties": read_properties(n),
+        }
+        for n in record["nodes"]
+    ]
+    return {"nodes": nodes, "edges": record["edges"], "created_by": record["created_by"]}
+
+
+# Sessions that mention an entity: an index seek on the Canonical key, then
+# its INSTANCE_OF links — no scan over every Entity node
+ENTITY_SESSIONS_CYPHER = """
+MATCH (c:Canonical {type: $type, slug: $slug})<-[:INSTANCE_OF]-(n:Entity)
+WHERE $owners IS NULL OR n.created_by IN $owners
+RETURN DISTINCT n.session_id AS session_id
+LIMIT $limit
+"""
+
 
-    return {"nodes": nodes, "edges": edges}
+async def find_entity_sessions(
+    driver: AsyncDriver, entity_type: str, name: str, user_id: str | None = None, limit: int = 100,
+) -> list[str]:
+    """
+    session_ids of graphs that contain the entity (type, name), across all
+    sessions. With user_id, only graphs that user may read. Covers graphs
+    persisted while NEO4J_CANONICAL_ENTITIES was on.
+    """
+    slug = canonical_slug(name)
+    if slug is None:
+        return []
+    owners = [user_id, *SHARED_OWNERS] if user_id else None
+    async with driver.session() as session:
+        result = await session.run(
+            ENTITY_SESSIONS_CYPHER, type=entity_type, slug=slug, owners=owners, limit=limit,
+        )
+        return [record["session_id"] async for record in result]
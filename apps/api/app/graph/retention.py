@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+
+from neo4j import AsyncDriver
+
+from app.graph.cache import forget_graphs
+
+logger = logging.getLogger(__name__)
+
+# Sessions of anonymous trial graphs created before the cutoff
+_EXPIRED_ANONYMOUS = """
+MATCH (n:Entity)
+WHERE n.created_at < datetime() - duration({days: $days})
+  AND n.created_by = 'anonymous'
+RETURN DISTINCT n.session_id AS session_id
+LIMIT $limit
+"""
+
+# Signed-in users' sessions created before the cutoff, in session_id order
+# from a cursor — the ones Supabase still lists are kept and skipped
+_OWNED_CANDIDATES = """
+MATCH (n:Entity)
+WHERE n.created_at < datetime() - duration({days: $days})
+  AND n.created_by <> 'anonymous'
+  AND n.session_id > $after
+RETURN DISTINCT n.session_id AS session_id
+ORDER BY session_id
+LIMIT $limit
+"""
+
+# Auto-commit only: every $batch_rows nodes commit in their own transaction,
+# so a large session never holds locks for long
+_DELETE_SESSIONS = """
+UNWIND $session_ids AS session_id
+MATCH (n:Entity {session_id: session_id})
+CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF $batch_rows ROWS
+"""
+
+# Canonical nodes (NEO4J_CANONICAL_ENTITIES) no remaining graph links to.
+# Plain DELETE: a node a concurrent persist just linked again fails its
+# batch instead of losing the link.
+_DELETE_UNUSED_CANONICALS = """
+MATCH (c:Canonical)
+WHERE NOT (c)<-[:INSTANCE_OF]-()
+CALL { WITH c DELETE c } IN TRANSACTIONS OF $batch_rows ROWS
+"""
+
+
+class RetentionSweeper:
+    """
+    Deletes graphs nobody can reach any more (run per deployment, not per
+    worker):
+
+    - anonymous trial graphs older than `anonymous_days`
+    - orphaned graphs — signed-in users' graphs older than `orphan_days`
+      with no row left in Supabase `graphs` (deleted from history by the
+      user, or never recorded). Needs Supabase; skipped without it, and a
+      round is skipped whenever Supabase cannot be asked.
+    - then Canonical nodes that no graph links to any more
+
+    Work is done in rounds of `sessions_per_round` sessions, `pause`
+    seconds apart, at most `max_rounds` per class per run, so foreground
+    writes never queue behind a long delete. 0 days disables a class.
+    """
+
+    def __init__(
+        self,
+        driver: AsyncDriver,
+        supabase=None,
+        redis=None,
+        anonymous_days: int = 7,
+        orphan_days: int = 30,
+        sessions_per_round: int = 100,
+        batch_rows: int = 1000,
+        pause: float = 1.0,
+        max_rounds: int = 50,
+    ):
+        self.driver = driver
+        self.supabase = supabase
+        self.redis = redis
+        self.anonymous_days = anonymous_days
+        self.orphan_days = orphan_days
+        self.sessions_per_round = sessions_per_round
+        self.batch_rows = batch_rows
+        self.pause = pause
+        self.max_rounds = max_rounds
+        self.stats: Counter = Counter()
+        self.last_run: dict | None = None
+
+    async def run(self, interval: float) -> None:
+        """Sweeps forever, `interval` seconds between runs."""
+        while True:
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("Retention sweep failed")
+            await asyncio.sleep(interval)
+
+    async def sweep(self) -> dict:
+        """One run over both classes. Returns this run's counts and run time."""
+        start = time.perf_counter()
+        run: Counter = Counter()
+        if self.anonymous_days > 0:
+            await self._sweep_anonymous(run)
+        if self.orphan_days > 0 and self.supabase is not None:
+            await self._sweep_orphans(run)
+        if run["nodes_deleted"]:
+            await self._delete_unused_canonicals(run)
+        self.last_run = {**run, "run_ms": int((time.perf_counter() - start) * 1000), "finished_at": int(time.time())}
+        self.stats.update(run)
+        self.stats["runs"] += 1
+        logger.info("Retention sweep: %s", self.last_run)
+        return self.last_run
+
+    async def _sweep_anonymous(self, run: Counter) -> None:
+        for _ in range(self.max_rounds):
+            session_ids = await self._session_ids(_EXPIRED_ANONYMOUS, days=self.anonymous_days)
+            if not session_ids:
+                return
+            await self._delete(session_ids, "anonymous", run)
+            await asyncio.sleep(self.pause)
+
+    async def _sweep_orphans(self, run: Counter) -> None:
+        after = ""
+        for _ in range(self.max_rounds):
+            session_ids = await self._session_ids(_OWNED_CANDIDATES, days=self.orphan_days, after=after)
+            if not session_ids:
+                return
+            after = session_ids[-1]
+            try:
+                listed = await asyncio.to_thread(self._listed_in_supabase, session_ids)
+            except Exception:
+                logger.warning("Supabase lookup failed — orphan sweep stopped for this run", exc_info=True)
+                return
+            orphaned = [s for s in session_ids if s not in listed]
+            if orphaned:
+                await self._delete(orphaned, "orphaned", run)
+            await asyncio.sleep(self.pause)
+
+    async def _delete_unused_canonicals(self, run: Counter) -> None:
+        try:
+            async with self.driver.session() as session:
+                result = await session.run(_DELETE_UNUSED_CANONICALS, batch_rows=self.batch_rows)
+                summary = await result.consume()
+        except Exception:
+            logger.warning("Canonical cleanup failed — retried on the next run", exc_info=True)
+            return
+        run["canonicals_deleted"] += summary.counters.nodes_deleted
+
+    def _listed_in_supabase(self, session_ids: list[str]) -> set[str]:
+        rows = (
+            self.supabase.table("graphs")
+            .select("neo4j_session_id")
+            .in_("neo4j_session_id", session_ids)
+            .execute()
+            .data
+        )
+        return {row["neo4j_session_id"] for row in rows}
+
+    async def _session_ids(self, query: str, **params) -> list[str]:
+        async with self.driver.session() as session:
+            result = await session.run(query, limit=self.sessions_per_round, **params)
+            return [record["session_id"] async for record in result]
+
+    async def _delete(self, session_ids: list[str], owner_class: str, run: Counter) -> None:
+        async with self.driver.session() as session:
+            result = await session.run(_DELETE_SESSIONS, session_ids=session_ids, batch_rows=self.batch_rows)
+            summary = await result.consume()
+        run[f"{owner_class}_sessions"] += len(session_ids)
+        run["nodes_deleted"] += summary.counters.nodes_deleted
+        run["relationships_deleted"] += summary.counters.relationships_deleted
+        await asyncio.to_thread(forget_graphs, self.redis, session_ids)
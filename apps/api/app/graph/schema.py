@@ -0,0 +1,110 @@
+import logging
+
+from neo4j import AsyncDriver
+from neo4j.exceptions import Neo4jError
+
+logger = logging.getLogger(__name__)
+
+# Indexes and constraints the repository's queries rely on, by name. All
+# statements are idempotent (IF NOT EXISTS) and run on every startup.
+SCHEMA: dict[str, str] = {
+    # Session-wide reads: MATCH (n:Entity {session_id: $session_id})
+    "entity_session_id": (
+        "CREATE INDEX entity_session_id IF NOT EXISTS "
+        "FOR (n:Entity) ON (n.session_id)"
+    ),
+    # Node MERGE and edge endpoint MATCH on {session_id, id} — a point
+    # lookup instead of a scan of every node in the session
+    "entity_session_key": (
+        "CREATE CONSTRAINT entity_session_key IF NOT EXISTS "
+        "FOR (n:Entity) REQUIRE (n.session_id, n.id) IS UNIQUE"
+    ),
+    "relates_to_session_id": (
+        "CREATE INDEX relates_to_session_id IF NOT EXISTS "
+        "FOR ()-[r:RELATES_TO]-() ON (r.session_id)"
+    ),
+    # Retention sweeps: sessions created before a cutoff
+    "entity_created_at": (
+        "CREATE INDEX entity_created_at IF NOT EXISTS "
+        "FOR (n:Entity) ON (n.created_at)"
+    ),
+    # Cross-session entities (NEO4J_CANONICAL_ENTITIES): MERGE key and the
+    # index seek behind find_entity_sessions
+    "canonical_key": (
+        "CREATE CONSTRAINT canonical_key IF NOT EXISTS "
+        "FOR (c:Canonical) REQUIRE (c.type, c.slug) IS UNIQUE"
+    ),
+    # Server-side filtering on natively stored properties
+    # (NEO4J_PROPERTY_STORAGE=native): round size, stage and chain
+    "entity_amount_usd_value": (
+        "CREATE INDEX entity_amount_usd_value IF NOT EXISTS "
+        "FOR (n:Entity) ON (n.amount_usd_value)"
+    ),
+    "entity_stage": (
+        "CREATE INDEX entity_stage IF NOT EXISTS "
+        "FOR (n:Entity) ON (n.stage)"
+    ),
+    "entity_chain": (
+        "CREATE INDEX entity_chain IF NOT EXISTS "
+        "FOR (n:Entity) ON (n.chain)"
+    ),
+}
+
+# Created instead when a SCHEMA statement fails. The uniqueness constraint
+# cannot be created while graphs written before persist_graph used MERGE
+# still hold duplicate (session_id, id) nodes; a plain composite index
+# gives the same lookups without the guarantee.
+FALLBACKS: dict[str, tuple[str, str]] = {
+    "entity_session_key": (
+        "entity_session_id_id",
+        "CREATE INDEX entity_session_id_id IF NOT EXISTS "
+        "FOR (n:Entity) ON (n.session_id, n.id)",
+    ),
+}
+
+
+async def ensure_schema(driver: AsyncDriver) -> list[str]:
+    """
+    Creates the SCHEMA indexes and constraints (or their FALLBACKS), then
+    verifies them. Returns the names still missing — an empty list when the
+    schema is complete. Failures are logged, never raised: the API works
+    without the schema, only slower.
+    """
+    async with driver.session() as session:
+        for name, statement in SCHEMA.items():
+            try:
+                # The async driver reports a failed statement at consume time
+                # — consume here so the error belongs to this statement
+                await (await session.run(statement)).consume()
+                continue
+            except Neo4jError:
+                if name not in FALLBACKS:
+                    logger.warning("Could not create Neo4j schema %s", name, exc_info=True)
+                    continue
+            fallback_name, fallback = FALLBACKS[name]
+            logger.warning(
+                "Could not create Neo4j schema %s (duplicate (session_id, id) nodes?) — using index %s",
+                name, fallback_name, exc_info=True,
+            )
+            try:
+                await (await session.run(fallback)).consume()
+            except Neo4jError:
+                logger.warning("Could not create Neo4j schema %s", fallback_name, exc_info=True)
+    return await missing_schema(driver)
+
+
+async def missing_schema(driver: AsyncDriver) -> list[str]:
+    """
+    SCHEMA names without an ONLINE index — constraints count through their
+    backing index, and a FALLBACKS index stands in for its constraint.
+    Indexes still populating after a fresh deploy are reported as missing.
+    """
+    async with driver.session() as session:
+        result = await session.run("SHOW INDEXES YIELD name, state")
+        online = {record["name"] async for record in result if record["state"] == "ONLINE"}
+    missing = []
+    for name in SCHEMA:
+        fallback = FALLBACKS.get(name)
+        if name not in online and not (fallback and fallback[0] in online):
+            missing.append(name)
+    return missing
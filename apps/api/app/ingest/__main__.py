@@ -0,0 +1,37 @@
+"""
+Runs the feed/sitemap ingestion worker as its own process.
+
+    uv run python -m app.ingest          # poll every INGEST_INTERVAL seconds
+    uv run python -m app.ingest --once   # one round, then exit
+"""
+import argparse
+import asyncio
+import logging
+
+from app.config import settings
+from app.ingest.worker import IngestWorker
+from app.ratelimit.backend import create_redis_client
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--once", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    worker = IngestWorker(
+        create_redis_client(),
+        settings.ingest_feeds,
+        concurrency=settings.ingest_concurrency,
+        tokens_per_hour=settings.ingest_tokens_per_hour,
+        max_urls_per_feed=settings.ingest_max_urls_per_feed,
+    )
+    if args.once:
+        extracted = asyncio.run(worker.poll_once())
+        print(f"extracted {extracted} new graphs — {dict(worker.stats)}")
+    else:
+        asyncio.run(worker.run(settings.ingest_interval))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+from dataclasses import dataclass
+
+import httpx
+from lxml import etree
+
+from app.scraper.scraper import CHROME_UA, MAX_RESPONSE_BYTES
+from app.scraper.ssrf import validate_url
+
+# XXE-safe: no entity expansion, no DTD/network fetches
+_XML_PARSER = etree.XMLParser(resolve_entities=False, no_network=True, load_dtd=False, recover=True)
+
+
+@dataclass
+class FeedEntry:
+    url: str
+    updated: str | None = None  # RSS pubDate / Atom updated / sitemap lastmod, as published
+
+
+def parse_feed(body: bytes) -> tuple[list[FeedEntry], list[str]]:
+    """
+    Parses an RSS 2.0, Atom or sitemap document.
+    Returns (article entries, nested sitemap URLs from a <sitemapindex>).
+    Elements are matched by local name, so namespace variants all work.
+    """
+    root = etree.fromstring(body, parser=_XML_PARSER)
+    if root is None:
+        return [], []
+    kind = etree.QName(root).localname
+    if kind == "sitemapindex":
+        return [], [loc for loc in root.xpath("./*[local-name()='sitemap']/*[local-name()='loc']/text()")]
+    if kind == "urlset":
+        return [
+            FeedEntry(url=_text(el, "loc"), updated=_text(el, "lastmod"))
+            for el in root.xpath("./*[local-name()='url']")
+            if _text(el, "loc")
+        ], []
+    if kind == "feed":  # Atom
+        entries = []
+        for el in root.xpath("./*[local-name()='entry']"):
+            links = el.xpath("./*[local-name()='link'][not(@rel) or @rel='alternate']/@href")
+            if links:
+                entries.append(FeedEntry(url=links[0].strip(), updated=_text(el, "updated") or _text(el, "published")))
+        return entries, []
+    return [  # RSS
+        FeedEntry(url=_text(el, "link"), updated=_text(el, "pubDate"))
+        for el in root.xpath(".//*[local-name()='item']")
+        if _text(el, "link")
+    ], []
+
+
+def _text(el, name: str) -> str | None:
+    values = el.xpath(f"./*[local-name()='{name}']/text()")
+    return values[0].strip() if values and values[0].strip() else None
+
+
+async def fetch_feed(client: httpx.AsyncClient, url: str) -> bytes:
+    """
+    Downloads a feed through the SSRF guard (SEC-01). Redirects are not
+    followed — configure the final feed URL. Raises httpx errors on failure
+    and ValueError when the body exceeds MAX_RESPONSE_BYTES.
+    """
+    validate_url(url)
+    body = bytearray()
+    async with client.stream("GET", url, headers={"User-Agent": CHROME_UA}, follow_redirects=False) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes():
+            body += chunk
+            if len(body) > MAX_RESPONSE_BYTES:
+                raise ValueError(f"Feed too large: {url}")
+    return bytes(body)
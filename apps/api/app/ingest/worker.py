@@ -0,0 +1,217 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import Counter
+
+import httpx
+from fastapi import HTTPException
+from lxml import etree
+
+from app.config import settings
+from app.generate.neardup import find_near_duplicate, index_extraction
+from app.generate.service import _extract_graph, _fetch_url_content
+from app.ingest.feeds import FeedEntry, fetch_feed, parse_feed
+from app.scraper.canonical import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+# Prompt + structured-output overhead on top of the article itself, used to
+# reserve budget before the real token count is known
+PROMPT_OVERHEAD_TOKENS = 1_500
+
+_RESERVE = """
+local used = redis.call("INCRBY", KEYS[1], ARGV[1])
+if used > tonumber(ARGV[2]) then
+    redis.call("DECRBY", KEYS[1], ARGV[1])
+    return -1
+end
+redis.call("EXPIRE", KEYS[1], 7200)
+return used
+"""
+
+_ADJUST = """
+local used = redis.call("INCRBY", KEYS[1], ARGV[1])
+redis.call("EXPIRE", KEYS[1], 7200)
+return used
+"""
+
+
+class TokenBudget:
+    """
+    GPT-4o tokens the ingest worker may spend per clock hour. Shared across
+    processes through one Redis counter per hour when Redis is configured,
+    otherwise kept in process.
+    """
+
+    def __init__(self, redis, tokens_per_hour: int):
+        self._redis = redis
+        self.tokens_per_hour = tokens_per_hour
+        self._hour = 0
+        self._used = 0
+
+    def _key(self, hour: int) -> str:
+        return f"ingest:tokens:{hour}"
+
+    def reserve(self, tokens: int) -> int | None:
+        """Reserves tokens in the current hour. Returns the hour reserved in,
+        or None when the reservation would exceed the budget."""
+        hour = int(time.time() // 3600)
+        if self._redis is not None:
+            used = self._redis.eval(_RESERVE, [self._key(hour)], [tokens, self.tokens_per_hour])
+            return hour if int(used) >= 0 else None
+        if hour != self._hour:
+            self._hour, self._used = hour, 0
+        if self._used + tokens > self.tokens_per_hour:
+            return None
+        self._used += tokens
+        return hour
+
+    def adjust(self, hour: int, delta: int) -> None:
+        """Corrects a reservation by actual - reserved tokens."""
+        if self._redis is not None:
+            self._redis.eval(_ADJUST, [self._key(hour)], [delta])
+        elif hour == self._hour:
+            self._used += delta
+
+
+class IngestWorker:
+    """
+    Background ingestion: polls RSS/Atom feeds and sitemaps, and runs new
+    article URLs through the same scrape cache and extraction as
+    /api/generate, so user requests for those articles hit warm caches
+    (scrape cache, near-duplicate index) instead of scraping and calling
+    GPT-4o.
+
+    - URLs are canonicalized and claimed once (Redis SET NX, shared by all
+      workers; in process without Redis) for settings.ingest_seen_ttl.
+    - At most `concurrency` articles are processed at a time.
+    - Extractions stop for the hour once `tokens_per_hour` is spent;
+      deferred URLs are released and picked up by a later poll.
+    - A URL whose processing fails unexpectedly (Redis, network, budget
+      script) is released too, and never stops the rest of the poll.
+    """
+
+    def __init__(
+        self,
+        redis,
+        feeds: list[str],
+        concurrency: int = 2,
+        tokens_per_hour: int = 200_000,
+        max_urls_per_feed: int = 50,
+    ):
+        self.redis = redis
+        self.feeds = feeds
+        self.concurrency = concurrency
+        self.max_urls_per_feed = max_urls_per_feed
+        self.budget = TokenBudget(redis, tokens_per_hour)
+        self.stats: Counter = Counter()
+        self._seen: set[str] = set()
+
+    async def run(self, interval: float) -> None:
+        """Polls forever, `interval` seconds between rounds."""
+        while True:
+            try:
+                await self.poll_once()
+            except Exception:
+                logger.exception("Ingest poll failed")
+            await asyncio.sleep(interval)
+
+    async def poll_once(self) -> int:
+        """One round over all feeds. Returns the number of new graphs extracted."""
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            entries = []
+            for feed in self.feeds:
+                entries += await self._discover(client, feed)
+        urls = list(dict.fromkeys(e.url for e in entries))
+        self.stats["polls"] += 1
+        self.stats["discovered"] += len(urls)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(url: str) -> bool:
+            async with semaphore:
+                return await self._process(url)
+
+        results = await asyncio.gather(*(bounded(u) for u in urls), return_exceptions=True)
+        return sum(result is True for result in results)
+
+    async def _discover(self, client: httpx.AsyncClient, feed: str, depth: int = 0) -> list[FeedEntry]:
+        try:
+            entries, sitemaps = parse_feed(await fetch_feed(client, feed))
+        except (HTTPException, httpx.HTTPError, ValueError, etree.XMLSyntaxError):
+            self.stats["feed_errors"] += 1
+            logger.warning("Could not read feed %s", feed, exc_info=True)
+            return []
+        if depth == 0:
+            for sitemap in sitemaps[: self.max_urls_per_feed]:
+                entries += await self._discover(client, sitemap, depth=1)
+        if any(e.updated for e in entries) and all(e.updated is None or e.updated[:1].isdigit() for e in entries):
+            # Sitemaps and Atom use ISO 8601 dates — newest first
+            entries.sort(key=lambda e: e.updated or "", reverse=True)
+        return [e for e in entries if e.url.startswith(("https://", "http://"))][: self.max_urls_per_feed]
+
+    async def _process(self, url: str) -> bool:
+        key = f"ingest:seen:{hashlib.sha256(canonicalize_url(url).encode()).hexdigest()}"
+        if not await self._claim(key):
+            self.stats["skipped_seen"] += 1
+            return False
+        try:
+            return await self._ingest(url, key)
+        except Exception:
+            self.stats["errors"] += 1
+            logger.warning("Ingest of %s failed — released for a later poll", url, exc_info=True)
+            try:
+                await self._release(key)
+            except Exception:
+                logger.warning("Could not release ingest claim for %s", url, exc_info=True)
+            return False
+
+    async def _ingest(self, url: str, key: str) -> bool:
+        try:
+            content, _cache_hit, _age = await _fetch_url_content(url, self.redis, False)
+        except HTTPException as exc:
+            self.stats["scrape_failed"] += 1
+            if exc.status_code in (429, 503):
+                await self._release(key)  # timeout, open circuit, host queue — retry on a later poll
+            return False
+
+        if await asyncio.to_thread(find_near_duplicate, self.redis, content) is not None:
+            self.stats["near_duplicates"] += 1
+            return False
+
+        reserved = len(content) // 4 + PROMPT_OVERHEAD_TOKENS
+        hour = await asyncio.to_thread(self.budget.reserve, reserved)
+        if hour is None:
+            self.stats["deferred"] += 1
+            await self._release(key)
+            return False
+        try:
+            nodes, edges, token_count = await _extract_graph(content, None)
+        except Exception as exc:
+            await asyncio.to_thread(self.budget.adjust, hour, -reserved)
+            if not isinstance(exc, HTTPException):
+                raise
+            self.stats["extract_failed"] += 1
+            if exc.status_code in (429, 503):
+                await self._release(key)  # transient — retry on a later poll
+            return False
+        await asyncio.to_thread(self.budget.adjust, hour, token_count - reserved)
+        await asyncio.to_thread(index_extraction, self.redis, content, nodes, edges)
+        self.stats["extracted"] += 1
+        self.stats["tokens"] += token_count
+        return True
+
+    async def _claim(self, key: str) -> bool:
+        if self.redis is None:
+            if key in self._seen:
+                return False
+            self._seen.add(key)
+            return True
+        return bool(await asyncio.to_thread(self.redis.set, key, "1", ex=settings.ingest_seen_ttl, nx=True))
+
+    async def _release(self, key: str) -> None:
+        if self.redis is None:
+            self._seen.discard(key)
+        else:
+            await asyncio.to_thread(self.redis.delete, key)
@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+
+class LocalTTLCache:
+    """
+    Bounded in-process LRU with per-entry TTL, sized in bytes.
+
+    One instance per worker process — used as the first tier in front of
+    Redis so hot keys are answered without a network round trip. Callers
+    pass the byte size of each value (the UTF-8 length is used for str,
+    len() for bytes).
+    Thread-safe: cache helpers run inside asyncio.to_thread workers.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[Any, int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, size: int | None = None, ttl: float | None = None) -> None:
+        if size is None:
+            size = len(value.encode()) if isinstance(value, str) else len(value)
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if size > self.max_bytes or ttl <= 0:
+            self.pop(key)
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + ttl)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+        }
+
+    def _remove(self, key: str) -> None:
+        _value, size, _expires_at = self._entries.pop(key)
+        self.bytes -= size
@@ -1,15 +1,32 @@
+import asyncio
+import logging
+import sqlite3
 import sentry_sdk
 from sentry_sdk.integrations.starlette import StarletteIntegration
 from sentry_sdk.integrations.fastapi import FastApiIntegration
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
-from neo4j import GraphDatabase
+from fastapi import Depends, FastAPI, Request
+from neo4j import AsyncGraphDatabase
 from supabase import create_client
-from upstash_redis import Redis
 from app.config import settings
+from app.dependencies import get_admin_user
+from app.ratelimit.backend import create_redis_client
+from app.generate.neardup import neardup_stats
+from app.graph.batcher import GraphWriteBatcher
+from app.graph.cache import graph_cache_stats
+from app.graph.journal import GraphJournal, JournalReplayer
+from app.graph.retention import RetentionSweeper
+from app.graph.schema import ensure_schema, missing_schema
+from app.ratelimit.cache import cache_stats, listen_for_invalidations
+from app.scraper.boilerplate import boilerplate_model
+from app.scraper.hosts import circuit_breaker, host_limiter
+from app.ratelimit.limiter import build_limiters
 from app.generate.router import router as generate_router
+from app.ingest.worker import IngestWorker
 from app.ratelimit.router import router as ratelimit_router
 
+logger = logging.getLogger(__name__)
+
 # Sentry must be initialized before app = FastAPI() — patches request handling at import time
 # Only init if DSN is configured (allows dev without Sentry credentials)
 if settings.sentry_dsn:
@@ -30,20 +47,47 @@ async def lifespan(app: FastAPI):
     # Startup — create driver singleton (SEC-04)
     # Aura Free Tier idles after inactivity → stale connections.
     # liveness_check_timeout keeps the pool healthy by probing before use.
-    app.state.neo4j_driver = GraphDatabase.driver(
+    app.state.neo4j_driver = AsyncGraphDatabase.driver(
         settings.neo4j_uri,
         auth=(settings.neo4j_username, settings.neo4j_password),
-        max_connection_pool_size=10,
-        connection_acquisition_timeout=30,
+        max_connection_pool_size=settings.neo4j_max_connection_pool_size,
+        connection_acquisition_timeout=settings.neo4j_connection_acquisition_timeout,
+        max_transaction_retry_time=settings.neo4j_max_transaction_retry_time,
         liveness_check_timeout=5,
     )
-    app.state.neo4j_driver.verify_connectivity()
-    # Create session_id index on startup (idempotent)
-    with app.state.neo4j_driver.session() as session:
-        session.run(
-            "CREATE INDEX entity_session_id IF NOT EXISTS "
-            "FOR (n:Entity) ON (n.session_id)"
+    await app.state.neo4j_driver.verify_connectivity()
+    # Create and verify indexes/constraints on startup (idempotent)
+    missing = await ensure_schema(app.state.neo4j_driver)
+    if missing:
+        logger.warning("Neo4j schema incomplete: %s", ", ".join(missing))
+    # Optional group commit of concurrent graph writes
+    app.state.graph_writer = None
+    if settings.neo4j_group_commit:
+        app.state.graph_writer = GraphWriteBatcher(
+            app.state.neo4j_driver,
+            max_graphs=settings.neo4j_group_commit_max_graphs,
+            max_delay=settings.neo4j_group_commit_delay_ms / 1000,
+        )
+    # Optional write-behind: journal locally, replay into Neo4j in the background
+    app.state.graph_journal = None
+    app.state.journal_replayer = None
+    replay_task = None
+    if settings.neo4j_write_behind:
+        try:
+            app.state.graph_journal = GraphJournal(settings.neo4j_journal_path)
+        except sqlite3.Error as exc:
+            raise RuntimeError(
+                f"NEO4J_WRITE_BEHIND=true needs a writable NEO4J_JOURNAL_PATH "
+                f"({settings.neo4j_journal_path}): {exc}"
+            ) from exc
+        app.state.journal_replayer = JournalReplayer(
+            app.state.graph_journal,
+            app.state.neo4j_driver,
+            batch_size=settings.neo4j_journal_batch,
+            interval=settings.neo4j_journal_interval,
+            max_backoff=settings.neo4j_journal_max_backoff,
         )
+        replay_task = asyncio.create_task(app.state.journal_replayer.run())
 
     # Supabase singleton (AUTH-03, AUTH-04) — only init if configured
     if settings.supabase_url and settings.supabase_key:
@@ -51,15 +95,71 @@ async def lifespan(app: FastAPI):
     else:
         app.state.supabase = None  # Graceful degradation when not configured
 
-    # Upstash Redis singleton (RATE-01, RATE-03, AI-02)
-    if settings.upstash_redis_rest_url and settings.upstash_redis_rest_token:
-        app.state.redis = Redis(url=settings.upstash_redis_rest_url, token=settings.upstash_redis_rest_token)
-    else:
-        app.state.redis = None  # Graceful degradation when not configured
+    # Redis singleton (RATE-01, RATE-03, AI-02) — Upstash REST or native RESP,
+    # None when not configured (graceful degradation)
+    app.state.redis = create_redis_client()
+    # Rate limiters are built once per app, not per request
+    app.state.rate_limiters = build_limiters(app.state.redis)
+
+    # Cross-worker invalidation of the in-process scrape cache tier (optional)
+    scrape_invalidation = None
+    if settings.scrape_cache_invalidation and app.state.redis is not None:
+        scrape_invalidation = listen_for_invalidations(app.state.redis)
+        if scrape_invalidation is None:
+            logger.info("Redis client has no pub/sub — local scrape cache relies on TTL only")
+
+    # Deletes expired anonymous and orphaned graphs in the background (optional)
+    app.state.retention_sweeper = None
+    retention_task = None
+    if settings.retention_enabled:
+        app.state.retention_sweeper = RetentionSweeper(
+            app.state.neo4j_driver,
+            supabase=app.state.supabase,
+            redis=app.state.redis,
+            anonymous_days=settings.retention_anonymous_days,
+            orphan_days=settings.retention_orphan_days,
+            sessions_per_round=settings.retention_sessions_per_round,
+            batch_rows=settings.retention_batch_rows,
+            pause=settings.retention_pause,
+            max_rounds=settings.retention_max_rounds,
+        )
+        retention_task = asyncio.create_task(app.state.retention_sweeper.run(settings.retention_interval))
+
+    # Feed/sitemap ingestion in the background (optional)
+    app.state.ingest_worker = None
+    ingest_task = None
+    if settings.ingest_enabled and settings.ingest_feeds and (app.state.redis is None or settings.neardup_threshold <= 0):
+        # Ingested extractions only pay off through the Redis scrape cache
+        # and near-duplicate index — without them the tokens are wasted
+        logger.warning("INGEST_ENABLED ignored: ingestion needs Redis and NEARDUP_THRESHOLD > 0")
+    elif settings.ingest_enabled and settings.ingest_feeds:
+        app.state.ingest_worker = IngestWorker(
+            app.state.redis,
+            settings.ingest_feeds,
+            concurrency=settings.ingest_concurrency,
+            tokens_per_hour=settings.ingest_tokens_per_hour,
+            max_urls_per_feed=settings.ingest_max_urls_per_feed,
+        )
+        ingest_task = asyncio.create_task(app.state.ingest_worker.run(settings.ingest_interval))
 
     yield
+    if ingest_task is not None:
+        ingest_task.cancel()
+    if retention_task is not None:
+        retention_task.cancel()
     # Shutdown — always close in neo4j 5.x (mandatory in 6.x)
-    app.state.neo4j_driver.close()
+    if scrape_invalidation is not None:
+        scrape_invalidation.close()
+    if hasattr(app.state.redis, "close"):
+        app.state.redis.close()
+    if app.state.graph_writer is not None:
+        await app.state.graph_writer.close()
+    if replay_task is not None:
+        # Unreplayed graphs stay in the journal for the next start
+        replay_task.cancel()
+        await asyncio.gather(replay_task, return_exceptions=True)
+        app.state.graph_journal.close()
+    await app.state.neo4j_driver.close()
 
 
 app = FastAPI(
@@ -76,13 +176,49 @@ app.include_router(ratelimit_router)
 async def health():
     from fastapi.responses import JSONResponse
     try:
-        app.state.neo4j_driver.verify_connectivity()
+        await app.state.neo4j_driver.verify_connectivity()
         neo4j = "ok"
     except Exception:
         neo4j = "unavailable"
-    status = "ok" if neo4j == "ok" else "degraded"
-    status_code = 200 if status == "ok" else 503
+    # Missing indexes make graph writes slow, not impossible — reported,
+    # but the instance stays in rotation (200)
+    schema_missing = None
+    if neo4j == "ok":
+        try:
+            schema_missing = await missing_schema(app.state.neo4j_driver)
+        except Exception:
+            logger.warning("Neo4j schema check failed", exc_info=True)
+    status = "ok" if neo4j == "ok" and schema_missing == [] else "degraded"
+    # With write-behind on, generation keeps working while Neo4j is down
+    status_code = 200 if neo4j == "ok" or getattr(app.state, "graph_journal", None) is not None else 503
     return JSONResponse(
-        content={"status": status, "neo4j": neo4j},
+        content={"status": status, "neo4j": neo4j, "neo4j_schema": {"missing": schema_missing}},
         status_code=status_code,
     )
+
+
+@app.get("/stats")
+async def stats(request: Request, current_user: dict = Depends(get_admin_user)):
+    """Per-worker cache and scraper counters. Admins only (STATS_ADMIN_USER_IDS)."""
+    return {
+        "scrape_cache": cache_stats(),
+        "scrape_breaker": {
+            "trips": circuit_breaker.stats["trips"],
+            "fast_failures": circuit_breaker.stats["fast_failures"],
+            "open_hosts": circuit_breaker.open_hosts(),
+        },
+        "scrape_hosts": host_limiter.stats(),
+        "scrape_boilerplate": boilerplate_model.stats(),
+        "near_duplicates": neardup_stats(),
+        "graph_cache": graph_cache_stats(),
+        "graph_writes": dict(writer.stats) if (writer := getattr(request.app.state, "graph_writer", None)) else None,
+        "graph_journal": (
+            {**await asyncio.to_thread(journal.counts), **request.app.state.journal_replayer.stats}
+            if (journal := getattr(request.app.state, "graph_journal", None)) else None
+        ),
+        "retention": (
+            {"totals": dict(sweeper.stats), "last_run": sweeper.last_run}
+            if (sweeper := getattr(request.app.state, "retention_sweeper", None)) else None
+        ),
+        "ingest": dict(worker.stats) if (worker := getattr(request.app.state, "ingest_worker", None)) else None,
+    }
@@ -0,0 +1,84 @@
+import re
+
+from upstash_redis import Redis
+
+from app.config import settings
+
+# Upstash accepts extra shebang flags (e.g. allow-key-locking) that stock
+# Redis rejects with "Unexpected flag in script shebang".
+_SHEBANG = re.compile(r"\A\s*#!lua[^\n]*\n")
+
+
+def create_redis_client():
+    """
+    Builds the Redis client selected by settings.redis_backend (RATE-01, RATE-03):
+    - "upstash" (default): Upstash REST client, one HTTPS request per command
+    - "resp": native Redis protocol over a persistent connection pool
+      (e.g. the redis:7-alpine service in docker-compose.yml)
+    Returns None when the selected backend is not configured.
+    """
+    if settings.redis_backend == "resp":
+        if not settings.redis_url:
+            return None
+        return RespRedis.from_url(settings.redis_url, max_connections=settings.redis_max_connections)
+    if settings.redis_backend != "upstash":
+        raise RuntimeError(f"Unknown REDIS_BACKEND {settings.redis_backend!r} (expected 'upstash' or 'resp')")
+    if settings.upstash_redis_rest_url and settings.upstash_redis_rest_token:
+        return Redis(url=settings.upstash_redis_rest_url, token=settings.upstash_redis_rest_token)
+    return None
+
+
+class RespRedis:
+    """
+    Upstash-compatible facade over redis-py's pooled client.
+
+    Exposes the subset of the upstash_redis.Redis API the scrape cache and
+    upstash_ratelimit use (same argument shapes, str responses), so
+    app/ratelimit/cache.py and limiter.py run unchanged on either backend.
+    Sync like the Upstash client: callers already run in asyncio.to_thread.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    @classmethod
+    def from_url(cls, url: str, max_connections: int = 20) -> "RespRedis":
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError(
+                "REDIS_BACKEND=resp needs the redis package — install the 'resp' extra"
+            )
+        pool = redis.ConnectionPool.from_url(
+            url,
+            max_connections=max_connections,
+            decode_responses=True,
+            health_check_interval=30,
+        )
+        return cls(redis.Redis(connection_pool=pool))
+
+    def get(self, key: str):
+        return self._client.get(key)
+
+    def set(self, key: str, value, ex: int | None = None, nx: bool = False):
+        return self._client.set(key, value, ex=ex, nx=nx)
+
+    def delete(self, *keys: str) -> int:
+        return self._client.delete(*keys)
+
+    def ttl(self, key: str) -> int:
+        return self._client.ttl(key)
+
+    def publish(self, channel: str, message: str) -> int:
+        return self._client.publish(channel, message)
+
+    def eval(self, script: str, keys: list[str] | None = None, args: list | None = None):
+        keys = keys or []
+        script = _SHEBANG.sub("", script, count=1)
+        return self._client.eval(script, len(keys), *keys, *(args or []))
+
+    def pubsub(self):
+        return self._client.pubsub(ignore_subscribe_messages=True)
+
+    def close(self) -> None:
+        self._client.close()
@@ -1,28 +1,340 @@
+import base64
 import hashlib
+import json
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+
+from app.config import settings
+from app.localcache import LocalTTLCache
+from app.scraper.canonical import canonicalize_url
+from app.scraper.scraper import EXTRACTOR_VERSION
+
+logger = logging.getLogger(__name__)
+
+SCRAPE_TTL_SECONDS = 3600
+# Entries stay in Redis this long past SCRAPE_TTL_SECONDS so that, while one
+# request re-scrapes an expired URL, concurrent requests serve the stale copy.
+SCRAPE_STALE_SECONDS = 600
+# Distributed refresh lock — one re-scrape per URL at a time
+SCRAPE_LOCK_SECONDS = 30
+# XFetch early-refresh aggressiveness (1.0 = the paper's default)
+XFETCH_BETA = 1.0
+# Bump when the entry layout below changes. The version is part of the key,
+# so entries written in an older layout are simply never read again.
+CACHE_FORMAT_VERSION = 2
+INVALIDATION_CHANNEL = "scrape:invalidate"
+
+# First tier: decoded entries held per worker process, write-through to Redis.
+_local = LocalTTLCache(
+    max_bytes=settings.scrape_local_cache_bytes,
+    ttl=settings.scrape_local_cache_ttl,
+)
+_redis_stats: Counter = Counter()
+_stampede_stats: Counter = Counter()
+# Tags invalidation messages so a worker ignores its own publishes
+_WORKER_ID = uuid.uuid4().hex[:12]
 
 
 def _cache_key(url: str) -> str:
-    normalized = url.strip().lower().rstrip("/")
-    url_hash = hashlib.sha256(normalized.encode()).hexdigest()
-    return f"scrape:{url_hash}"
+    url_hash = hashlib.sha256(canonicalize_url(url).encode()).hexdigest()
+    return f"scrape:v{CACHE_FORMAT_VERSION}:{url_hash}"
 
 
-def get_cached_scrape(redis, url: str) -> tuple[str | None, int | None]:
-    """Returns (cached_text, seconds_ago) or (None, None)."""
+def _negative_key(url: str) -> str:
+    url_hash = hashlib.sha256(canonicalize_url(url).encode()).hexdigest()
+    return f"scrape:neg:{url_hash}"
+
+
+@dataclass
+class CachedScrape:
+    text: str
+    seconds_ago: int
+    final_url: str | None
+    stale: bool     # past SCRAPE_TTL_SECONDS — only served while a refresh is running
+    refresh: bool   # stale, or picked for probabilistic early refresh
+    etag: str | None = None           # origin validators for a conditional refresh
+    last_modified: str | None = None
+
+
+def _encode_entry(
+    text: str,
+    final_url: str | None,
+    stored_at: float,
+    compute_ms: int = 0,
+    etag: str | None = None,
+    last_modified: str | None = None,
+) -> str:
+    """
+    Serializes a scrape into a compact JSON envelope:
+        x  — extractor version that produced the text
+        ts — unix time the entry was stored (cache age without a TTL call)
+        h  — sha256 of the text (integrity check on read)
+        u  — final URL after redirects
+        d  — milliseconds the scrape took (XFetch recompute cost)
+        e  — origin ETag, if any (conditional refresh)
+        m  — origin Last-Modified, if any (conditional refresh)
+        z  — zlib-compressed text, base64 encoded (Upstash REST values are strings)
+    """
+    raw = text.encode()
+    return json.dumps(
+        {
+            "x": EXTRACTOR_VERSION,
+            "ts": int(stored_at),
+            "h": hashlib.sha256(raw).hexdigest(),
+            "u": final_url,
+            "d": compute_ms,
+            "e": etag,
+            "m": last_modified,
+            "z": base64.b64encode(zlib.compress(raw, 6)).decode("ascii"),
+        },
+        separators=(",", ":"),
+    )
+
+
+def _decode_entry(value) -> dict | None:
+    """Returns {"text", "stored_at", "final_url", "compute_ms", "etag", "last_modified"}
+    or None if the entry is unusable
+    (corrupt, wrong shape, or written by a different extractor version)."""
+    try:
+        entry = json.loads(value)
+        if entry.get("x") != EXTRACTOR_VERSION:
+            return None
+        raw = zlib.decompress(base64.b64decode(entry["z"]))
+        if hashlib.sha256(raw).hexdigest() != entry["h"]:
+            return None
+        return {
+            "text": raw.decode(),
+            "stored_at": entry["ts"],
+            "final_url": entry.get("u"),
+            "compute_ms": entry.get("d", 0),
+            "etag": entry.get("e"),
+            "last_modified": entry.get("m"),
+        }
+    except (ValueError, KeyError, TypeError, AttributeError, zlib.error):
+        return None
+
+
+def lookup_scrape(redis, url: str) -> CachedScrape | None:
+    """
+    Reads a cached scrape (local tier first, at most one Redis GET) and decides
+    whether the caller should refresh it. Besides hard expiry, entries are
+    refreshed early with a probability that rises as expiry nears (XFetch:
+    now - compute_time * beta * ln(rand) >= expiry), so a popular URL is
+    usually re-scraped by one request before every request misses at once.
+    """
     if redis is None:
-        return None, None
+        return None
     key = _cache_key(url)
-    text = redis.get(key)
-    if text is None:
+    entry = _local.get(key)
+    if entry is None:
+        value = redis.get(key)
+        entry = _decode_entry(value) if value is not None else None
+        if entry is None:
+            _redis_stats["misses"] += 1
+            return None
+        _redis_stats["hits"] += 1
+        _remember(key, entry)
+    now = time.time()
+    expires_at = entry["stored_at"] + SCRAPE_TTL_SECONDS
+    stale = now >= expires_at
+    early = not stale and (
+        now - entry["compute_ms"] / 1000 * XFETCH_BETA * math.log(1.0 - random.random()) >= expires_at
+    )
+    if stale:
+        _stampede_stats["stale_hits"] += 1
+    elif early:
+        _stampede_stats["early_refreshes"] += 1
+    return CachedScrape(
+        text=entry["text"],
+        seconds_ago=max(0, int(now) - entry["stored_at"]),
+        final_url=entry["final_url"],
+        stale=stale,
+        refresh=stale or early,
+        etag=entry.get("etag"),
+        last_modified=entry.get("last_modified"),
+    )
+
+
+def get_cached_scrape(redis, url: str) -> tuple[str | None, int | None]:
+    """Returns (cached_text, seconds_ago) or (None, None) for fresh entries.
+    Checks the in-process tier first; at most one Redis GET per lookup."""
+    cached = lookup_scrape(redis, url)
+    if cached is None or cached.stale:
         return None, None
-    ttl = redis.ttl(key)
-    seconds_ago = 3600 - ttl if ttl and ttl > 0 else None
-    return text, seconds_ago
+    return cached.text, cached.seconds_ago
 
 
-def cache_scrape(redis, url: str, text: str) -> None:
-    """Store scraped text with 1-hour TTL."""
+def cache_scrape(
+    redis,
+    url: str,
+    text: str,
+    final_url: str | None = None,
+    invalidate: bool = False,  # force_refresh rewrite — tell other workers
+    compute_ms: int = 0,       # how long the scrape took, drives early refresh
+    aliases: list[str] | None = None,  # other URLs for the same page (rel=canonical)
+    etag: str | None = None,           # origin validators, sent on the next refresh
+    last_modified: str | None = None,
+) -> None:
+    """Store scraped text (compressed, with metadata) — fresh for 1 hour,
+    kept SCRAPE_STALE_SECONDS longer for stale-while-refresh.
+    Writes through to Redis and the local tier. The same entry is also stored
+    under each alias key so later requests for those URLs hit with one GET."""
     if redis is None:
         return
     key = _cache_key(url)
-    redis.set(key, text, ex=3600)
+    keys = [key] + [k for k in dict.fromkeys(_cache_key(a) for a in aliases or []) if k != key]
+    stored_at = time.time()
+    value = _encode_entry(text, final_url, stored_at, compute_ms, etag, last_modified)
+    entry = {
+        "text": text,
+        "stored_at": int(stored_at),
+        "final_url": final_url,
+        "compute_ms": compute_ms,
+        "etag": etag,
+        "last_modified": last_modified,
+    }
+    for k in keys:
+        redis.set(k, value, ex=SCRAPE_TTL_SECONDS + SCRAPE_STALE_SECONDS)
+        _remember(k, entry)
+    _redis_stats["alias_writes"] += len(keys) - 1
+    if invalidate and settings.scrape_cache_invalidation:
+        for k in keys:
+            try:
+                redis.publish(INVALIDATION_CHANNEL, f"{_WORKER_ID} {k}")
+            except Exception:
+                logger.warning("Failed to publish scrape cache invalidation", exc_info=True)
+
+
+def _remember(key: str, entry: dict) -> None:
+    # Local copies never outlive freshness — stale reads go to Redis so the
+    # refresh lock decides who re-scrapes.
+    remaining = entry["stored_at"] + SCRAPE_TTL_SECONDS - time.time()
+    _local.set(key, entry, size=len(entry["text"].encode()), ttl=remaining)
+
+
+def cache_scrape_failure(redis, url: str, detail: dict) -> None:
+    """Remembers a scrape_failed result (paywall, 4xx, non-HTML) for
+    scrape_negative_ttl seconds so repeat requests fail without a fetch."""
+    if redis is None or settings.scrape_negative_ttl <= 0:
+        return
+    key = _negative_key(url)
+    redis.set(key, json.dumps(detail, separators=(",", ":")), ex=settings.scrape_negative_ttl)
+    _local.set(key, detail, size=len(key), ttl=settings.scrape_negative_ttl)
+
+
+def get_scrape_failure(redis, url: str) -> dict | None:
+    """Returns the stored scrape_failed detail for url, or None."""
+    if redis is None or settings.scrape_negative_ttl <= 0:
+        return None
+    key = _negative_key(url)
+    detail = _local.get(key)
+    if detail is None:
+        value = redis.get(key)
+        if value is None:
+            return None
+        try:
+            detail = json.loads(value)
+        except (ValueError, TypeError):
+            return None
+        if not isinstance(detail, dict):
+            return None
+        _local.set(key, detail, size=len(key), ttl=settings.scrape_negative_ttl)
+    _redis_stats["negative_hits"] += 1
+    return detail
+
+
+_RELEASE_LOCK = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+def acquire_refresh_lock(redis, url: str) -> str | None:
+    """Tries to become the one request that re-scrapes url.
+    Returns a lock token, or None if another request holds the lock."""
+    if redis is None:
+        return None
+    token = uuid.uuid4().hex
+    if redis.set(f"{_cache_key(url)}:lock", token, ex=SCRAPE_LOCK_SECONDS, nx=True):
+        _stampede_stats["lock_acquired"] += 1
+        return token
+    _stampede_stats["lock_contended"] += 1
+    return None
+
+
+def release_refresh_lock(redis, url: str, token: str) -> None:
+    """Releases the lock only if it is still ours (it may have expired and
+    been taken by another request)."""
+    try:
+        redis.eval(_RELEASE_LOCK, [f"{_cache_key(url)}:lock"], [token])
+    except Exception:
+        logger.warning("Failed to release scrape refresh lock", exc_info=True)
+
+
+def record_stale_served() -> None:
+    _stampede_stats["stale_served"] += 1
+
+
+def record_revalidated() -> None:
+    _stampede_stats["revalidated"] += 1
+
+
+def listen_for_invalidations(redis):
+    """
+    Subscribes to INVALIDATION_CHANNEL on a background thread and drops keys
+    rewritten by other workers from the local tier.
+    Returns the pubsub handle (close it on shutdown), or None when the client
+    has no pub/sub support — the Upstash REST client cannot subscribe, so
+    local entries then only age out after scrape_local_cache_ttl.
+    """
+    if redis is None or not hasattr(redis, "pubsub"):
+        return None
+    pubsub = redis.pubsub()
+    pubsub.subscribe(INVALIDATION_CHANNEL)
+
+    def run() -> None:
+        try:
+            for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                data = message["data"]
+                if isinstance(data, bytes):
+                    data = data.decode()
+                origin, _, key = data.partition(" ")
+                if origin != _WORKER_ID:
+                    _local.pop(key)
+        except Exception:
+            logger.info("Scrape cache invalidation listener stopped", exc_info=True)
+
+    threading.Thread(target=run, name="scrape-cache-invalidation", daemon=True).start()
+    return pubsub
+
+
+def cache_stats() -> dict:
+    """Hit/miss/eviction counters per tier, plus stampede-protection counters,
+    for this worker."""
+    return {
+        "local": _local.stats(),
+        "redis": {
+            "hits": _redis_stats["hits"],
+            "misses": _redis_stats["misses"],
+            "alias_writes": _redis_stats["alias_writes"],
+            "negative_hits": _redis_stats["negative_hits"],
+        },
+        "stampede": {
+            name: _stampede_stats[name]
+            for name in (
+                "early_refreshes", "stale_hits", "stale_served", "revalidated",
+                "lock_acquired", "lock_contended",
+            )
+        },
+    }
@@ -1,31 +1,47 @@
+import threading
 import time
+from dataclasses import dataclass
 
 from fastapi import HTTPException
 from upstash_ratelimit import Ratelimit, FixedWindow
+from upstash_ratelimit.limiter import Response
 
+from app.config import settings
 
-def _build_limiters(redis):
-    """Build anon and auth rate limiters from a Redis instance."""
+DAILY_LIMIT = 3
+WINDOW_SECONDS = 86400
+
+
+def build_limiters(redis):
+    """Build anon and auth rate limiters from a Redis instance.
+    Called once in lifespan (app.state.rate_limiters); None when Redis is not
+    configured. With RATELIMIT_HYBRID each limiter is wrapped in HybridRatelimit."""
+    if redis is None:
+        return None
     anon = Ratelimit(
         redis=redis,
-        limiter=FixedWindow(max_requests=3, window=86400),
+        limiter=FixedWindow(max_requests=DAILY_LIMIT, window=WINDOW_SECONDS),
         prefix="ratelimit:anon",
     )
     auth = Ratelimit(
         redis=redis,
-        limiter=FixedWindow(max_requests=3, window=86400),
+        limiter=FixedWindow(max_requests=DAILY_LIMIT, window=WINDOW_SECONDS),
         prefix="ratelimit:auth",
     )
+    if settings.ratelimit_hybrid:
+        margin = settings.ratelimit_local_margin
+        anon = HybridRatelimit(anon, DAILY_LIMIT, WINDOW_SECONDS, margin)
+        auth = HybridRatelimit(auth, DAILY_LIMIT, WINDOW_SECONDS, margin)
     return anon, auth
 
 
-def check_rate_limit(redis, user_id: str, ip: str) -> None:
+def check_rate_limit(limiters, user_id: str, ip: str) -> None:
     """Check per-user daily rate limit. Raises HTTPException(429) if exceeded.
     Skips check if Redis is not configured (dev without Upstash)."""
-    if redis is None:
+    if limiters is None:
         return
     is_anonymous = user_id == "anonymous"
-    anon_limiter, auth_limiter = _build_limiters(redis)
+    anon_limiter, auth_limiter = limiters
     limiter = anon_limiter if is_anonymous else auth_limiter
     identifier = ip if is_anonymous else user_id
     result = limiter.limit(identifier)
@@ -42,17 +58,93 @@ def check_rate_limit(redis, user_id: str, ip: str) -> None:
         )
 
 
-def get_usage(redis, user_id: str, ip: str) -> dict:
+def get_usage(limiters, user_id: str, ip: str) -> dict:
     """Return usage info without consuming a request.
     Uses the ratelimit SDK's get_remaining/get_reset to peek at state."""
-    if redis is None:
+    if limiters is None:
         return {"used": 0, "limit": 0, "reset": 0}
     is_anonymous = user_id == "anonymous"
-    anon_limiter, auth_limiter = _build_limiters(redis)
+    anon_limiter, auth_limiter = limiters
     limiter = anon_limiter if is_anonymous else auth_limiter
     identifier = ip if is_anonymous else user_id
-    max_requests = 3
+    max_requests = DAILY_LIMIT
     remaining = limiter.get_remaining(identifier)
     reset = limiter.get_reset(identifier)
     used = max_requests - remaining
     return {"used": used, "limit": max_requests, "reset": int(reset)}
+
+
+@dataclass
+class _LocalWindow:
+    window: int      # fixed-window number the counts belong to
+    remaining: int   # remaining quota as last reported by Redis
+    pending: int     # requests allowed locally, not yet reported to Redis
+
+
+class HybridRatelimit:
+    """
+    Answers clear-cut rate-limit decisions in process; only requests near the
+    quota boundary reconcile with Redis (one EVAL that also reports the
+    locally allowed requests via rate=pending+1).
+
+    - Clearly denied: Redis already reported 0 remaining in this window.
+      Counts never go down inside a fixed window, so this is always correct.
+    - Clearly allowed: remaining - pending > local_margin.
+    - Otherwise (first request in the window, or near the boundary): Redis.
+
+    Worst-case overshoot: a worker allows at most max_requests - local_margin - 1
+    requests per identifier without reporting them, so with W workers one
+    window can admit up to (W - 1) * (max_requests - local_margin - 1) requests
+    over the limit. A single worker never overshoots. local_margin >=
+    max_requests - 1 disables local allows (only local denies remain).
+    """
+
+    _PRUNE_AT = 10_000  # identifiers tracked before stale windows are dropped
+
+    def __init__(self, remote: Ratelimit, max_requests: int, window: int, local_margin: int = 1):
+        self._remote = remote
+        self._max_requests = max_requests
+        self._window = window
+        self._margin = local_margin
+        self._state: dict[str, _LocalWindow] = {}
+        self._lock = threading.Lock()
+
+    def limit(self, identifier: str) -> Response:
+        now = time.time()
+        window = int(now // self._window)
+        reset = float((window + 1) * self._window)
+        with self._lock:
+            state = self._state.get(identifier)
+            if state is not None and state.window == window:
+                available = state.remaining - state.pending
+                if available <= 0:
+                    return Response(allowed=False, limit=self._max_requests, remaining=0, reset=reset)
+                if available > self._margin:
+                    state.pending += 1
+                    return Response(
+                        allowed=True, limit=self._max_requests, remaining=available - 1, reset=reset,
+                    )
+                rate = state.pending + 1
+                state.pending = 0
+            else:
+                rate = 1
+
+        result = self._remote.limit(identifier, rate=rate)
+        with self._lock:
+            if len(self._state) >= self._PRUNE_AT:
+                self._state = {k: v for k, v in self._state.items() if v.window == window}
+            current = self._state.get(identifier)
+            pending = current.pending if current is not None and current.window == window else 0
+            self._state[identifier] = _LocalWindow(window=window, remaining=result.remaining, pending=pending)
+        return result
+
+    def get_remaining(self, identifier: str) -> int:
+        remaining = self._remote.get_remaining(identifier)
+        with self._lock:
+            state = self._state.get(identifier)
+            if state is not None and state.window == int(time.time() // self._window):
+                remaining -= state.pending
+        return max(0, remaining)
+
+    def get_reset(self, identifier: str) -> float:
+        return self._remote.get_reset(identifier)
@@ -0,0 +1,172 @@
+import hashlib
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+
+from app.config import settings
+
+_WS = re.compile(r"\s+")
+
+# Document keys remembered per host — a document seen again within this many
+# keys is not counted again
+_RECENT_KEYS = 512
+
+
+def paragraph_hash(text: str) -> int:
+    """64-bit fingerprint of a paragraph, insensitive to case and whitespace."""
+    normalized = _WS.sub(" ", text).strip().lower()
+    return int.from_bytes(hashlib.blake2b(normalized.encode(), digest_size=8).digest(), "big")
+
+
+@dataclass
+class _HostModel:
+    epoch: int = 0        # pages observed for this host
+    pages: float = 0.0    # decayed page count
+    # paragraph hash -> (decayed page count at `epoch`, epoch of last update)
+    counts: dict[int, tuple[float, int]] = field(default_factory=dict)
+    # document keys already counted (rel=canonical/URL and content), oldest first
+    recent: OrderedDict[str, None] = field(default_factory=OrderedDict)
+    stats: Counter = field(default_factory=Counter)
+
+
+class BoilerplateModel:
+    """
+    Per-domain model of paragraphs that recur across pages (per worker
+    process): disclaimers, author bios, subscription blurbs.
+
+    Each successfully scraped page adds its distinct paragraph hashes. Counts
+    decay by `decay` per page seen on the host, so chrome that a site stops
+    using fades out. A paragraph is boilerplate once it appeared on at least
+    `min_pages` (decayed) pages and on at least `ratio` of the host's pages —
+    an article's own paragraphs appear on one page only. A document counts
+    once however often it is submitted: pages are keyed on their rel=canonical
+    (or canonicalized) URL and on a fingerprint of their paragraphs, and a
+    page matching either recent key is not counted — query-string variants of
+    one article cannot push its own paragraphs over the threshold.
+    min_pages <= 0 disables the model.
+    """
+
+    def __init__(
+        self,
+        min_pages: float,
+        ratio: float,
+        decay: float,
+        max_hosts: int = 1000,
+        max_paragraphs: int = 4096,
+    ):
+        self.min_pages = min_pages
+        self.ratio = ratio
+        self.decay = decay
+        self.max_hosts = max_hosts
+        self.max_paragraphs = max_paragraphs
+        self._hosts: OrderedDict[str, _HostModel] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def page_filter(self, host: str) -> "PageFilter | None":
+        """A filter for one page of host, or None when the model is disabled."""
+        if self.min_pages <= 0 or not host:
+            return None
+        return PageFilter(self, host.lower().removeprefix("www."))
+
+    def _count(self, model: _HostModel, h: int) -> float:
+        count, epoch = model.counts.get(h, (0.0, model.epoch))
+        return count * self.decay ** (model.epoch - epoch)
+
+    def is_boilerplate(self, host: str, h: int) -> bool:
+        with self._lock:
+            model = self._hosts.get(host)
+            if model is None or model.pages <= 0:
+                return False
+            count = self._count(model, h)
+            return count >= self.min_pages and count >= self.ratio * model.pages
+
+    def observe(self, host: str, page_keys: list[str], hashes: set[int]) -> None:
+        with self._lock:
+            model = self._hosts.get(host)
+            if model is None:
+                model = self._hosts[host] = _HostModel()
+                if len(self._hosts) > self.max_hosts:
+                    self._hosts.popitem(last=False)
+            self._hosts.move_to_end(host)
+            if any(key in model.recent for key in page_keys):
+                for key in page_keys:
+                    model.recent[key] = None
+                    model.recent.move_to_end(key)
+                return
+            for key in page_keys:
+                model.recent[key] = None
+            while len(model.recent) > _RECENT_KEYS:
+                model.recent.popitem(last=False)
+            model.epoch += 1
+            model.pages = model.pages * self.decay + 1
+            model.stats["pages"] += 1
+            for h in hashes:
+                model.counts[h] = (self._count(model, h) * self.decay + 1, model.epoch)
+            if len(model.counts) > self.max_paragraphs:
+                # Drop the weakest quarter (one-off article paragraphs) in one
+                # pass, so the sort runs once per max_paragraphs / 4 new
+                # paragraphs rather than on every page
+                ranked = sorted(model.counts, key=lambda k: self._count(model, k))
+                for h in ranked[: len(model.counts) - self.max_paragraphs * 3 // 4]:
+                    del model.counts[h]
+
+    def record_dropped(self, host: str, paragraphs: int, chars: int) -> None:
+        with self._lock:
+            model = self._hosts.get(host)
+            if model is not None:
+                model.stats["paragraphs_dropped"] += paragraphs
+                model.stats["bytes_saved"] += chars
+
+    def stats(self, top: int = 20) -> dict[str, dict]:
+        """Per-domain counters for the `top` domains by bytes saved."""
+        with self._lock:
+            ranked = sorted(self._hosts.items(), key=lambda item: item[1].stats["bytes_saved"], reverse=True)
+            return {
+                host: {name: model.stats[name] for name in ("pages", "paragraphs_dropped", "bytes_saved")}
+                for host, model in ranked[:top]
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hosts.clear()
+
+
+class PageFilter:
+    """
+    Paragraph filter for one page, passed to _TextExtractor. drop() decides
+    against the model as built from earlier pages; commit() then adds this
+    page's paragraphs to the model.
+    """
+
+    def __init__(self, model: BoilerplateModel, host: str):
+        self._model = model
+        self.host = host
+        self._hashes: set[int] = set()
+        self._dropped = 0
+        self._dropped_chars = 0
+
+    def drop(self, text: str) -> bool:
+        h = paragraph_hash(text)
+        self._hashes.add(h)
+        if self._model.is_boilerplate(self.host, h):
+            self._dropped += 1
+            self._dropped_chars += len(text.encode())
+            return True
+        return False
+
+    def commit(self, page_key: str) -> None:
+        """Adds the page to the model. page_key: its rel=canonical or canonicalized URL."""
+        content = hashlib.blake2b(
+            b"".join(h.to_bytes(8, "big") for h in sorted(self._hashes)), digest_size=8,
+        ).hexdigest()
+        self._model.observe(self.host, [page_key, f"content:{content}"], self._hashes)
+        if self._dropped:
+            self._model.record_dropped(self.host, self._dropped, self._dropped_chars)
+
+
+boilerplate_model = BoilerplateModel(
+    min_pages=settings.scrape_boilerplate_min_pages,
+    ratio=settings.scrape_boilerplate_ratio,
+    decay=settings.scrape_boilerplate_decay,
+)
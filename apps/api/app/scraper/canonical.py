@@ -0,0 +1,58 @@
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from app.config import settings
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Canonical form of a URL for cache keys and de-duplication (RATE-03).
+
+    - scheme and host are lowercased; path, query values keep their case
+      (paths are case-sensitive on most servers)
+    - default ports, userinfo and fragments are dropped
+    - a leading "www." is dropped when SCRAPE_CANONICAL_STRIP_WWW is set
+    - tracking parameters from SCRAPE_TRACKING_PARAMS are removed
+      (entries ending in "*" match by prefix, e.g. "utm_*")
+    - remaining query parameters are sorted; a trailing "/" is dropped
+
+    Only used to build keys — the scraper still fetches the URL as given.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if settings.scrape_canonical_strip_www:
+        host = host.removeprefix("www.")
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port is not None and port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+
+    query = sorted(
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(name)
+    )
+    return urlunsplit((scheme, host, parts.path.rstrip("/"), urlencode(query), ""))
+
+
+def same_site(url_a: str, url_b: str) -> bool:
+    """True when both URLs are on the same host (ignoring case and "www.")."""
+    host_a = (urlsplit(url_a).hostname or "").removeprefix("www.")
+    host_b = (urlsplit(url_b).hostname or "").removeprefix("www.")
+    return bool(host_a) and host_a == host_b
+
+
+def _is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    for pattern in settings.scrape_tracking_params:
+        pattern = pattern.lower()
+        if pattern.endswith("*"):
+            if name.startswith(pattern[:-1]):
+                return True
+        elif name == pattern:
+            return True
+    return False
@@ -0,0 +1,203 @@
+import asyncio
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+from fastapi import HTTPException
+
+from app.config import settings
+
+
+def host_of(url: str) -> str:
+    return (urlsplit(url).hostname or "").lower()
+
+
+@dataclass
+class _Circuit:
+    failures: int = 0          # consecutive timeouts / connect errors
+    open_until: float = 0.0    # monotonic time the cooldown ends
+    probing: bool = False      # half-open: one trial request in flight
+
+
+class HostCircuitBreaker:
+    """
+    Per-host circuit breaker for the scraper (per worker process).
+
+    After `threshold` consecutive timeouts or connect errors for a host the
+    circuit opens and scrapes to that host fail fast with 503 for `cooldown`
+    seconds. After the cooldown one trial request is let through (half-open):
+    success closes the circuit, another failure re-opens it. A trial that
+    ends any other way (cancelled, queue timeout, 4xx) must call end_probe
+    so the next request can be the trial.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.stats: Counter = Counter()
+        self._circuits: dict[str, _Circuit] = {}
+        self._lock = threading.Lock()
+
+    def check(self, host: str) -> bool:
+        """
+        Raises HTTPException(503) while the host's circuit is open. Returns
+        True when the caller's request is the half-open trial.
+        """
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None or circuit.failures < self.threshold:
+                return False
+            if time.monotonic() >= circuit.open_until and not circuit.probing:
+                circuit.probing = True  # half-open — this request is the trial
+                return True
+            self.stats["fast_failures"] += 1
+        raise HTTPException(status_code=503, detail={
+            "error": "service_unavailable",
+            "message": "That site is not responding right now — try again in a few minutes or paste the text instead",
+        })
+
+    def record_success(self, host: str) -> None:
+        with self._lock:
+            self._circuits.pop(host, None)
+
+    def end_probe(self, host: str) -> None:
+        """Lets another trial through after one that ended without a verdict."""
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is not None:
+                circuit.probing = False
+
+    def record_failure(self, host: str) -> None:
+        with self._lock:
+            circuit = self._circuits.setdefault(host, _Circuit())
+            circuit.failures += 1
+            circuit.probing = False
+            if circuit.failures >= self.threshold:
+                if circuit.failures == self.threshold:
+                    self.stats["trips"] += 1
+                circuit.open_until = time.monotonic() + self.cooldown
+
+    def open_hosts(self) -> list[str]:
+        now = time.monotonic()
+        with self._lock:
+            return sorted(
+                host for host, c in self._circuits.items()
+                if c.failures >= self.threshold and c.open_until > now
+            )
+
+    def reset(self) -> None:
+        with self._lock:
+            self._circuits.clear()
+            self.stats.clear()
+
+
+circuit_breaker = HostCircuitBreaker(
+    threshold=settings.scrape_breaker_threshold,
+    cooldown=settings.scrape_breaker_cooldown,
+)
+
+
+@dataclass
+class _HostSlots:
+    semaphore: asyncio.Semaphore
+    users: int = 0   # holders + waiters; the entry is dropped at 0
+
+
+class HostConcurrencyLimiter:
+    """
+    Caps concurrent fetches per destination host (per worker process) so a
+    burst of submissions for one site queues instead of opening one
+    connection per request and tripping the origin's rate limiting.
+
+    Limits come from `limits` (host -> max connections, "www." ignored) or
+    `default`. A request that queues longer than `timeout` seconds fails with
+    503. Wait times are recorded for /stats for the `max_hosts` most
+    recently used hosts.
+    """
+
+    def __init__(
+        self,
+        default: int,
+        limits: dict[str, int] | None = None,
+        timeout: float = 5.0,
+        max_hosts: int = 1000,
+    ):
+        self.default = default
+        self.limits = {h.lower().removeprefix("www."): n for h, n in (limits or {}).items()}
+        self.timeout = timeout
+        self.max_hosts = max_hosts
+        self._slots: dict[str, _HostSlots] = {}
+        self._stats: OrderedDict[str, Counter] = OrderedDict()
+
+    async def acquire(self, host: str) -> None:
+        """Waits for a free slot for host. Raises HTTPException(503) on timeout."""
+        key = host.removeprefix("www.")
+        slots = self._slots.get(key)
+        if slots is None:
+            slots = self._slots[key] = _HostSlots(asyncio.Semaphore(self.limits.get(key, self.default)))
+        slots.users += 1
+        stats = self._host_stats(key)
+        started = time.monotonic()
+        if slots.semaphore.locked():
+            stats["queued"] += 1
+        try:
+            await asyncio.wait_for(slots.semaphore.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._leave(key, slots)
+            stats["timeouts"] += 1
+            raise HTTPException(status_code=503, detail={
+                "error": "service_unavailable",
+                "message": "Too many requests to that site right now — try again in a moment",
+            })
+        except BaseException:
+            self._leave(key, slots)
+            raise
+        waited_ms = int((time.monotonic() - started) * 1000)
+        stats["acquired"] += 1
+        stats["wait_ms_total"] += waited_ms
+        stats["wait_ms_max"] = max(stats["wait_ms_max"], waited_ms)
+
+    def _host_stats(self, key: str) -> Counter:
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = Counter()
+            if len(self._stats) > self.max_hosts:
+                self._stats.popitem(last=False)
+        self._stats.move_to_end(key)
+        return stats
+
+    def release(self, host: str) -> None:
+        key = host.removeprefix("www.")
+        slots = self._slots.get(key)
+        if slots is not None:
+            slots.semaphore.release()
+            self._leave(key, slots)
+
+    def _leave(self, key: str, slots: _HostSlots) -> None:
+        slots.users -= 1
+        if slots.users == 0 and self._slots.get(key) is slots:
+            del self._slots[key]
+
+    def stats(self, top: int = 20) -> dict[str, dict]:
+        """Per-host counters for the `top` hosts with the most queueing time."""
+        busiest = sorted(self._stats.items(), key=lambda item: item[1]["wait_ms_total"], reverse=True)
+        return {
+            host: {
+                name: counters[name]
+                for name in ("acquired", "queued", "timeouts", "wait_ms_total", "wait_ms_max")
+            }
+            for host, counters in busiest[:top]
+        }
+
+    def reset(self) -> None:
+        self._slots.clear()
+        self._stats.clear()
+
+
+host_limiter = HostConcurrencyLimiter(
+    default=settings.scrape_host_concurrency,
+    limits=settings.scrape_host_limits,
+    timeout=settings.scrape_host_queue_timeout,
+)
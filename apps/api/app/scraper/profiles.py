@@ -0,0 +1,135 @@
+import re
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+# tag, .class and #id parts, e.g. "div.article-body", ".newsletter", "#content"
+_SELECTOR = re.compile(r"^([a-z][a-z0-9-]*)?((?:[.#][\w-]+)*)$", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class Selector:
+    """A compiled simple selector: optional tag plus any number of classes and an id."""
+
+    tag: str | None
+    id: str | None
+    classes: frozenset[str]
+
+    def matches(self, el) -> bool:
+        if self.tag is not None and el.tag != self.tag:
+            return False
+        if self.id is not None and el.get("id") != self.id:
+            return False
+        if self.classes and not self.classes.issubset((el.get("class") or "").split()):
+            return False
+        return True
+
+
+def compile_selector(selector: str) -> Selector:
+    """
+    Compiles "tag", ".class", "#id" and combinations like "div.body.main".
+    Descendant/attribute selectors are not supported — the extractor matches
+    elements one at a time as the page streams in.
+    """
+    m = _SELECTOR.match(selector.strip())
+    if not m or not selector.strip():
+        raise ValueError(f"Unsupported extraction selector: {selector!r}")
+    tag, rest = m.group(1), m.group(2)
+    ids = re.findall(r"#([\w-]+)", rest)
+    if len(ids) > 1:
+        raise ValueError(f"Unsupported extraction selector: {selector!r}")
+    return Selector(
+        tag=tag.lower() if tag else None,
+        id=ids[0] if ids else None,
+        classes=frozenset(re.findall(r"\.([\w-]+)", rest)),
+    )
+
+
+@dataclass(frozen=True)
+class ExtractionProfile:
+    """
+    Extraction rules for one site, used by _TextExtractor instead of the
+    generic <article>/<p> heuristic:
+    - content: elements whose text is the article body (first match wins per
+      element; nested matches are part of the outer one)
+    - drop: elements removed with everything inside (related stories,
+      newsletter boxes, ad slots) — also applied to the generic fallback
+    - max_sections: stop after this many content elements (None = no cap)
+
+    When no content element is found (site redesign) the generic extraction
+    of the same document is used.
+    """
+
+    hosts: tuple[str, ...]
+    content: tuple[Selector, ...]
+    drop: tuple[Selector, ...] = ()
+    max_sections: int | None = None
+
+    def is_content(self, el) -> bool:
+        return any(s.matches(el) for s in self.content)
+
+    def is_dropped(self, el) -> bool:
+        return any(s.matches(el) for s in self.drop)
+
+
+def _profile(hosts, content, drop=(), max_sections=None) -> ExtractionProfile:
+    return ExtractionProfile(
+        hosts=tuple(hosts),
+        content=tuple(compile_selector(s) for s in content),
+        drop=tuple(compile_selector(s) for s in drop),
+        max_sections=max_sections,
+    )
+
+
+# Compiled once at import. Hosts match exactly or as a parent domain, with
+# "www." ignored. Bump EXTRACTOR_VERSION in scraper.py when editing these.
+# Check selector edits against real saved article pages
+# (`python -m benchmarks.extraction_profiles --page saved.html URL`) — the
+# bundled benchmark fixtures are synthetic and only exercise the extractor.
+PROFILES: tuple[ExtractionProfile, ...] = (
+    _profile(
+        hosts=["coindesk.com"],
+        content=["div.document-body", "div.at-content-wrapper"],
+        drop=[
+            "div.article-ad", "div.newsletter-signup", "div.in-article-newsletter",
+            "div.related-articles", "div.most-read", "div.tags", "section.read-more",
+        ],
+        max_sections=1,
+    ),
+    _profile(
+        hosts=["theblock.co"],
+        content=["div.articleContent", "#articleContent"],
+        drop=["div.articleAd", "div.newsletterSignup", "div.relatedArticles", "div.tagList", "div.disclaimer"],
+        max_sections=1,
+    ),
+    _profile(
+        hosts=["techcrunch.com"],
+        content=["div.wp-block-post-content", "div.article-content", "div.entry-content"],
+        drop=["div.inline-cta", "div.newsletter-signup", "div.related-posts", "div.wp-block-tc23-podcast-player"],
+        max_sections=1,
+    ),
+    _profile(
+        hosts=["decrypt.co"],
+        content=["div.post-content"],
+        drop=["div.newsletter", "div.related-articles", "div.daily-debrief"],
+        max_sections=1,
+    ),
+    _profile(
+        hosts=["cointelegraph.com"],
+        content=["div.post-content"],
+        drop=["div.post-content__related", "div.newsletter-subscription", "div.post__tags"],
+        max_sections=1,
+    ),
+)
+
+_BY_HOST: dict[str, ExtractionProfile] = {host: p for p in PROFILES for host in p.hosts}
+
+
+def profile_for(url: str) -> ExtractionProfile | None:
+    """The extraction profile for url's host or a parent domain, or None."""
+    host = (urlsplit(url).hostname or "").lower().removeprefix("www.")
+    while host:
+        profile = _BY_HOST.get(host)
+        if profile is not None:
+            return profile
+        _, _, host = host.partition(".")
+    return None
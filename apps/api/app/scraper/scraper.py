@@ -1,7 +1,15 @@
+import codecs
+from dataclasses import dataclass
+from urllib.parse import urljoin
+
 import httpx
-from bs4 import BeautifulSoup
 from fastapi import HTTPException
+from lxml import etree
 
+from app.scraper.boilerplate import PageFilter, boilerplate_model
+from app.scraper.canonical import canonicalize_url
+from app.scraper.hosts import circuit_breaker, host_limiter, host_of
+from app.scraper.profiles import ExtractionProfile, profile_for
 from app.scraper.ssrf import validate_url
 
 # Spoof a realistic Chrome User-Agent to pass basic bot detection on news sites
@@ -15,12 +23,53 @@ CHROME_UA = (
 MAX_CONTENT_CHARS = 32_000  # AI-02: cap before sending to GPT-4o
 MIN_CONTENT_CHARS = 500     # CONTEXT.md: <500 chars → scrape_failed
 MAX_RESPONSE_BYTES = 5 * 1024 * 1024  # 5MB safety cap to prevent OOM
+# Extra chars collected past MAX_CONTENT_CHARS before the stream is abandoned,
+# so a late <article> still has room to replace the <p> fallback text.
+EXTRACT_MARGIN_CHARS = 4_000
+
+# Boilerplate containers dropped together with everything inside them
+_SKIP_TAGS = frozenset({"script", "style", "nav", "footer", "header", "aside"})
+_HEADING_TAGS = frozenset({"h1", "h2", "h3"})
 
+# Bump whenever extraction output changes — cached scrapes from an older
+# extractor are then treated as misses (see app/ratelimit/cache.py).
+EXTRACTOR_VERSION = 2
 
-async def scrape_url(url: str) -> str:
+
+class ScrapeFailed(HTTPException):
+    """
+    400 scrape_failed caused by the page itself — paywalled/empty, 4xx,
+    non-HTML or oversized. These repeat for a while, so the pipeline keeps
+    them in the negative scrape cache instead of re-fetching.
     """
-    Fetches a public HTTPS URL, strips boilerplate HTML, and returns
-    extracted text (up to 32,000 chars) for GPT-4o processing (AI-02).
+
+    def __init__(self, message: str = "Couldn't read that URL — try pasting the text instead"):
+        super().__init__(status_code=400, detail={"error": "scrape_failed", "message": message})
+
+
+@dataclass
+class ScrapedPage:
+    text: str        # Extracted text, capped at MAX_CONTENT_CHARS
+    final_url: str   # URL the content was served from, after redirects
+    canonical_url: str | None = None  # absolute <link rel="canonical"> href, if any
+    etag: str | None = None           # origin validators, for conditional refreshes
+    last_modified: str | None = None
+    not_modified: bool = False        # 304 — text is empty, the cached copy is current
+
+
+async def scrape_url(url: str, etag: str | None = None, last_modified: str | None = None) -> ScrapedPage:
+    """
+    Fetches a public HTTPS URL, strips boilerplate HTML, and returns the
+    extracted text (up to 32,000 chars) for GPT-4o processing (AI-02),
+    together with the final URL after redirects.
+
+    With etag/last_modified from a cached copy the request is conditional
+    (If-None-Match / If-Modified-Since); a 304 returns not_modified=True
+    without reading or parsing a body.
+
+    The body is streamed through an incremental parser: the download and the
+    parse both stop as soon as MAX_CONTENT_CHARS + EXTRACT_MARGIN_CHARS of text
+    has been extracted, so cost is bounded by the content budget, not page size.
 
     SSRF protection (SEC-01):
     - validate_url() resolves DNS and returns the validated IP
@@ -28,130 +77,368 @@ async def scrape_url(url: str) -> str:
     - follow_redirects=False prevents redirect chains to private IPs
     - Redirect Location headers are validated through validate_url() before following
 
+    Each hop holds a per-host connection slot (host_limiter) until it moves
+    to another host or the body has been read, so bursts for one site queue.
+
     Raises:
         HTTPException(400): URL is private/blocked (from validate_url)
-        HTTPException(400): Fetched content is too short (paywalled/empty page)
-        HTTPException(400): HTTP error (4xx, 5xx from target site)
-        HTTPException(400): Response body exceeds size limit
+        ScrapeFailed(400): Fetched content is too short (paywalled/empty page)
+        ScrapeFailed(400): 4xx from target site (except 408/429), non-HTML or oversized body
+        HTTPException(400): 5xx from target site
         HTTPException(503): Network timeout or connection error
+        HTTPException(503): 408 or 429 from target site (throttled — not cached)
+        HTTPException(503): Host circuit open after repeated timeouts (fail fast)
+        HTTPException(503): Queued too long for a per-host connection slot
     """
     # SSRF guard — resolves hostname and validates IP before any network request
     _validated_url, _resolved_ip = validate_url(url)
 
+    host = host_of(url)
+    # Host whose half-open trial this request is, until the trial has a verdict
+    probe = host if circuit_breaker.check(host) else None
+    held = None
+    conditional = {}
+    if etag:
+        conditional["If-None-Match"] = etag
+    if last_modified:
+        conditional["If-Modified-Since"] = last_modified
     try:
+        await host_limiter.acquire(host)
+        held = host
         async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                url,
-                headers={"User-Agent": CHROME_UA},
-                follow_redirects=False,  # CRITICAL: validate redirects manually (SEC-01)
-            )
+            response = await _send(client, url, conditional)
+            final_url = url
 
             # Handle redirects manually to validate each redirect target
             redirect_count = 0
             while response.is_redirect and redirect_count < 5:
+                await response.aclose()
                 redirect_url = response.headers.get("location", "")
                 if not redirect_url.startswith("http"):
                     # Relative redirect — reconstruct absolute URL
-                    from urllib.parse import urljoin
                     redirect_url = urljoin(str(response.url), redirect_url)
                 # Validate the redirect target through SSRF guard
                 validate_url(redirect_url)
-                response = await client.get(
-                    redirect_url,
-                    headers={"User-Agent": CHROME_UA},
-                    follow_redirects=False,
-                )
+                circuit_breaker.record_success(host)
+                probe = None
+                host = host_of(redirect_url)
+                if host != held:
+                    if circuit_breaker.check(host):
+                        probe = host
+                    host_limiter.release(held)
+                    held = None
+                    await host_limiter.acquire(host)
+                    held = host
+                response = await _send(client, redirect_url, conditional)
+                final_url = redirect_url
                 redirect_count += 1
 
-            # Check for HTTP errors on final response (covers both initial and post-redirect)
-            response.raise_for_status()
-
-            # Reject responses that exceed size limit to prevent OOM
-            content_length = response.headers.get("content-length")
-            if content_length and int(content_length) > MAX_RESPONSE_BYTES:
-                raise HTTPException(status_code=400, detail={
-                    "error": "scrape_failed",
-                    "message": "Page is too large to process — try pasting the text instead",
-                })
-            if len(response.content) > MAX_RESPONSE_BYTES:
-                raise HTTPException(status_code=400, detail={
-                    "error": "scrape_failed",
-                    "message": "Page is too large to process — try pasting the text instead",
-                })
-
-            # Reject non-HTML responses before parsing — PDFs, images, binaries would
-            # produce garbage or crash BeautifulSoup (lxml parser is HTML-only here).
-            content_type = response.headers.get("content-type", "")
-            if "text/html" not in content_type and "text/plain" not in content_type:
-                raise HTTPException(status_code=400, detail={
-                    "error": "scrape_failed",
-                    "message": "Couldn't read that URL — try pasting the text instead",
-                })
+            circuit_breaker.record_success(host)
+            probe = None
+            try:
+                if conditional and response.status_code == 304:
+                    return ScrapedPage(
+                        text="",
+                        final_url=final_url,
+                        etag=response.headers.get("etag") or etag,
+                        last_modified=response.headers.get("last-modified") or last_modified,
+                        not_modified=True,
+                    )
+
+                # Check for HTTP errors on final response (covers both initial and post-redirect)
+                response.raise_for_status()
+
+                # Reject non-HTML responses before parsing — PDFs, images, binaries would
+                # produce garbage or crash the parser (lxml parser is HTML-only here).
+                content_type = response.headers.get("content-type", "")
+                if "text/html" not in content_type and "text/plain" not in content_type:
+                    raise ScrapeFailed()
+
+                page_filter = boilerplate_model.page_filter(host)
+                text, canonical_href = await _read_text(
+                    response,
+                    plain="text/html" not in content_type,
+                    profile=profile_for(final_url),
+                    paragraph_filter=page_filter,
+                )
+                validators = response.headers.get("etag"), response.headers.get("last-modified")
+            finally:
+                # Closing mid-stream abandons the rest of the download
+                await response.aclose()
 
     except HTTPException:
         raise
     except httpx.TimeoutException:
+        circuit_breaker.record_failure(host)
+        probe = None
         raise HTTPException(status_code=503, detail={
             "error": "service_unavailable",
             "message": "URL fetch timed out — try again or paste the text directly",
         })
     except httpx.ConnectError:
+        circuit_breaker.record_failure(host)
+        probe = None
         raise HTTPException(status_code=503, detail={
             "error": "service_unavailable",
             "message": "Could not connect to URL — try pasting the text instead",
         })
-    except httpx.HTTPStatusError:
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code in (408, 429):
+            # Origin throttling or a slow origin — transient, never negative-cached
+            raise HTTPException(status_code=503, detail={
+                "error": "service_unavailable",
+                "message": "That site is busy right now — try again in a moment or paste the text instead",
+            })
+        if e.response.status_code < 500:
+            raise ScrapeFailed()
         raise HTTPException(status_code=400, detail={
             "error": "scrape_failed",
             "message": "Couldn't read that URL — try pasting the text instead",
         })
-
-    text = _extract_text(response.text)
+    finally:
+        if held is not None:
+            host_limiter.release(held)
+        if probe is not None:
+            # Cancelled, queued out or failed some other way — no verdict
+            circuit_breaker.end_probe(probe)
 
     # Low content yield detection — paywalled or near-empty pages
     if len(text) < MIN_CONTENT_CHARS:
-        raise HTTPException(status_code=400, detail={
-            "error": "scrape_failed",
-            "message": "Couldn't read that URL — try pasting the text instead",
-        })
+        raise ScrapeFailed()
+    canonical_url = urljoin(final_url, canonical_href) if canonical_href else None
+    if page_filter is not None:
+        page_filter.commit(canonicalize_url(canonical_url or final_url))
+    return ScrapedPage(
+        text=text[:MAX_CONTENT_CHARS],
+        final_url=final_url,
+        canonical_url=canonical_url,
+        etag=validators[0],
+        last_modified=validators[1],
+    )
+
 
-    return text[:MAX_CONTENT_CHARS]
+async def _send(client: httpx.AsyncClient, url: str, extra_headers: dict | None = None) -> httpx.Response:
+    """Issues a streamed GET — headers are read, the body is left on the wire."""
+    request = client.build_request("GET", url, headers={"User-Agent": CHROME_UA, **(extra_headers or {})})
+    # CRITICAL: validate redirects manually (SEC-01)
+    return await client.send(request, stream=True, follow_redirects=False)
 
 
-def _extract_text(html: str) -> str:
+async def _read_text(
+    response: httpx.Response,
+    plain: bool = False,
+    profile: ExtractionProfile | None = None,
+    paragraph_filter: PageFilter | None = None,
+) -> tuple[str, str | None]:
     """
-    Extracts readable text from HTML using BeautifulSoup with lxml parser.
-    Strips: script, style, nav, footer, header tags.
-    Prefers <article> body; falls back to <p> paragraphs if no article found.
-    Uses lxml for performance on large news articles (vs html.parser).
+    Streams the response body into a _TextExtractor until the content budget
+    (or the profile's max_sections) is met, the body ends, or
+    MAX_RESPONSE_BYTES is exceeded (OOM guard).
+    Returns (text, rel=canonical href or None).
+    Decodes with the header charset, falling back to UTF-8 like response.text.
     """
-    soup = BeautifulSoup(html, "lxml")
+    encoding = response.charset_encoding or "utf-8"
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        encoding = "utf-8"  # Bogus charset in Content-Type — httpx falls back the same way
+    extractor = _TextExtractor(
+        encoding=encoding,
+        budget=MAX_CONTENT_CHARS + EXTRACT_MARGIN_CHARS,
+        plain=plain,
+        profile=profile,
+        paragraph_filter=paragraph_filter,
+    )
+    received = 0
+    async for chunk in response.aiter_bytes():
+        received += len(chunk)
+        if extractor.feed(chunk):
+            break  # Budget met — stop parsing and downloading
+        if received > MAX_RESPONSE_BYTES:
+            raise ScrapeFailed("Page is too large to process — try pasting the text instead")
+    return extractor.close(), extractor.canonical_href
+
+
+class _TextExtractor:
+    """
+    Incremental HTML text extractor fed chunk by chunk via lxml's pull parser.
+    Strips: script, style, nav, footer, header, aside (and everything inside).
+    Collects headings (h1–h3), then prefers <article> bodies; falls back to
+    <p> paragraphs only when the document has no <article>.
+
+    With a site profile (app/scraper/profiles.py), the page's h1 plus the
+    profile's content elements are returned instead, minus its drop
+    elements; the generic result is still collected as the fallback for
+    pages where no content element matches.
+
+    With a paragraph_filter (app/scraper/boilerplate.py), <p> elements the
+    filter flags as recurring site boilerplate are removed as they stream in,
+    including from enclosing <article> and profile content elements.
+
+    feed() returns True once the extracted text reaches the budget (or the
+    profile's max_sections), letting the caller abandon the rest of the
+    document. The first <link rel="canonical"> href is kept in canonical_href.
+    """
+
+    def __init__(
+        self,
+        encoding: str | None = None,
+        budget: int | None = None,
+        plain: bool = False,
+        profile: ExtractionProfile | None = None,
+        paragraph_filter: PageFilter | None = None,
+    ):
+        self._budget = budget
+        self._plain = plain
+        self._profile = profile
+        self._filter = paragraph_filter
+        if plain:
+            self._decoder = codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+            self._plain_parts: list[str] = []
+            self._plain_len = 0
+        else:
+            self._parser = etree.HTMLPullParser(
+                events=("start", "end"),
+                encoding=encoding,
+                remove_comments=True,
+                remove_pis=True,
+            )
+        self.canonical_href: str | None = None
+        self._skip_depth = 0
+        self._article_depth = 0
+        self._headings: list[str] = []
+        self._articles: list[str] = []
+        self._paragraphs: list[str] = []
+        self._headings_len = 0
+        self._articles_len = 0
+        self._paragraphs_len = 0
+        self._content_root = None  # open profile content element
+        self._title: list[str] = []
+        self._sections: list[str] = []
+        self._sections_len = 0
+
+    def feed(self, data: bytes | str) -> bool:
+        if self._plain:
+            text = self._decoder.decode(data) if isinstance(data, bytes) else data
+            self._plain_parts.append(text)
+            self._plain_len += len(text)
+            return self._budget is not None and self._plain_len >= self._budget
+        self._parser.feed(data)
+        self._drain()
+        if self._sections_full():
+            return True
+        return self._budget is not None and self._size() >= self._budget
+
+    def close(self) -> str:
+        if self._plain:
+            self._plain_parts.append(self._decoder.decode(b"", final=True))
+            return "".join(self._plain_parts).strip()
+        try:
+            self._parser.close()
+        except etree.XMLSyntaxError:
+            pass  # Empty or truncated documents — keep whatever was extracted
+        self._drain()
+        if self._sections:
+            return " ".join(self._title + self._sections)
+        body = self._articles if self._articles else self._paragraphs
+        return " ".join(self._headings + body)
 
-    # Remove boilerplate noise
-    for tag in soup(["script", "style", "nav", "footer", "header", "aside"]):
-        tag.decompose()
+    def _size(self) -> int:
+        if self._sections:
+            return self._sections_len
+        body = self._articles_len if self._articles else self._paragraphs_len
+        return self._headings_len + body
 
-    parts = []
-    # Headings provide structural context for GPT-4o
-    for heading in soup.find_all(["h1", "h2", "h3"]):
-        text = heading.get_text(strip=True)
+    def _sections_full(self) -> bool:
+        limit = self._profile.max_sections if self._profile is not None else None
+        return limit is not None and len(self._sections) >= limit
+
+    def _dropped(self, el) -> bool:
+        return self._profile is not None and self._profile.is_dropped(el)
+
+    def _drain(self) -> None:
+        for event, el in self._parser.read_events():
+            tag = el.tag if isinstance(el.tag, str) else ""
+            if event == "start":
+                if tag in _SKIP_TAGS or self._dropped(el):
+                    self._skip_depth += 1
+                    continue
+                if (
+                    self._profile is not None
+                    and self._content_root is None
+                    and not self._skip_depth
+                    and self._profile.is_content(el)
+                ):
+                    self._content_root = el
+                if tag == "article" and not self._skip_depth:
+                    self._article_depth += 1
+                elif tag == "link" and self.canonical_href is None:
+                    if "canonical" in (el.get("rel") or "").lower().split():
+                        self.canonical_href = (el.get("href") or "").strip() or None
+                continue
+
+            if tag in _SKIP_TAGS or self._dropped(el):
+                self._skip_depth -= 1
+                _discard(el)
+                continue
+            if self._skip_depth:
+                continue
+            if tag in _HEADING_TAGS:
+                text = "".join(_strings(el))
+                self._add(self._headings, text, "_headings_len")
+                if tag == "h1" and self._profile is not None and self._content_root is None and not self._title:
+                    self._add(self._title, text, "_sections_len")
+                self._release(el)
+            elif tag == "p":
+                text = "".join(_strings(el))
+                if self._filter is not None and text and self._filter.drop(text):
+                    _discard(el)  # also removes it from an enclosing <article>
+                else:
+                    self._add(self._paragraphs, text, "_paragraphs_len")
+                    self._release(el)
+            elif tag == "article":
+                self._article_depth -= 1
+                self._add(self._articles, " ".join(_strings(el)), "_articles_len")
+                self._release(el)
+            if el is self._content_root:
+                self._content_root = None
+                if not self._sections_full():
+                    self._add(self._sections, " ".join(_strings(el)), "_sections_len")
+                self._release(el)
+
+    def _add(self, parts: list[str], text: str, size_attr: str) -> None:
         if text:
             parts.append(text)
+            setattr(self, size_attr, getattr(self, size_attr) + len(text) + 1)
+
+    def _release(self, el) -> None:
+        # Content outside any open <article> (or profile content element) is
+        # never read again — free it so memory stays flat on long pages.
+        if not self._article_depth and self._content_root is None:
+            _discard(el)
+
 
-    # Prefer <article> body (many news sites wrap content in <article>).
-    # Only fall back to <p> tags when no <article> is found, to avoid
-    # duplicate content (articles contain <p> tags).
-    articles = soup.find_all("article")
-    if articles:
-        for article in articles:
-            text = article.get_text(separator=" ", strip=True)
-            if text:
-                parts.append(text)
-    else:
-        # Paragraph fallback (catches sites without <article>)
-        for p in soup.find_all("p"):
-            text = p.get_text(strip=True)
-            if text:
-                parts.append(text)
-
-    return " ".join(parts)
+def _strings(el):
+    """Stripped, non-empty text fragments of an element (BeautifulSoup strip=True)."""
+    for s in el.itertext():
+        s = s.strip()
+        if s:
+            yield s
+
+
+def _discard(el) -> None:
+    """Empties an element in place while keeping its tail text for the parent."""
+    tail = el.tail
+    el.clear()
+    el.tail = tail
+
+
+def _extract_text(html: str, url: str | None = None) -> str:
+    """
+    Extracts readable text from a complete HTML document.
+    Same rules as the streaming path in scrape_url (see _TextExtractor),
+    without a budget. With url, the matching site profile applies.
+    """
+    extractor = _TextExtractor(profile=profile_for(url) if url else None)
+    extractor.feed(html)
+    return extractor.close()
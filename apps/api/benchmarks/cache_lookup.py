@@ -0,0 +1,100 @@
+"""
+Scrape-cache lookup latency: legacy GET + TTL vs the single-GET envelope.
+
+Runs against an in-process Redis stand-in that sleeps for a fixed round-trip
+time per command, mimicking Upstash REST (one HTTPS request per command).
+The in-process LocalTTLCache tier is cleared before every envelope lookup so
+the comparison measures the Redis path; the "local" row shows that tier on
+its own.
+
+    uv run python -m benchmarks.cache_lookup [--rtt-ms 25] [--lookups 200]
+"""
+import argparse
+import hashlib
+import time
+
+from app.ratelimit import cache
+from app.ratelimit.cache import cache_scrape, get_cached_scrape, SCRAPE_TTL_SECONDS
+
+
+class LatencyRedis:
+    """Minimal GET/SET/TTL store that charges rtt seconds per command."""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.commands = 0
+        self._data: dict[str, tuple[str, float]] = {}
+
+    def _round_trip(self) -> None:
+        self.commands += 1
+        time.sleep(self.rtt)
+
+    def get(self, key):
+        self._round_trip()
+        value = self._data.get(key)
+        return value[0] if value else None
+
+    def set(self, key, value, ex=None):
+        self._round_trip()
+        self._data[key] = (value, time.time() + (ex or 0))
+
+    def ttl(self, key):
+        self._round_trip()
+        value = self._data.get(key)
+        return int(value[1] - time.time()) if value else -2
+
+
+def legacy_lookup(redis, url: str):
+    """The pre-envelope lookup: raw text under the key, age derived from TTL."""
+    key = "scrape:" + hashlib.sha256(url.strip().lower().rstrip("/").encode()).hexdigest()
+    text = redis.get(key)
+    if text is None:
+        return None, None
+    ttl = redis.ttl(key)
+    return text, SCRAPE_TTL_SECONDS - ttl if ttl and ttl > 0 else None
+
+
+def legacy_store(redis, url: str, text: str) -> None:
+    key = "scrape:" + hashlib.sha256(url.strip().lower().rstrip("/").encode()).hexdigest()
+    redis.set(key, text, ex=SCRAPE_TTL_SECONDS)
+
+
+def envelope_lookup(redis, url: str):
+    """The envelope lookup with the in-process tier empty — one Redis GET."""
+    cache._local.clear()
+    return get_cached_scrape(redis, url)
+
+
+def _run(name, lookup, redis, urls) -> None:
+    redis.commands = 0
+    start = time.perf_counter()
+    for url in urls:
+        text, _age = lookup(redis, url)
+        assert text is not None
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<8} {len(urls)} hits  {elapsed * 1000 / len(urls):7.2f} ms/lookup  "
+        f"{redis.commands / len(urls):.1f} commands/lookup"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rtt-ms", type=float, default=25.0, help="simulated round trip per command")
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    redis = LatencyRedis(args.rtt_ms / 1000)
+    text = "Paradigm Capital led a $50M Series B in Uniswap. " * 600
+    urls = [f"https://example.com/article-{i % 20}" for i in range(args.lookups)]
+    for url in set(urls):
+        legacy_store(redis, url, text)
+        cache_scrape(redis, url, text)
+
+    _run("legacy", legacy_lookup, redis, urls)
+    _run("envelope", envelope_lookup, redis, urls)
+    _run("local", get_cached_scrape, redis, urls)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Extracted size per article: generic heuristic vs site extraction profiles.
+
+Runs _extract_text over pages with and without the matching profile and
+reports characters and prompt tokens. Tokens are counted with tiktoken
+(gpt-4o encoding) when it is installed, otherwise estimated at 4
+characters per token.
+
+The pages in benchmarks/fixtures/ are synthetic: hand-written markup that
+mimics each site's layout (nav, related links, newsletter blocks around
+the article body) so the run works offline. They show that the profile
+machinery drops what its selectors name, not how much a profile saves on
+the real site — for that, save real article pages and pass them with
+--page (repeatable), which replaces the fixtures.
+
+    uv run python -m benchmarks.extraction_profiles [--repeat 200]
+    uv run python -m benchmarks.extraction_profiles --page saved.html https://www.coindesk.com/...
+"""
+import argparse
+import time
+from pathlib import Path
+
+from app.scraper.scraper import _extract_text
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+# Synthetic fixture file -> URL on the site it mimics (selects the profile)
+PAGES = {
+    "coindesk.html": "https://www.coindesk.com/business/2024/05/01/restaking-series-b",
+    "theblock.html": "https://www.theblock.co/post/290001/restaking-series-b",
+    "techcrunch.html": "https://techcrunch.com/2024/05/01/restaking-series-b/",
+}
+
+
+def _token_counter():
+    try:
+        import tiktoken
+    except ImportError:
+        return (lambda text: len(text) // 4), "estimated (chars / 4)"
+    encoding = tiktoken.encoding_for_model("gpt-4o")
+    return (lambda text: len(encoding.encode(text))), "tiktoken gpt-4o"
+
+
+def _timed(html: str, url: str | None, repeat: int) -> tuple[str, float]:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        text = _extract_text(html, url)
+    return text, (time.perf_counter() - started) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument(
+        "--page", nargs=2, action="append", metavar=("HTML_FILE", "URL"),
+        help="a real saved article page and the URL it was saved from",
+    )
+    args = parser.parse_args()
+    if args.page:
+        pages = {Path(path): url for path, url in args.page}
+    else:
+        print("pages: synthetic fixtures (pass --page for real saved pages)")
+        pages = {FIXTURES / name: url for name, url in PAGES.items()}
+
+    count_tokens, token_source = _token_counter()
+    print(f"tokens: {token_source}")
+    print(f"{'page':<16} {'generic chars':>13} {'profile chars':>13} {'generic tok':>11} {'profile tok':>11} {'saved':>6} {'ms/page':>15}")
+    totals = [0, 0]
+    for path, url in pages.items():
+        name = path.name
+        html = path.read_text()
+        generic, generic_ms = _timed(html, None, args.repeat)
+        profiled, profile_ms = _timed(html, url, args.repeat)
+        generic_tok, profile_tok = count_tokens(generic), count_tokens(profiled)
+        totals[0] += generic_tok
+        totals[1] += profile_tok
+        print(
+            f"{name:<16} {len(generic):>13} {len(profiled):>13} {generic_tok:>11} {profile_tok:>11}"
+            f" {1 - profile_tok / generic_tok:>6.0%} {generic_ms:>7.2f}/{profile_ms:<7.2f}"
+        )
+    print(f"{'total':<16} {'':>13} {'':>13} {totals[0]:>11} {totals[1]:>11} {1 - totals[1] / totals[0]:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
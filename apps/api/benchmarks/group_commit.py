@@ -0,0 +1,74 @@
+"""
+Graph-write throughput per Neo4j connection: one transaction per request vs
+group commit (GraphWriteBatcher).
+
+Runs `--concurrency` simulated requests, each persisting `--graphs` graphs
+back to back, through a driver limited to `--connections` pooled
+connections. Needs a local Neo4j (docker-compose); benchmark graphs use
+bench-* session ids and are deleted afterwards.
+
+    uv run python -m benchmarks.group_commit [--concurrency 64] [--graphs 10] [--nodes 25]
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from neo4j import AsyncGraphDatabase
+
+from app.config import settings
+from app.graph.batcher import GraphWriteBatcher
+from app.graph.repository import persist_graph
+from benchmarks.persist_graph import sample_graph
+
+
+async def _run(name, persist, concurrency, graphs, nodes, edges) -> None:
+    async def client() -> None:
+        for _ in range(graphs):
+            await persist(f"bench-{uuid.uuid4()}", nodes, edges)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    total = concurrency * graphs
+    print(f"{name:<14} {total} graphs  {total / elapsed:8.1f} graphs/s  {elapsed * 1000 / total:6.2f} ms/graph")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--graphs", type=int, default=10, help="graphs per simulated request loop")
+    parser.add_argument("--nodes", type=int, default=25, help="nodes (and edges) per graph")
+    parser.add_argument("--connections", type=int, default=1)
+    parser.add_argument("--max-graphs", type=int, default=settings.neo4j_group_commit_max_graphs)
+    parser.add_argument("--delay-ms", type=float, default=settings.neo4j_group_commit_delay_ms)
+    args = parser.parse_args()
+
+    nodes, edges = sample_graph(args.nodes)
+    driver = AsyncGraphDatabase.driver(
+        settings.neo4j_uri,
+        auth=(settings.neo4j_username, settings.neo4j_password),
+        max_connection_pool_size=args.connections,
+    )
+    try:
+        await driver.verify_connectivity()
+
+        async def single(session_id, nodes, edges):
+            await persist_graph(driver, session_id, nodes, edges)
+
+        await _run("per request", single, args.concurrency, args.graphs, nodes, edges)
+        batcher = GraphWriteBatcher(driver, max_graphs=args.max_graphs, max_delay=args.delay_ms / 1000)
+        await _run("group commit", batcher.persist, args.concurrency, args.graphs, nodes, edges)
+        await batcher.close()
+        print(f"group commit batches: {dict(batcher.stats)}")
+    finally:
+        async with driver.session() as session:
+            await session.run(
+                "MATCH (n:Entity) WHERE n.session_id STARTS WITH 'bench-' "
+                "CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS"
+            )
+        await driver.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
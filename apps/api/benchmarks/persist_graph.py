@@ -0,0 +1,94 @@
+"""
+persist_graph latency: two auto-commit queries vs one managed write transaction.
+
+Needs a Neo4j to write to — the docker-compose one by default (NEO4J_URI /
+NEO4J_USERNAME / NEO4J_PASSWORD from the environment or .env). Every graph is
+written under a fresh bench-* session_id and deleted afterwards.
+
+    uv run python -m benchmarks.persist_graph [--graphs 50] [--nodes 25]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+
+from neo4j import AsyncGraphDatabase
+
+from app.config import settings
+from app.graph.repository import persist_graph
+
+
+async def legacy_persist(driver, session_id, nodes, edges, user_id="anonymous") -> None:
+    """The pre-transaction write: CREATE nodes, then CREATE edges, two auto-commit round trips."""
+    serialized = [{**n, "properties": json.dumps(n.get("properties") or {})} for n in nodes]
+    async with driver.session() as session:
+        await session.run(
+            """
+            UNWIND $nodes AS node
+            CREATE (n:Entity {id: node.id, label: node.label, type: node.type,
+                              properties: node.properties, session_id: $session_id,
+                              created_by: $user_id, created_at: datetime()})
+            """,
+            nodes=serialized, session_id=session_id, user_id=user_id,
+        )
+        await session.run(
+            """
+            UNWIND $edges AS edge
+            MATCH (s:Entity {id: edge.source, session_id: $session_id})
+            MATCH (t:Entity {id: edge.target, session_id: $session_id})
+            CREATE (s)-[r:RELATES_TO {type: edge.relationship, session_id: $session_id}]->(t)
+            """,
+            edges=edges, session_id=session_id,
+        )
+
+
+def sample_graph(size: int) -> tuple[list[dict], list[dict]]:
+    nodes = [
+        {"id": f"entity-{i}", "label": f"Entity {i}", "type": "Project", "properties": {"rank": i}}
+        for i in range(size)
+    ]
+    edges = [
+        {"source": f"entity-{i}", "target": f"entity-{(i + 1) % size}", "relationship": "PARTNERS_WITH"}
+        for i in range(size)
+    ]
+    return nodes, edges
+
+
+async def _run(name, persist, driver, graphs, nodes, edges) -> None:
+    timings = []
+    for _ in range(graphs):
+        session_id = f"bench-{uuid.uuid4()}"
+        start = time.perf_counter()
+        await persist(driver, session_id, nodes, edges)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(
+        f"{name:<12} {graphs} graphs  median {statistics.median(timings):7.2f} ms  "
+        f"p95 {timings[int(len(timings) * 0.95) - 1]:7.2f} ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--graphs", type=int, default=50)
+    parser.add_argument("--nodes", type=int, default=25, help="nodes (and edges) per graph")
+    args = parser.parse_args()
+
+    nodes, edges = sample_graph(args.nodes)
+    driver = AsyncGraphDatabase.driver(settings.neo4j_uri, auth=(settings.neo4j_username, settings.neo4j_password))
+    try:
+        await driver.verify_connectivity()
+        await _run("legacy", legacy_persist, driver, args.graphs, nodes, edges)
+        await _run("transaction", persist_graph, driver, args.graphs, nodes, edges)
+    finally:
+        async with driver.session() as session:
+            await session.run(
+                "MATCH (n:Entity) WHERE n.session_id STARTS WITH 'bench-' DETACH DELETE n"
+            )
+        await driver.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+"""
+persist_graph time for large graphs as the database grows, with and without
+the (session_id, id) constraint and RELATES_TO.session_id index.
+
+Fills the database with background sessions in steps, and after each step
+times persisting a few large graphs twice: with only the session_id index
+(the pre-schema layout) and with the full app.graph.schema.SCHEMA.
+
+DROPS AND RECREATES SCHEMA — refuses to run unless NEO4J_URI points at
+localhost (the docker-compose Neo4j). Benchmark data uses bench-* session ids
+and is deleted afterwards.
+
+    uv run python -m benchmarks.persist_scaling [--steps 3] [--sessions-per-step 200] [--nodes 500]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from urllib.parse import urlsplit
+
+from neo4j import AsyncGraphDatabase
+
+from app.config import settings
+from app.graph.repository import persist_graph
+from app.graph.schema import FALLBACKS, SCHEMA, ensure_schema
+from benchmarks.persist_graph import sample_graph
+
+# Every session has nodes "entity-0".. — the same ids in every session, as
+# in production (slugified entity names), so the key lookups must use both
+# properties to be selective
+BACKGROUND_NODES = 50
+
+
+async def _drop_session_key_schema(driver) -> None:
+    names = [name for name in SCHEMA if name != "entity_session_id"]
+    names += [FALLBACKS[name][0] for name in names if name in FALLBACKS]
+    async with driver.session() as session:
+        for name in names:
+            await session.run(f"DROP CONSTRAINT {name} IF EXISTS")
+            await session.run(f"DROP INDEX {name} IF EXISTS")
+
+
+async def _populate(driver, sessions: int) -> None:
+    nodes, edges = sample_graph(BACKGROUND_NODES)
+    for _ in range(sessions):
+        await persist_graph(driver, f"bench-bg-{uuid.uuid4()}", nodes, edges)
+
+
+async def _time_persist(driver, graphs: int, size: int) -> float:
+    nodes, edges = sample_graph(size)
+    timings = []
+    for _ in range(graphs):
+        start = time.perf_counter()
+        await persist_graph(driver, f"bench-{uuid.uuid4()}", nodes, edges)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--steps", type=int, default=3)
+    parser.add_argument("--sessions-per-step", type=int, default=200)
+    parser.add_argument("--nodes", type=int, default=500, help="nodes (and edges) per timed graph")
+    parser.add_argument("--graphs", type=int, default=5, help="timed graphs per measurement")
+    args = parser.parse_args()
+
+    if urlsplit(settings.neo4j_uri).hostname not in ("localhost", "127.0.0.1"):
+        raise SystemExit(f"Refusing to drop schema on {settings.neo4j_uri} — local Neo4j only")
+
+    driver = AsyncGraphDatabase.driver(settings.neo4j_uri, auth=(settings.neo4j_username, settings.neo4j_password))
+    try:
+        await driver.verify_connectivity()
+        print(f"{'db nodes':>10} {'session_id only':>18} {'full schema':>14}   ({args.nodes}-node graphs, median)")
+        for step in range(args.steps + 1):
+            if step:
+                await ensure_schema(driver)  # keep background loading fast
+                await _populate(driver, args.sessions_per_step)
+            await _drop_session_key_schema(driver)
+            before = await _time_persist(driver, args.graphs, args.nodes)
+            missing = await ensure_schema(driver)
+            while missing:  # wait for the new indexes to come online
+                await asyncio.sleep(0.5)
+                missing = await ensure_schema(driver)
+            after = await _time_persist(driver, args.graphs, args.nodes)
+            async with driver.session() as session:
+                result = await session.run("MATCH (n:Entity) RETURN count(n) AS n")
+                total = (await result.single())["n"]
+            print(f"{total:>10} {before:>15.1f} ms {after:>11.1f} ms")
+    finally:
+        async with driver.session() as session:
+            await session.run(
+                "MATCH (n:Entity) WHERE n.session_id STARTS WITH 'bench-' "
+                "CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS"
+            )
+        await driver.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
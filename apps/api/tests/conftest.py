@@ -1 +1,92 @@
 # Test fixtures — populated in Plans 02+
+from unittest.mock import MagicMock
+
+import pytest
+
+
+class FakeResult:
+    """
+    Stand-in for a neo4j AsyncResult: async-iterates `records`, single()
+    returns the first, consume() a summary with the given delete counters —
+    or raises `error`, as the driver does for a statement failing after RUN.
+    """
+
+    def __init__(self, records=(), nodes_deleted=0, relationships_deleted=0, error=None):
+        self._records = list(records)
+        self._error = error
+        self._summary = MagicMock()
+        self._summary.counters.nodes_deleted = nodes_deleted
+        self._summary.counters.relationships_deleted = relationships_deleted
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for record in self._records:
+            yield record
+
+    async def single(self):
+        return self._records[0] if self._records else None
+
+    async def consume(self):
+        if self._error is not None:
+            raise self._error
+        return self._summary
+
+
+class FakeRedis:
+    """
+    Dict-backed stand-in for the sync Redis clients: get/set/delete on
+    `values`, and eval() runs the near-dup index scripts in Python over
+    `sets` (the only Lua the tests drive end to end).
+    """
+
+    def __init__(self):
+        self.values, self.sets = {}, {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def delete(self, *keys):
+        return sum(self.values.pop(key, None) is not None for key in keys)
+
+    def eval(self, script, keys, args):
+        from app.generate import neardup
+
+        if script == neardup._INDEX:
+            for key in keys:
+                self.sets.setdefault(key, set()).add(args[0])
+            return 1
+        if script == neardup._CANDIDATES:
+            members = []
+            for key in keys:
+                members += [m for m in self.sets.get(key, ()) if m not in members]
+            return members[: int(args[0])]
+        raise NotImplementedError("FakeRedis only runs the near-dup scripts")
+
+
+@pytest.fixture(autouse=True)
+def _reset_process_caches():
+    """In-process caches are module singletons — start every test cold."""
+    from app.generate import neardup
+    from app.graph import cache as graph_cache
+    from app.ratelimit import cache
+    from app.scraper.boilerplate import boilerplate_model
+    from app.scraper.hosts import circuit_breaker, host_limiter
+
+    cache._local.clear()
+    cache._redis_stats.clear()
+    cache._stampede_stats.clear()
+    circuit_breaker.reset()
+    host_limiter.reset()
+    boilerplate_model.reset()
+    neardup._stats.clear()
+    graph_cache._local.clear()
+    graph_cache._stats.clear()
+    yield
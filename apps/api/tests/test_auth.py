@@ -3,7 +3,7 @@ from unittest.mock import patch, MagicMock
 from fastapi import HTTPException
 import jwt as pyjwt
 
-from app.auth.clerk import get_current_user, get_optional_user
+from app.auth.clerk import get_admin_user, get_current_user, get_optional_user
 
 
 class TestGetCurrentUser:
@@ -159,3 +159,23 @@ class TestGetOptionalUser:
                 with pytest.raises(HTTPException) as exc_info:
                     await get_optional_user(credentials=creds)
                 assert exc_info.value.status_code == 401
+
+
+class TestGetAdminUser:
+    @pytest.mark.asyncio
+    async def test_listed_user_passes(self):
+        with patch("app.auth.clerk.settings") as mock_settings:
+            mock_settings.dev_skip_auth = False
+            mock_settings.stats_admin_user_ids = ["user_admin"]
+            user = {"sub": "user_admin"}
+            assert await get_admin_user(current_user=user) is user
+
+    @pytest.mark.asyncio
+    async def test_other_user_gets_403(self):
+        with patch("app.auth.clerk.settings") as mock_settings:
+            mock_settings.dev_skip_auth = False
+            mock_settings.stats_admin_user_ids = ["user_admin"]
+            with pytest.raises(HTTPException) as exc_info:
+                await get_admin_user(current_user={"sub": "user_abc"})
+            assert exc_info.value.status_code == 403
+            assert exc_info.value.detail["error"] == "forbidden"
@@ -0,0 +1,87 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from upstash_ratelimit import Ratelimit, FixedWindow
+
+from app.ratelimit.backend import RespRedis, create_redis_client
+from app.ratelimit.cache import cache_scrape, get_cached_scrape
+
+
+class TestCreateRedisClient:
+    def test_upstash_when_configured(self):
+        with patch("app.ratelimit.backend.settings") as s:
+            s.redis_backend = "upstash"
+            s.upstash_redis_rest_url = "https://example.upstash.io"
+            s.upstash_redis_rest_token = "token"
+            with patch("app.ratelimit.backend.Redis") as upstash:
+                assert create_redis_client() is upstash.return_value
+
+    def test_none_when_upstash_not_configured(self):
+        with patch("app.ratelimit.backend.settings") as s:
+            s.redis_backend = "upstash"
+            s.upstash_redis_rest_url = ""
+            s.upstash_redis_rest_token = ""
+            assert create_redis_client() is None
+
+    def test_resp_backend(self):
+        with patch("app.ratelimit.backend.settings") as s:
+            s.redis_backend = "resp"
+            s.redis_url = "redis://localhost:6379/0"
+            s.redis_max_connections = 5
+            with patch.object(RespRedis, "from_url") as from_url:
+                assert create_redis_client() is from_url.return_value
+                from_url.assert_called_once_with("redis://localhost:6379/0", max_connections=5)
+
+    def test_none_when_resp_url_missing(self):
+        with patch("app.ratelimit.backend.settings") as s:
+            s.redis_backend = "resp"
+            s.redis_url = ""
+            assert create_redis_client() is None
+
+    def test_unknown_backend_raises(self):
+        with patch("app.ratelimit.backend.settings") as s:
+            s.redis_backend = "memcached"
+            with pytest.raises(RuntimeError):
+                create_redis_client()
+
+
+class TestRespRedis:
+    def test_eval_translates_keys_and_args(self):
+        client = MagicMock()
+        RespRedis(client).eval("return 1", ["k1", "k2"], [10, 1])
+        client.eval.assert_called_once_with("return 1", 2, "k1", "k2", 10, 1)
+
+    def test_eval_strips_upstash_shebang(self):
+        client = MagicMock()
+        RespRedis(client).eval("#!lua flags=allow-key-locking\nreturn 1", ["k"], [])
+        assert client.eval.call_args[0][0] == "return 1"
+
+    def test_set_passes_expiry(self):
+        client = MagicMock()
+        RespRedis(client).set("k", "v", ex=60)
+        client.set.assert_called_once_with("k", "v", ex=60, nx=False)
+
+    def test_ratelimit_runs_on_resp_backend(self):
+        client = MagicMock()
+        client.eval.return_value = 1
+        limiter = Ratelimit(
+            redis=RespRedis(client),
+            limiter=FixedWindow(max_requests=3, window=86400),
+            prefix="ratelimit:auth",
+        )
+        result = limiter.limit("user_abc")
+        assert result.allowed
+        assert result.remaining == 2
+        _script, numkeys, key, *_args = client.eval.call_args[0]
+        assert numkeys == 1
+        assert key.startswith("ratelimit:auth:user_abc:")
+
+    def test_scrape_cache_runs_on_resp_backend(self):
+        store = {}
+        client = MagicMock()
+        client.set.side_effect = lambda k, v, ex=None, nx=False: store.__setitem__(k, v)
+        client.get.side_effect = store.get
+        redis = RespRedis(client)
+        cache_scrape(redis, "https://example.com/a", "article text")
+        from app.ratelimit import cache
+        cache._local.clear()
+        assert get_cached_scrape(redis, "https://example.com/a") == ("article text", 0)
@@ -0,0 +1,92 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from neo4j.exceptions import AuthError, ConstraintError, ServiceUnavailable
+
+from app.graph.batcher import GraphWriteBatcher
+
+NODES = [{"id": "paradigm", "label": "Paradigm", "type": "Investor", "properties": {}}]
+
+
+def _persist(batcher, session_id):
+    return batcher.persist(session_id, NODES, [], user_id="user_abc")
+
+
+class TestGroupCommit:
+    @pytest.mark.asyncio
+    async def test_concurrent_persists_share_one_transaction(self):
+        batcher = GraphWriteBatcher(MagicMock(), max_graphs=10, max_delay=0.01)
+        with patch("app.graph.batcher.persist_graphs", new=AsyncMock()) as write:
+            await asyncio.gather(*(_persist(batcher, f"s{i}") for i in range(3)))
+        write.assert_awaited_once()
+        graphs = write.call_args[0][1]
+        assert [g["session_id"] for g in graphs] == ["s0", "s1", "s2"]
+        assert graphs[0]["user_id"] == "user_abc"
+        assert graphs[0]["nodes"][0]["properties"] == "{}"
+        assert batcher.stats["batches"] == 1 and batcher.stats["max_batch"] == 3
+
+    @pytest.mark.asyncio
+    async def test_full_batch_is_written_without_waiting(self):
+        batcher = GraphWriteBatcher(MagicMock(), max_graphs=2, max_delay=60)
+        with patch("app.graph.batcher.persist_graphs", new=AsyncMock()) as write:
+            await asyncio.wait_for(asyncio.gather(_persist(batcher, "a"), _persist(batcher, "b")), timeout=1)
+        write.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_rejected_batch_fails_only_the_offending_caller(self):
+        async def write(driver, graphs):
+            if any(g["session_id"] == "bad" for g in graphs):
+                raise ConstraintError("type mismatch")
+
+        batcher = GraphWriteBatcher(MagicMock(), max_graphs=10, max_delay=0.01)
+        with patch("app.graph.batcher.persist_graphs", new=AsyncMock(side_effect=write)) as persist:
+            results = await asyncio.gather(
+                _persist(batcher, "a"), _persist(batcher, "bad"), _persist(batcher, "b"),
+                return_exceptions=True,
+            )
+        assert results[0] is None and results[2] is None
+        assert isinstance(results[1], ConstraintError)
+        assert persist.await_count == 4  # the batch, then each graph alone
+        assert batcher.stats["split_batches"] == 1
+        assert batcher.stats["failed_graphs"] == 1
+
+    @pytest.mark.asyncio
+    async def test_connection_failure_fails_the_batch_without_splitting(self):
+        batcher = GraphWriteBatcher(MagicMock(), max_graphs=10, max_delay=0.01)
+        with patch("app.graph.batcher.persist_graphs", new=AsyncMock(side_effect=ServiceUnavailable("down"))) as write:
+            results = await asyncio.gather(_persist(batcher, "a"), _persist(batcher, "b"), return_exceptions=True)
+        assert all(isinstance(r, ServiceUnavailable) for r in results)
+        write.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_auth_failure_fails_the_batch_without_splitting(self):
+        batcher = GraphWriteBatcher(MagicMock(), max_graphs=10, max_delay=0.01)
+        with patch("app.graph.batcher.persist_graphs", new=AsyncMock(side_effect=AuthError("bad credentials"))) as write:
+            results = await asyncio.gather(_persist(batcher, "a"), _persist(batcher, "b"), return_exceptions=True)
+        assert all(isinstance(r, AuthError) for r in results)
+        write.assert_awaited_once()
+        assert batcher.stats["split_batches"] == 0
+
+    @pytest.mark.asyncio
+    async def test_close_flushes_pending_graphs(self):
+        batcher = GraphWriteBatcher(MagicMock(), max_graphs=10, max_delay=60)
+        with patch("app.graph.batcher.persist_graphs", new=AsyncMock()) as write:
+            pending = asyncio.create_task(_persist(batcher, "a"))
+            await asyncio.sleep(0)
+            await batcher.close()
+            await asyncio.wait_for(pending, timeout=1)
+        write.assert_awaited_once()
+
+
+class TestPipelineUsesWriter:
+    @pytest.mark.asyncio
+    async def test_persists_through_graph_writer(self):
+        from app.generate import service
+        writer = MagicMock()
+        writer.persist = AsyncMock()
+        with patch.object(service, "_extract_graph", new=AsyncMock(return_value=(NODES, [], 100))), \
+             patch.object(service, "persist_graph") as persist_graph:
+            await service.run_generate_pipeline("Paradigm Capital led a round. " * 10, MagicMock(), graph_writer=writer)
+        writer.persist.assert_awaited_once()
+        assert writer.persist.call_args[1]["nodes"] == NODES
+        persist_graph.assert_not_called()
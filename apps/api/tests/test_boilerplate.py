@@ -0,0 +1,80 @@
+from app.scraper.boilerplate import BoilerplateModel, paragraph_hash
+from app.scraper.scraper import _TextExtractor
+
+DISCLAIMER = "Disclaimer: This article is for informational purposes only and is not investment advice."
+
+
+def _scrape(model, host, key, paragraphs):
+    """Runs one page through the extractor with the model's filter and commits it."""
+    page_filter = model.page_filter(host)
+    extractor = _TextExtractor(paragraph_filter=page_filter)
+    extractor.feed("<html><body><article>" + "".join(f"<p>{p}</p>" for p in paragraphs) + "</article></body></html>")
+    text = extractor.close()
+    page_filter.commit(key)
+    return text
+
+
+def test_paragraph_hash_ignores_case_and_whitespace():
+    assert paragraph_hash("Subscribe  to our\nnewsletter") == paragraph_hash("subscribe to our newsletter")
+    assert paragraph_hash("a") != paragraph_hash("b")
+
+
+class TestBoilerplateModel:
+    def test_recurring_paragraph_dropped_after_min_pages(self):
+        model = BoilerplateModel(min_pages=3, ratio=0.5, decay=1.0)
+        for i in range(3):
+            text = _scrape(model, "news.com", f"page-{i}", [f"Story {i} body.", DISCLAIMER])
+            assert DISCLAIMER in text
+        text = _scrape(model, "www.news.com", "page-3", ["Story 3 body.", DISCLAIMER])
+        assert text == "Story 3 body."
+        stats = model.stats()["news.com"]
+        assert stats["pages"] == 4
+        assert stats["paragraphs_dropped"] == 1
+        assert stats["bytes_saved"] == len(DISCLAIMER)
+
+    def test_other_hosts_unaffected(self):
+        model = BoilerplateModel(min_pages=2, ratio=0.5, decay=1.0)
+        for i in range(3):
+            _scrape(model, "news.com", f"page-{i}", [DISCLAIMER])
+        assert DISCLAIMER in _scrape(model, "other.com", "page-0", [DISCLAIMER])
+
+    def test_same_page_counted_once(self):
+        model = BoilerplateModel(min_pages=2, ratio=0.5, decay=1.0)
+        for _ in range(5):
+            text = _scrape(model, "news.com", "same-page", ["Only article paragraph."])
+        assert text == "Only article paragraph."
+
+    def test_url_variants_of_one_article_counted_once(self):
+        model = BoilerplateModel(min_pages=2, ratio=0.5, decay=1.0)
+        article = ["Paradigm led the round.", "The protocol launched in 2023."]
+        for i in range(5):
+            text = _scrape(model, "news.com", f"https://news.com/a?variant={i}", article)
+        assert all(p in text for p in article)
+        assert model.stats()["news.com"]["pages"] == 1
+
+    def test_pruning_keeps_recurring_paragraphs(self):
+        model = BoilerplateModel(min_pages=3, ratio=0.1, decay=1.0, max_paragraphs=40)
+        for i in range(30):
+            _scrape(model, "news.com", f"page-{i}", [f"Story {i} part {j}." for j in range(3)] + [DISCLAIMER])
+        assert len(model._hosts["news.com"].counts) <= 40
+        assert _scrape(model, "news.com", "last", ["Last story.", DISCLAIMER]) == "Last story."
+
+    def test_rare_paragraph_kept(self):
+        model = BoilerplateModel(min_pages=2, ratio=0.5, decay=1.0)
+        _scrape(model, "news.com", "a", [DISCLAIMER])
+        _scrape(model, "news.com", "b", [DISCLAIMER])
+        for i in range(6):
+            _scrape(model, "news.com", f"other-{i}", [f"Story {i}."])
+        # 2 of 8 pages is below the ratio
+        assert DISCLAIMER in _scrape(model, "news.com", "c", [DISCLAIMER])
+
+    def test_counts_decay(self):
+        model = BoilerplateModel(min_pages=2, ratio=0.1, decay=0.5)
+        _scrape(model, "news.com", "a", [DISCLAIMER])
+        _scrape(model, "news.com", "b", [DISCLAIMER])
+        for i in range(3):
+            _scrape(model, "news.com", f"other-{i}", [f"Story {i}."])
+        assert DISCLAIMER in _scrape(model, "news.com", "c", [DISCLAIMER])
+
+    def test_disabled(self):
+        assert BoilerplateModel(min_pages=0, ratio=0.5, decay=1.0).page_filter("news.com") is None
@@ -1,6 +1,13 @@
+import json
+import time
 import pytest
-from unittest.mock import MagicMock
-from app.ratelimit.cache import get_cached_scrape, cache_scrape, _cache_key
+from unittest.mock import MagicMock, patch
+from app.ratelimit.cache import (
+    get_cached_scrape, cache_scrape, cache_stats, listen_for_invalidations,
+    lookup_scrape, acquire_refresh_lock, release_refresh_lock, cache_scrape_failure, get_scrape_failure,
+    _cache_key, _encode_entry, _decode_entry, _local, SCRAPE_TTL_SECONDS, SCRAPE_STALE_SECONDS,
+)
+from app.scraper.scraper import EXTRACTOR_VERSION
 
 
 class TestCacheKey:
@@ -13,8 +20,15 @@ class TestCacheKey:
     def test_normalizes_whitespace(self):
         assert _cache_key("  https://example.com/a  ") == _cache_key("https://example.com/a")
 
-    def test_normalizes_case(self):
-        assert _cache_key("HTTPS://EXAMPLE.COM/A") == _cache_key("https://example.com/a")
+    def test_normalizes_scheme_and_host_case(self):
+        assert _cache_key("HTTPS://EXAMPLE.COM/A") == _cache_key("https://example.com/A")
+
+    def test_path_case_is_preserved(self):
+        assert _cache_key("https://example.com/A") != _cache_key("https://example.com/a")
+
+    def test_tracking_params_and_fragment_share_key(self):
+        assert _cache_key("https://www.example.com/a?utm_source=twitter&id=1#section") == \
+            _cache_key("https://example.com/a?id=1")
 
     def test_different_urls_differ(self):
         assert _cache_key("https://a.com") != _cache_key("https://b.com")
@@ -35,40 +49,50 @@ class TestGetCachedScrape:
 
     def test_returns_cached_text_on_hit(self):
         redis = MagicMock()
-        redis.get.return_value = "cached article text"
-        redis.ttl.return_value = 3000  # 3000s remaining of 3600s TTL
+        redis.get.return_value = _encode_entry("cached article text", None, time.time() - 600)
         text, age = get_cached_scrape(redis, "https://example.com")
         assert text == "cached article text"
-        assert age == 600  # 3600 - 3000
+        assert age == 600
 
-    def test_handles_expired_ttl(self):
+    def test_single_round_trip(self):
         redis = MagicMock()
-        redis.get.return_value = "text"
-        redis.ttl.return_value = -1  # key exists but no TTL
-        text, age = get_cached_scrape(redis, "https://example.com")
-        assert text == "text"
-        assert age is None
+        redis.get.return_value = _encode_entry("text", None, time.time())
+        get_cached_scrape(redis, "https://example.com")
+        redis.get.assert_called_once()
+        redis.ttl.assert_not_called()
 
-    def test_handles_zero_ttl(self):
+    def test_ignores_entry_from_other_extractor_version(self):
         redis = MagicMock()
-        redis.get.return_value = "text"
-        redis.ttl.return_value = 0
+        with patch("app.ratelimit.cache.EXTRACTOR_VERSION", EXTRACTOR_VERSION - 1):
+            redis.get.return_value = _encode_entry("old extraction", None, time.time())
         text, age = get_cached_scrape(redis, "https://example.com")
-        assert text == "text"
+        assert text is None
         assert age is None
 
+    def test_ignores_corrupt_entry(self):
+        redis = MagicMock()
+        redis.get.return_value = "raw legacy text, not an envelope"
+        assert get_cached_scrape(redis, "https://example.com") == (None, None)
+
+    def test_ignores_entry_with_bad_hash(self):
+        redis = MagicMock()
+        entry = json.loads(_encode_entry("text", None, time.time()))
+        entry["h"] = "0" * 64
+        redis.get.return_value = json.dumps(entry)
+        assert get_cached_scrape(redis, "https://example.com") == (None, None)
+
 
 class TestCacheScrape:
     def test_noop_when_redis_is_none(self):
         cache_scrape(None, "https://example.com", "text")  # should not raise
 
-    def test_stores_with_1h_ttl(self):
+    def test_stores_with_1h_ttl_plus_stale_grace(self):
         redis = MagicMock()
         cache_scrape(redis, "https://example.com", "article text")
         redis.set.assert_called_once()
         args, kwargs = redis.set.call_args
-        assert args[1] == "article text"
-        assert kwargs.get("ex") == 3600 or args[2] if len(args) > 2 else True
+        assert kwargs.get("ex") == SCRAPE_TTL_SECONDS + SCRAPE_STALE_SECONDS
+        assert SCRAPE_TTL_SECONDS == 3600
 
     def test_key_is_sha256_prefixed(self):
         redis = MagicMock()
@@ -76,3 +100,202 @@ class TestCacheScrape:
         key = redis.set.call_args[0][0]
         assert key.startswith("scrape:")
         assert len(key) > 10  # sha256 hex is 64 chars
+
+    def test_entry_is_compressed_and_carries_metadata(self):
+        redis = MagicMock()
+        text = "Paradigm Capital led a $50M Series B in Uniswap. " * 200
+        cache_scrape(redis, "https://example.com/a", text, final_url="https://example.com/b")
+        stored = redis.set.call_args[0][1]
+        assert len(stored) < len(text) / 4
+        entry = json.loads(stored)
+        assert entry["u"] == "https://example.com/b"
+        assert entry["x"] == EXTRACTOR_VERSION
+        assert abs(entry["ts"] - time.time()) < 5
+        assert _decode_entry(stored)["text"] == text
+
+
+class TestLocalTier:
+    def test_second_lookup_served_locally(self):
+        redis = MagicMock()
+        redis.get.return_value = _encode_entry("cached article text", None, time.time())
+        assert get_cached_scrape(redis, "https://example.com")[0] == "cached article text"
+        assert get_cached_scrape(redis, "https://example.com")[0] == "cached article text"
+        redis.get.assert_called_once()
+        stats = cache_stats()
+        assert stats["local"]["hits"] == 1
+        assert stats["redis"]["hits"] == 1
+
+    def test_write_through_populates_local_tier(self):
+        redis = MagicMock()
+        cache_scrape(redis, "https://example.com", "article text")
+        text, age = get_cached_scrape(redis, "https://example.com")
+        assert text == "article text"
+        assert age == 0
+        redis.set.assert_called_once()
+        redis.get.assert_not_called()
+
+    def test_local_tier_counts_bytes_not_characters(self):
+        cache_scrape(MagicMock(), "https://example.com", "Zürich Ventures führt die Runde an. " * 10)
+        assert cache_stats()["local"]["bytes"] == len(("Zürich Ventures führt die Runde an. " * 10).encode())
+
+    def test_expired_redis_entry_not_kept_locally(self):
+        redis = MagicMock()
+        redis.get.return_value = _encode_entry("text", None, time.time() - 3601)
+        get_cached_scrape(redis, "https://example.com")
+        assert cache_stats()["local"]["entries"] == 0
+
+    def test_force_refresh_publishes_invalidation(self):
+        redis = MagicMock()
+        with patch("app.ratelimit.cache.settings.scrape_cache_invalidation", True):
+            cache_scrape(redis, "https://example.com", "text", invalidate=True)
+        channel, message = redis.publish.call_args[0]
+        assert channel == "scrape:invalidate"
+        assert message.endswith(_cache_key("https://example.com"))
+
+    def test_no_publish_when_disabled(self):
+        redis = MagicMock()
+        cache_scrape(redis, "https://example.com", "text", invalidate=True)
+        redis.publish.assert_not_called()
+
+    def test_listener_drops_keys_from_other_workers(self):
+        import threading
+        from app.ratelimit import cache
+
+        key = _cache_key("https://example.com")
+        cache_scrape(MagicMock(), "https://example.com", "text")
+        done = threading.Event()
+
+        def listen():
+            yield {"type": "subscribe", "data": 1}
+            yield {"type": "message", "data": f"{cache._WORKER_ID} {key}".encode()}
+            yield {"type": "message", "data": f"other-worker {key}".encode()}
+            done.set()
+
+        redis = MagicMock()
+        redis.pubsub.return_value.listen.side_effect = listen
+        assert listen_for_invalidations(redis) is redis.pubsub.return_value
+        assert done.wait(2)
+        assert cache._local.get(key) is None
+
+    def test_listener_unsupported_without_pubsub(self):
+        from upstash_redis import Redis
+        redis = MagicMock(spec=Redis)
+        assert listen_for_invalidations(redis) is None
+
+
+class TestStampedeProtection:
+    def test_fresh_entry_needs_no_refresh(self):
+        redis = MagicMock()
+        redis.get.return_value = _encode_entry("text", None, time.time() - 60, compute_ms=2000)
+        cached = lookup_scrape(redis, "https://example.com")
+        assert not cached.stale
+        assert not cached.refresh
+
+    def test_expired_entry_is_stale(self):
+        redis = MagicMock()
+        redis.get.return_value = _encode_entry("old text", None, time.time() - 3700)
+        cached = lookup_scrape(redis, "https://example.com")
+        assert cached.text == "old text"
+        assert cached.stale
+        assert cached.refresh
+        # The plain lookup never serves stale text
+        assert get_cached_scrape(redis, "https://example.com") == (None, None)
+
+    def test_early_refresh_probability_rises_near_expiry(self):
+        def refresh_rate(age):
+            hits = 0
+            for _ in range(200):
+                cache._local.clear()
+                redis = MagicMock()
+                redis.get.return_value = _encode_entry("text", None, time.time() - age, compute_ms=5000)
+                hits += lookup_scrape(redis, "https://example.com").refresh
+            return hits
+
+        from app.ratelimit import cache
+        assert refresh_rate(60) == 0
+        assert refresh_rate(SCRAPE_TTL_SECONDS - 2) > 100
+        assert cache_stats()["stampede"]["early_refreshes"] > 0
+
+    def test_lock_is_exclusive(self):
+        held = {}
+        redis = MagicMock()
+        redis.set.side_effect = lambda k, v, ex=None, nx=False: (
+            None if nx and k in held else held.setdefault(k, v) and True
+        )
+        token = acquire_refresh_lock(redis, "https://example.com")
+        assert token is not None
+        assert acquire_refresh_lock(redis, "https://example.com") is None
+        stats = cache_stats()["stampede"]
+        assert stats["lock_acquired"] == 1
+        assert stats["lock_contended"] == 1
+
+    def test_release_checks_token(self):
+        redis = MagicMock()
+        release_refresh_lock(redis, "https://example.com", "tok")
+        script, keys, args = redis.eval.call_args[0]
+        assert keys == [_cache_key("https://example.com") + ":lock"]
+        assert args == ["tok"]
+
+
+class TestAliases:
+    def test_entry_written_under_alias_keys(self):
+        redis = MagicMock()
+        cache_scrape(redis, "https://example.com/a?x=1", "text",
+                     aliases=["https://example.com/canonical", "https://example.com/a?x=1"])
+        keys = [c[0][0] for c in redis.set.call_args_list]
+        assert keys == [_cache_key("https://example.com/a?x=1"), _cache_key("https://example.com/canonical")]
+        assert cache_stats()["redis"]["alias_writes"] == 1
+
+    def test_alias_hit_served(self):
+        redis = MagicMock()
+        cache_scrape(redis, "https://example.com/a", "text", aliases=["https://example.com/b"])
+        assert get_cached_scrape(redis, "https://example.com/b")[0] == "text"
+
+
+class TestValidators:
+    def test_validators_round_trip(self):
+        redis = MagicMock()
+        cache_scrape(redis, "https://example.com/a", "text", etag='"v1"', last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+        stored = redis.set.call_args[0][1]
+        redis.get.return_value = stored
+        _local.clear()
+        cached = lookup_scrape(redis, "https://example.com/a")
+        assert cached.etag == '"v1"'
+        assert cached.last_modified == "Mon, 01 Jan 2024 00:00:00 GMT"
+
+    def test_entry_without_validators_still_decodes(self):
+        value = json.loads(_encode_entry("text", None, time.time()))
+        del value["e"], value["m"]
+        entry = _decode_entry(json.dumps(value))
+        assert entry["text"] == "text"
+        assert entry["etag"] is None
+
+
+class TestNegativeCache:
+    DETAIL = {"error": "scrape_failed", "message": "Couldn't read that URL — try pasting the text instead"}
+
+    def test_failure_stored_with_short_ttl(self):
+        redis = MagicMock()
+        cache_scrape_failure(redis, "https://paywalled.com/a", self.DETAIL)
+        key, value = redis.set.call_args[0]
+        assert key.startswith("scrape:neg:")
+        assert json.loads(value) == self.DETAIL
+        assert redis.set.call_args[1]["ex"] == 300
+
+    def test_failure_read_back_from_redis(self):
+        redis = MagicMock()
+        redis.get.return_value = json.dumps(self.DETAIL)
+        assert get_scrape_failure(redis, "https://paywalled.com/a?utm_source=x") == self.DETAIL
+        assert cache_stats()["redis"]["negative_hits"] == 1
+
+    def test_no_failure_recorded(self):
+        redis = MagicMock()
+        redis.get.return_value = None
+        assert get_scrape_failure(redis, "https://example.com/a") is None
+
+    def test_disabled_with_zero_ttl(self):
+        redis = MagicMock()
+        with patch("app.ratelimit.cache.settings.scrape_negative_ttl", 0):
+            cache_scrape_failure(redis, "https://paywalled.com/a", self.DETAIL)
+            assert get_scrape_failure(redis, "https://paywalled.com/a") is None
+        redis.set.assert_not_called()
@@ -0,0 +1,55 @@
+from unittest.mock import patch
+
+from app.scraper.canonical import canonicalize_url, same_site
+
+
+class TestCanonicalizeUrl:
+    def test_lowercases_scheme_and_host_only(self):
+        assert canonicalize_url("HTTPS://Example.COM/Path/To") == "https://example.com/Path/To"
+
+    def test_strips_www(self):
+        assert canonicalize_url("https://www.example.com/a") == "https://example.com/a"
+
+    def test_keeps_www_when_disabled(self):
+        with patch("app.scraper.canonical.settings.scrape_canonical_strip_www", False):
+            assert canonicalize_url("https://www.example.com/a") == "https://www.example.com/a"
+
+    def test_drops_fragment(self):
+        assert canonicalize_url("https://example.com/a#section-2") == "https://example.com/a"
+
+    def test_strips_tracking_params(self):
+        url = "https://example.com/a?utm_source=twitter&utm_medium=social&fbclid=abc&id=7"
+        assert canonicalize_url(url) == "https://example.com/a?id=7"
+
+    def test_tracking_params_case_insensitive(self):
+        assert canonicalize_url("https://example.com/a?UTM_Source=x") == "https://example.com/a"
+
+    def test_configurable_tracking_params(self):
+        with patch("app.scraper.canonical.settings.scrape_tracking_params", ["ref"]):
+            assert canonicalize_url("https://example.com/a?ref=home&utm_source=x") == \
+                "https://example.com/a?utm_source=x"
+
+    def test_sorts_query(self):
+        assert canonicalize_url("https://example.com/a?b=2&a=1") == "https://example.com/a?a=1&b=2"
+
+    def test_keeps_blank_values(self):
+        assert canonicalize_url("https://example.com/a?amp") == "https://example.com/a?amp="
+
+    def test_drops_default_port_keeps_other(self):
+        assert canonicalize_url("https://example.com:443/a") == "https://example.com/a"
+        assert canonicalize_url("https://example.com:8443/a") == "https://example.com:8443/a"
+
+    def test_trailing_slash_and_whitespace(self):
+        assert canonicalize_url("  https://example.com/a/  ") == "https://example.com/a"
+
+    def test_idempotent(self):
+        url = "https://www.Example.com/A/?utm_campaign=x&z=1&a=2#frag"
+        assert canonicalize_url(canonicalize_url(url)) == canonicalize_url(url)
+
+
+class TestSameSite:
+    def test_ignores_www_and_case(self):
+        assert same_site("https://www.coindesk.com/a", "https://CoinDesk.com/b")
+
+    def test_different_hosts(self):
+        assert not same_site("https://evil.com/a", "https://coindesk.com/a")
@@ -5,12 +5,15 @@ from fastapi.testclient import TestClient
 
 @pytest.fixture
 def mock_neo4j_driver():
-    """Provides a mock Neo4j driver for tests."""
+    """Provides a mock Neo4j AsyncDriver for tests."""
     driver = MagicMock()
+    driver.verify_connectivity = AsyncMock()
+    driver.close = AsyncMock()
     session_mock = MagicMock()
-    driver.session.return_value.__enter__ = MagicMock(return_value=session_mock)
-    driver.session.return_value.__exit__ = MagicMock(return_value=False)
-    session_mock.run.return_value = MagicMock()
+    session_mock.run = AsyncMock()
+    session_mock.execute_write = AsyncMock()
+    driver.session.return_value.__aenter__ = AsyncMock(return_value=session_mock)
+    driver.session.return_value.__aexit__ = AsyncMock(return_value=False)
     return driver
 
 
@@ -18,7 +21,7 @@ def mock_neo4j_driver():
 def app_with_mocks(mock_neo4j_driver):
     """Creates FastAPI test app with mocked Neo4j driver in app.state.
 
-    Patches GraphDatabase.driver so the lifespan does not attempt a real
+    Patches AsyncGraphDatabase.driver so the lifespan does not attempt a real
     Neo4j connection during TestClient startup (no Docker Neo4j in CI).
     """
     from app.main import app
@@ -29,7 +32,7 @@ def app_with_mocks(mock_neo4j_driver):
 
     # Patch the lifespan Neo4j driver creation so TestClient startup doesn't
     # try to connect to a real Neo4j instance.
-    with patch("app.main.GraphDatabase.driver", return_value=mock_neo4j_driver):
+    with patch("app.main.AsyncGraphDatabase.driver", return_value=mock_neo4j_driver):
         yield app
 
     app.dependency_overrides.clear()
@@ -149,14 +152,19 @@ class TestGenerateEndpoint:
         from app.dependencies import get_current_user
         app_with_mocks.dependency_overrides[get_current_user] = lambda: valid_jwt_user
 
-        # Mock the scraper (httpx)
+        # Mock the scraper (httpx streamed response)
+        html_content = "<html><body>" + "<p>Paradigm Capital invested $50M in Uniswap. </p>" * 30 + "</body></html>"
         mock_response = MagicMock(spec=httpx.Response)
         mock_response.is_redirect = False
         mock_response.headers = {"content-type": "text/html; charset=utf-8"}
-        html_content = "<html><body>" + "<p>Paradigm Capital invested $50M in Uniswap. </p>" * 30 + "</body></html>"
-        mock_response.text = html_content
-        mock_response.content = html_content.encode()
+        mock_response.charset_encoding = "utf-8"
         mock_response.raise_for_status.return_value = None
+        mock_response.aclose = AsyncMock()
+
+        async def aiter_bytes():
+            yield html_content.encode()
+
+        mock_response.aiter_bytes = aiter_bytes
 
         # Mock OpenAI
         mock_client = MagicMock()
@@ -165,7 +173,8 @@ class TestGenerateEndpoint:
 
         with patch("app.scraper.scraper.httpx.AsyncClient") as mock_client_cls:
             mock_async_client = AsyncMock()
-            mock_async_client.get.return_value = mock_response
+            mock_async_client.build_request = MagicMock()
+            mock_async_client.send.return_value = mock_response
             mock_async_client.__aenter__ = AsyncMock(return_value=mock_async_client)
             mock_async_client.__aexit__ = AsyncMock(return_value=False)
             mock_client_cls.return_value = mock_async_client
@@ -179,3 +188,263 @@ class TestGenerateEndpoint:
         assert response.status_code == 200
         data = response.json()
         assert data["meta"]["source_type"] == "url"
+
+
+class TestFetchUrlContent:
+    """Scrape-cache read path with stampede protection (service._fetch_url_content)."""
+
+    @staticmethod
+    def _cached(stale=False, refresh=False):
+        from app.ratelimit.cache import CachedScrape
+        return CachedScrape(text="cached text", seconds_ago=3700 if stale else 60,
+                            final_url=None, stale=stale, refresh=refresh or stale)
+
+    @pytest.mark.asyncio
+    async def test_fresh_hit_skips_scrape(self):
+        from app.generate import service
+        with patch.object(service, "lookup_scrape", return_value=self._cached()), \
+             patch.object(service, "scrape_url", new=AsyncMock()) as scrape:
+            result = await service._fetch_url_content("https://example.com/a", MagicMock(), False)
+        assert result == ("cached text", True, 60)
+        scrape.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_stale_entry_served_while_other_request_refreshes(self):
+        from app.generate import service
+        with patch.object(service, "lookup_scrape", return_value=self._cached(stale=True)), \
+             patch.object(service, "acquire_refresh_lock", return_value=None), \
+             patch.object(service, "scrape_url", new=AsyncMock()) as scrape:
+            content, hit, _age = await service._fetch_url_content("https://example.com/a", MagicMock(), False)
+        assert (content, hit) == ("cached text", True)
+        scrape.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_lock_holder_refreshes_and_releases(self):
+        from app.generate import service
+        from app.scraper.scraper import ScrapedPage
+        page = ScrapedPage(text="fresh text", final_url="https://example.com/a")
+        with patch.object(service, "lookup_scrape", return_value=self._cached(refresh=True)), \
+             patch.object(service, "acquire_refresh_lock", return_value="tok"), \
+             patch.object(service, "release_refresh_lock") as release, \
+             patch.object(service, "cache_scrape") as store, \
+             patch.object(service, "scrape_url", new=AsyncMock(return_value=page)):
+            result = await service._fetch_url_content("https://example.com/a", MagicMock(), False)
+        assert result == ("fresh text", False, None)
+        store.assert_called_once()
+        release.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_stale_served_when_refresh_fails(self):
+        from fastapi import HTTPException
+        from app.generate import service
+        error = HTTPException(status_code=503, detail={"error": "service_unavailable", "message": "x"})
+        with patch.object(service, "lookup_scrape", return_value=self._cached(stale=True)), \
+             patch.object(service, "acquire_refresh_lock", return_value="tok"), \
+             patch.object(service, "release_refresh_lock"), \
+             patch.object(service, "scrape_url", new=AsyncMock(side_effect=error)):
+            content, hit, _age = await service._fetch_url_content("https://example.com/a", MagicMock(), False)
+        assert (content, hit) == ("cached text", True)
+
+    @pytest.mark.asyncio
+    async def test_cold_miss_waits_for_lock_holder(self):
+        from app.generate import service
+        with patch.object(service, "lookup_scrape", side_effect=[None, None, self._cached()]), \
+             patch.object(service, "acquire_refresh_lock", return_value=None), \
+             patch.object(service, "LOCK_POLL_SECONDS", 0.01), \
+             patch.object(service, "scrape_url", new=AsyncMock()) as scrape:
+            result = await service._fetch_url_content("https://example.com/a", MagicMock(), False)
+        assert result == ("cached text", True, 60)
+        scrape.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_recent_failure_raises_without_fetch(self):
+        from fastapi import HTTPException
+        from app.generate import service
+        detail = {"error": "scrape_failed", "message": "x"}
+        with patch.object(service, "lookup_scrape", return_value=None), \
+             patch.object(service, "get_scrape_failure", return_value=detail), \
+             patch.object(service, "scrape_url", new=AsyncMock()) as scrape:
+            with pytest.raises(HTTPException) as exc_info:
+                await service._fetch_url_content("https://paywalled.com/a", MagicMock(), False)
+        assert exc_info.value.status_code == 400
+        assert exc_info.value.detail == detail
+        scrape.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_scrape_failed_is_remembered(self):
+        from app.generate import service
+        from app.scraper.scraper import ScrapeFailed
+        with patch.object(service, "lookup_scrape", return_value=None), \
+             patch.object(service, "get_scrape_failure", return_value=None), \
+             patch.object(service, "acquire_refresh_lock", return_value="tok"), \
+             patch.object(service, "release_refresh_lock"), \
+             patch.object(service, "cache_scrape_failure") as remember, \
+             patch.object(service, "scrape_url", new=AsyncMock(side_effect=ScrapeFailed())):
+            with pytest.raises(ScrapeFailed):
+                await service._fetch_url_content("https://paywalled.com/a", MagicMock(), False)
+        remember.assert_called_once()
+        assert remember.call_args[0][2]["error"] == "scrape_failed"
+
+    @pytest.mark.asyncio
+    async def test_timeout_is_not_remembered(self):
+        from fastapi import HTTPException
+        from app.generate import service
+        error = HTTPException(status_code=503, detail={"error": "service_unavailable", "message": "x"})
+        with patch.object(service, "lookup_scrape", return_value=None), \
+             patch.object(service, "get_scrape_failure", return_value=None), \
+             patch.object(service, "acquire_refresh_lock", return_value="tok"), \
+             patch.object(service, "release_refresh_lock"), \
+             patch.object(service, "cache_scrape_failure") as remember, \
+             patch.object(service, "scrape_url", new=AsyncMock(side_effect=error)):
+            with pytest.raises(HTTPException):
+                await service._fetch_url_content("https://slow.com/a", MagicMock(), False)
+        remember.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_not_modified_extends_cached_copy(self):
+        from app.generate import service
+        from app.ratelimit.cache import CachedScrape
+        from app.scraper.scraper import ScrapedPage
+        cached = CachedScrape(text="cached text", seconds_ago=3700, final_url="https://example.com/a",
+                              stale=True, refresh=True, etag='"v1"')
+        page = ScrapedPage(text="", final_url="https://example.com/a", etag='"v1"', not_modified=True)
+        with patch.object(service, "lookup_scrape", return_value=cached), \
+             patch.object(service, "acquire_refresh_lock", return_value="tok"), \
+             patch.object(service, "release_refresh_lock"), \
+             patch.object(service, "cache_scrape") as store, \
+             patch.object(service, "scrape_url", new=AsyncMock(return_value=page)) as scrape:
+            result = await service._fetch_url_content("https://example.com/a", MagicMock(), False)
+        assert result == ("cached text", True, 0)
+        assert scrape.await_args.kwargs["etag"] == '"v1"'
+        assert store.call_args[0][2] == "cached text"
+        assert store.call_args.kwargs["etag"] == '"v1"'
+
+    @pytest.mark.asyncio
+    async def test_force_refresh_is_conditional(self):
+        from app.generate import service
+        from app.scraper.scraper import ScrapedPage
+        page = ScrapedPage(text="fresh text", final_url="https://example.com/a")
+        with patch.object(service, "lookup_scrape", return_value=self._cached()), \
+             patch.object(service, "acquire_refresh_lock", return_value="tok"), \
+             patch.object(service, "release_refresh_lock"), \
+             patch.object(service, "cache_scrape"), \
+             patch.object(service, "scrape_url", new=AsyncMock(return_value=page)) as scrape:
+            result = await service._fetch_url_content("https://example.com/a", MagicMock(), True)
+        assert result == ("fresh text", False, None)
+        scrape.assert_awaited_once()
+
+
+class TestCacheAliases:
+    def test_same_host_canonical_is_aliased(self):
+        from app.generate.service import _cache_aliases
+        from app.scraper.scraper import ScrapedPage
+        page = ScrapedPage(text="t", final_url="https://www.coindesk.com/a",
+                           canonical_url="https://coindesk.com/markets/a")
+        assert _cache_aliases(page) == ["https://www.coindesk.com/a", "https://coindesk.com/markets/a"]
+
+    def test_cross_site_canonical_is_ignored(self):
+        from app.generate.service import _cache_aliases
+        from app.scraper.scraper import ScrapedPage
+        page = ScrapedPage(text="t", final_url="https://evil.com/a",
+                           canonical_url="https://coindesk.com/markets/a")
+        assert _cache_aliases(page) == ["https://evil.com/a"]
+
+
+class TestNearDuplicateReuse:
+    @pytest.mark.asyncio
+    async def test_near_duplicate_skips_extraction(self, mock_neo4j_driver):
+        from app.generate import service
+        from app.generate.neardup import NearDuplicate
+        reused = NearDuplicate(nodes=SAMPLE_GRAPH_RESPONSE["nodes"], edges=SAMPLE_GRAPH_RESPONSE["edges"], similarity=0.97)
+        with patch.object(service, "_fetch_url_content", new=AsyncMock(return_value=("content " * 100, False, None))), \
+             patch.object(service, "find_near_duplicate", return_value=reused), \
+             patch.object(service, "_extract_graph", new=AsyncMock()) as extract, \
+             patch.object(service, "persist_graph"):
+            result = await service.run_generate_pipeline("https://techcrunch.com/a", mock_neo4j_driver, redis=MagicMock())
+        extract.assert_not_awaited()
+        assert result["graph"]["nodes"] == SAMPLE_GRAPH_RESPONSE["nodes"]
+        assert result["meta"]["near_duplicate"] is True
+        assert result["meta"]["similarity"] == 0.97
+        assert result["meta"]["token_count"] == 0
+
+    @pytest.mark.asyncio
+    async def test_new_url_extraction_is_indexed(self, mock_neo4j_driver):
+        from app.generate import service
+        graph = (SAMPLE_GRAPH_RESPONSE["nodes"], SAMPLE_GRAPH_RESPONSE["edges"], 512)
+        with patch.object(service, "_fetch_url_content", new=AsyncMock(return_value=("content " * 100, False, None))), \
+             patch.object(service, "find_near_duplicate", return_value=None), \
+             patch.object(service, "_extract_graph", new=AsyncMock(return_value=graph)), \
+             patch.object(service, "index_extraction") as index, \
+             patch.object(service, "persist_graph"):
+            result = await service.run_generate_pipeline("https://techcrunch.com/a", mock_neo4j_driver, redis=MagicMock())
+        index.assert_called_once()
+        assert result["meta"]["near_duplicate"] is False
+        assert result["meta"]["similarity"] is None
+
+
+class TestSessionReloadCache:
+    def _generate(self, client):
+        response = client.post(
+            "/api/generate",
+            json={"input": "Paradigm Capital led a $50M Series A in Uniswap. " * 10},
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    @patch("app.generate.service._get_openai_client")
+    def test_first_reload_is_warm_and_revalidates_with_304(self, mock_openai_factory, app_with_mocks, valid_jwt_user):
+        from app.dependencies import get_current_user
+        from app.generate import router
+        mock_client = MagicMock()
+        mock_client.beta.chat.completions.parse.return_value = make_mock_openai_response(SAMPLE_GRAPH_RESPONSE)
+        mock_openai_factory.return_value = mock_client
+        app_with_mocks.dependency_overrides[get_current_user] = lambda: valid_jwt_user
+
+        with TestClient(app_with_mocks) as client, \
+                patch.object(router, "get_graph_by_session", new=AsyncMock()) as neo4j_read:
+            generated = self._generate(client)
+            session_id = generated["meta"]["session_id"]
+            reload = client.get(f"/api/generate/session/{session_id}")
+            not_modified = client.get(
+                f"/api/generate/session/{session_id}", headers={"If-None-Match": reload.headers["etag"]},
+            )
+
+        neo4j_read.assert_not_awaited()
+        assert reload.status_code == 200
+        assert reload.json()["graph"] == generated["graph"]
+        assert reload.json()["meta"]["session_id"] == session_id
+        assert reload.headers["cache-control"] == "private, no-cache"
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert not_modified.headers["etag"] == reload.headers["etag"]
+
+    def test_miss_reads_neo4j_once(self, app_with_mocks, valid_jwt_user):
+        from app.dependencies import get_current_user
+        from app.generate import router
+        app_with_mocks.dependency_overrides[get_current_user] = lambda: valid_jwt_user
+        stored = {**SAMPLE_GRAPH_RESPONSE, "created_by": "user_test123"}
+
+        with TestClient(app_with_mocks) as client, \
+                patch.object(router, "get_graph_by_session", new=AsyncMock(side_effect=lambda *a, **k: dict(stored))) as neo4j_read:
+            first = client.get("/api/generate/session/s1")
+            second = client.get("/api/generate/session/s1")
+
+        assert neo4j_read.await_count == 1
+        assert first.json() == second.json()
+        assert first.json()["graph"] == SAMPLE_GRAPH_RESPONSE
+        assert "created_by" not in first.json()["graph"]
+
+    def test_cached_graph_is_not_served_to_other_users(self, app_with_mocks):
+        from app.dependencies import get_current_user
+        from app.generate import router
+        from app.graph.cache import cache_graph
+        cache_graph(None, "s1", "user_owner", SAMPLE_GRAPH_RESPONSE)
+        app_with_mocks.dependency_overrides[get_current_user] = lambda: {"sub": "user_other"}
+
+        with TestClient(app_with_mocks) as client, \
+                patch.object(router, "get_graph_by_session", new=AsyncMock()) as neo4j_read:
+            response = client.get("/api/generate/session/s1")
+
+        neo4j_read.assert_not_awaited()
+        assert response.status_code == 404
+        assert response.json()["detail"]["error"] == "not_found"
@@ -0,0 +1,77 @@
+import json
+from unittest.mock import MagicMock
+
+from app.graph import cache
+from app.graph.cache import cache_graph, etag_matches, get_cached_graph, stored_graph
+from tests.conftest import FakeRedis
+
+GRAPH = {
+    "nodes": [{"id": "paradigm", "label": "Paradigm", "type": "Investor", "properties": {"aum": "$4B"}}],
+    "edges": [],
+}
+
+
+class TestStoredGraph:
+    def test_mirrors_persist_merge_semantics(self):
+        nodes = [
+            {"id": "a", "label": "A", "type": "Project"},
+            {"id": "b", "label": "B", "type": "Investor", "properties": {"aum": "$1B"}},
+            {"id": "a", "label": "A2", "type": "Project", "properties": {}},
+        ]
+        edges = [
+            {"source": "b", "target": "a", "relationship": "INVESTED_IN"},
+            {"source": "b", "target": "a", "relationship": "INVESTED_IN"},
+            {"source": "b", "target": "ghost", "relationship": "LED"},
+        ]
+        graph = stored_graph(nodes, edges)
+        assert graph["nodes"] == [
+            {"id": "a", "label": "A2", "type": "Project", "properties": {}},
+            {"id": "b", "label": "B", "type": "Investor", "properties": {"aum": "$1B"}},
+        ]
+        assert graph["edges"] == [{"source": "b", "target": "a", "relationship": "INVESTED_IN"}]
+
+
+class TestCacheTiers:
+    def test_local_hit_returns_serialized_response(self):
+        entry = cache_graph(None, "s1", "user_abc", GRAPH)
+        assert get_cached_graph(None, "s1") is entry
+        assert json.loads(entry.body)["graph"] == GRAPH
+        assert json.loads(entry.body)["meta"]["session_id"] == "s1"
+
+    def test_redis_tier_fills_other_workers(self):
+        redis = FakeRedis()
+        entry = cache_graph(redis, "s1", "user_abc", GRAPH)
+        cache._local.clear()  # another worker
+
+        loaded = get_cached_graph(redis, "s1")
+        assert loaded == entry
+        assert cache._local.get(cache._key("s1")) == entry
+        assert cache.graph_cache_stats()["redis_hits"] == 1
+
+    def test_redis_errors_are_misses(self):
+        redis = MagicMock()
+        redis.get.side_effect = ConnectionError("down")
+        assert get_cached_graph(redis, "s1") is None
+        assert cache.graph_cache_stats()["misses"] == 1
+
+    def test_etag_is_content_hash(self):
+        assert cache_graph(None, "s1", "u", GRAPH).etag == cache_graph(None, "s1", "other", GRAPH).etag
+        assert cache_graph(None, "s1", "u", GRAPH).etag != cache_graph(None, "s2", "u", GRAPH).etag
+
+    def test_ownership(self):
+        entry = cache_graph(None, "s1", "user_abc", GRAPH)
+        assert entry.readable_by("user_abc")
+        assert not entry.readable_by("user_other")
+        assert cache_graph(None, "s2", "anonymous", GRAPH).readable_by("user_other")
+
+
+class TestEtagMatches:
+    def test_matches(self):
+        assert etag_matches('"abc"', '"abc"')
+        assert etag_matches('W/"abc"', '"abc"')
+        assert etag_matches('"x", "abc"', '"abc"')
+        assert etag_matches("*", '"abc"')
+
+    def test_no_match(self):
+        assert not etag_matches(None, '"abc"')
+        assert not etag_matches('"abd"', '"abc"')
@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+from unittest.mock import patch
+from fastapi import HTTPException
+
+from app.scraper.hosts import HostCircuitBreaker, HostConcurrencyLimiter, host_of
+
+
+def test_host_of_lowercases():
+    assert host_of("https://WWW.Example.com:8443/a") == "www.example.com"
+
+
+class TestHostCircuitBreaker:
+    def test_closed_below_threshold(self):
+        breaker = HostCircuitBreaker(threshold=3, cooldown=60)
+        breaker.record_failure("slow.com")
+        breaker.record_failure("slow.com")
+        breaker.check("slow.com")  # should not raise
+
+    def test_opens_after_threshold(self):
+        breaker = HostCircuitBreaker(threshold=2, cooldown=60)
+        breaker.record_failure("slow.com")
+        breaker.record_failure("slow.com")
+        with pytest.raises(HTTPException) as exc_info:
+            breaker.check("slow.com")
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.detail["error"] == "service_unavailable"
+        assert breaker.open_hosts() == ["slow.com"]
+        assert breaker.stats["trips"] == 1
+        assert breaker.stats["fast_failures"] == 1
+        breaker.check("other.com")  # other hosts unaffected
+
+    def test_success_resets_count(self):
+        breaker = HostCircuitBreaker(threshold=2, cooldown=60)
+        breaker.record_failure("slow.com")
+        breaker.record_success("slow.com")
+        breaker.record_failure("slow.com")
+        breaker.check("slow.com")  # should not raise
+
+    def test_half_open_lets_one_probe_through(self):
+        breaker = HostCircuitBreaker(threshold=1, cooldown=60)
+        with patch("app.scraper.hosts.time.monotonic", return_value=1000.0):
+            breaker.record_failure("slow.com")
+        with patch("app.scraper.hosts.time.monotonic", return_value=1061.0):
+            breaker.check("slow.com")  # the trial request
+            with pytest.raises(HTTPException):
+                breaker.check("slow.com")
+            breaker.record_failure("slow.com")  # trial failed — open again
+            with pytest.raises(HTTPException):
+                breaker.check("slow.com")
+        assert breaker.stats["trips"] == 1
+
+    def test_ended_probe_lets_the_next_trial_through(self):
+        breaker = HostCircuitBreaker(threshold=1, cooldown=0)
+        breaker.record_failure("slow.com")
+        assert breaker.check("slow.com") is True
+        with pytest.raises(HTTPException):
+            breaker.check("slow.com")
+        breaker.end_probe("slow.com")
+        assert breaker.check("slow.com") is True
+
+
+class TestHostConcurrencyLimiter:
+    @pytest.mark.asyncio
+    async def test_caps_concurrent_holders_per_host(self):
+        limiter = HostConcurrencyLimiter(default=2, timeout=1.0)
+        active = peak = 0
+
+        async def fetch():
+            nonlocal active, peak
+            await limiter.acquire("news.com")
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            limiter.release("news.com")
+
+        await asyncio.gather(*(fetch() for _ in range(6)))
+        assert peak == 2
+        stats = limiter.stats()["news.com"]
+        assert stats["acquired"] == 6
+        assert stats["queued"] == 4
+        assert limiter._slots == {}  # idle hosts are dropped
+
+    @pytest.mark.asyncio
+    async def test_per_host_override_and_www_share_budget(self):
+        limiter = HostConcurrencyLimiter(default=4, limits={"www.news.com": 1}, timeout=0.01)
+        await limiter.acquire("news.com")
+        with pytest.raises(HTTPException) as exc_info:
+            await limiter.acquire("www.news.com")
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.detail["error"] == "service_unavailable"
+        assert limiter.stats()["news.com"]["timeouts"] == 1
+        await limiter.acquire("other.com")  # other hosts unaffected
+
+    @pytest.mark.asyncio
+    async def test_stats_keep_only_recent_hosts(self):
+        limiter = HostConcurrencyLimiter(default=1, timeout=1.0, max_hosts=2)
+        for host in ("a.com", "b.com", "a.com", "c.com"):
+            await limiter.acquire(host)
+            limiter.release(host)
+        assert sorted(limiter.stats()) == ["a.com", "c.com"]
@@ -0,0 +1,244 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.ingest.feeds import parse_feed
+from app.ingest.worker import IngestWorker, TokenBudget
+
+ARTICLE_HTML = (
+    "<html><body><article><h1>{title}</h1><p>"
+    + "Paradigm Capital led a $50M Series B in the restaking protocol. " * 20
+    + "{title}</p></article></body></html>"
+)
+
+RSS = """<?xml version="1.0"?>
+<rss version="2.0"><channel><title>News</title>
+<item><title>A</title><link>{base}/a?utm_source=rss</link><pubDate>Mon, 06 May 2024 10:00:00 GMT</pubDate></item>
+<item><title>B</title><link>{base}/b</link></item>
+</channel></rss>"""
+
+ATOM = """<?xml version="1.0"?>
+<feed xmlns="http://www.w3.org/2005/Atom"><title>News</title>
+<entry><title>B</title><link rel="alternate" href="{base}/b"/><updated>2024-05-06T09:00:00Z</updated></entry>
+<entry><title>C</title><link href="{base}/c"/><updated>2024-05-06T11:00:00Z</updated></entry>
+</feed>"""
+
+SITEMAP_INDEX = """<?xml version="1.0"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+<sitemap><loc>{base}/sitemap-news.xml</loc></sitemap>
+</sitemapindex>"""
+
+SITEMAP = """<?xml version="1.0"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+<url><loc>{base}/c</loc><lastmod>2024-05-06</lastmod></url>
+<url><loc>{base}/d</loc><lastmod>2024-05-07</lastmod></url>
+</urlset>"""
+
+
+@pytest.fixture
+def feed_server():
+    """Local HTTP stand-in serving fixture feeds and article pages."""
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.path)
+            path = self.path.split("?")[0]
+            base = f"http://127.0.0.1:{self.server.server_port}"
+            pages = {
+                "/rss.xml": ("application/rss+xml", RSS),
+                "/atom.xml": ("application/atom+xml", ATOM),
+                "/sitemap.xml": ("application/xml", SITEMAP_INDEX),
+                "/sitemap-news.xml": ("application/xml", SITEMAP),
+            }
+            if path in pages:
+                content_type, body = pages[path]
+                body = body.format(base=base)
+            elif path in ("/a", "/b", "/c", "/d"):
+                content_type, body = "text/html; charset=utf-8", ARTICLE_HTML.format(title=path)
+            else:
+                self.send_error(404)
+                return
+            data = body.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    server.requests = requests
+    server.base = f"http://127.0.0.1:{server.server_port}"
+    # The SSRF guard rejects loopback/http — the stand-in is trusted here
+    passthrough = lambda url: (url, "127.0.0.1")  # noqa: E731
+    with patch("app.ingest.feeds.validate_url", side_effect=passthrough), \
+         patch("app.scraper.scraper.validate_url", side_effect=passthrough):
+        yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _graph(tokens=1000):
+    return ([{"id": "paradigm", "label": "Paradigm", "type": "Investor", "properties": {}}], [], tokens)
+
+
+class TestParseFeed:
+    def test_rss(self):
+        entries, sitemaps = parse_feed(RSS.format(base="https://x.com").encode())
+        assert [e.url for e in entries] == ["https://x.com/a?utm_source=rss", "https://x.com/b"]
+        assert sitemaps == []
+
+    def test_atom(self):
+        entries, _ = parse_feed(ATOM.format(base="https://x.com").encode())
+        assert [e.url for e in entries] == ["https://x.com/b", "https://x.com/c"]
+        assert entries[1].updated == "2024-05-06T11:00:00Z"
+
+    def test_sitemap_index(self):
+        entries, sitemaps = parse_feed(SITEMAP_INDEX.format(base="https://x.com").encode())
+        assert entries == []
+        assert sitemaps == ["https://x.com/sitemap-news.xml"]
+
+    def test_entities_are_not_expanded(self):
+        xxe = b"""<?xml version="1.0"?><!DOCTYPE r [<!ENTITY x SYSTEM "file:///etc/passwd">]>
+        <rss><channel><item><link>https://x.com/&x;</link></item></channel></rss>"""
+        entries, _ = parse_feed(xxe)
+        assert all("root:" not in e.url for e in entries)
+
+
+class TestIngestWorker:
+    @pytest.mark.asyncio
+    async def test_polls_feeds_and_dedupes_urls(self, feed_server):
+        base = feed_server.base
+        worker = IngestWorker(None, [f"{base}/rss.xml", f"{base}/atom.xml", f"{base}/sitemap.xml"])
+        with patch("app.ingest.worker._extract_graph", new=AsyncMock(return_value=_graph())) as extract, \
+             patch("app.ingest.worker.find_near_duplicate", return_value=None):
+            assert await worker.poll_once() == 4  # a, b, c, d — b and c listed twice
+            assert extract.await_count == 4
+            # Second round: everything already processed
+            assert await worker.poll_once() == 0
+        article_fetches = [p for p in feed_server.requests if not p.endswith(".xml")]
+        assert sorted(p.split("?")[0] for p in article_fetches) == ["/a", "/b", "/c", "/d"]
+        assert worker.stats["skipped_seen"] == 4
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self, feed_server):
+        import asyncio
+
+        active = peak = 0
+
+        async def slow_extract(content, key):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.02)
+            active -= 1
+            return _graph()
+
+        worker = IngestWorker(None, [f"{feed_server.base}/rss.xml", f"{feed_server.base}/atom.xml"], concurrency=1)
+        with patch("app.ingest.worker._extract_graph", new=slow_extract), \
+             patch("app.ingest.worker.find_near_duplicate", return_value=None):
+            assert await worker.poll_once() == 3
+        assert peak == 1
+
+    @pytest.mark.asyncio
+    async def test_token_budget_defers_and_retries_later(self, feed_server):
+        worker = IngestWorker(None, [f"{feed_server.base}/rss.xml"], concurrency=1, tokens_per_hour=3000)
+        with patch("app.ingest.worker._extract_graph", new=AsyncMock(return_value=_graph(2500))), \
+             patch("app.ingest.worker.find_near_duplicate", return_value=None):
+            assert await worker.poll_once() == 1
+            assert worker.stats["deferred"] == 1
+            worker.budget._hour -= 1  # next hour
+            assert await worker.poll_once() == 1
+
+    @pytest.mark.asyncio
+    async def test_near_duplicates_are_not_extracted(self, feed_server):
+        worker = IngestWorker(None, [f"{feed_server.base}/rss.xml"])
+        with patch("app.ingest.worker._extract_graph", new=AsyncMock()) as extract, \
+             patch("app.ingest.worker.find_near_duplicate", return_value=MagicMock()):
+            assert await worker.poll_once() == 0
+        extract.assert_not_awaited()
+        assert worker.stats["near_duplicates"] == 2
+
+    @pytest.mark.asyncio
+    async def test_unexpected_failure_releases_claim_and_spares_the_batch(self, feed_server):
+        import httpx
+
+        async def extract(content, key):
+            if "/a" in content:
+                raise httpx.ReadError("connection reset")
+            return _graph()
+
+        worker = IngestWorker(None, [f"{feed_server.base}/rss.xml"], concurrency=1, tokens_per_hour=10_000)
+        with patch("app.ingest.worker._extract_graph", new=extract), \
+             patch("app.ingest.worker.find_near_duplicate", return_value=None):
+            assert await worker.poll_once() == 1  # b still extracted
+            assert worker.stats["errors"] == 1
+            assert worker.budget._used == 1000  # a's reservation refunded
+            assert await worker.poll_once() == 0  # a retried, b already seen
+            assert worker.stats["errors"] == 2
+            assert worker.stats["skipped_seen"] == 1
+
+    @pytest.mark.asyncio
+    async def test_transient_scrape_failure_releases_claim(self, feed_server):
+        from fastapi import HTTPException
+
+        worker = IngestWorker(None, [f"{feed_server.base}/rss.xml"])
+        unavailable = HTTPException(status_code=503, detail={"error": "service_unavailable", "message": "slow"})
+        with patch("app.ingest.worker._fetch_url_content", new=AsyncMock(side_effect=unavailable)):
+            assert await worker.poll_once() == 0
+        assert worker.stats["scrape_failed"] == 2
+        assert worker._seen == set()  # both retried on the next poll
+
+    @pytest.mark.asyncio
+    async def test_unreachable_feed_is_counted(self, feed_server):
+        worker = IngestWorker(None, [f"{feed_server.base}/missing.xml"])
+        assert await worker.poll_once() == 0
+        assert worker.stats["feed_errors"] == 1
+
+
+class TestIngestStartup:
+    @pytest.mark.parametrize("redis, threshold, started", [
+        (None, 0.92, False),
+        (MagicMock(), 0.0, False),
+        (MagicMock(), 0.92, True),
+    ])
+    def test_needs_redis_and_neardup(self, redis, threshold, started):
+        from fastapi.testclient import TestClient
+
+        from app.main import app
+
+        driver = MagicMock(verify_connectivity=AsyncMock(), close=AsyncMock())
+        with patch("app.main.AsyncGraphDatabase.driver", return_value=driver), \
+             patch("app.main.ensure_schema", new=AsyncMock(return_value=[])), \
+             patch("app.main.create_redis_client", return_value=redis), \
+             patch("app.main.IngestWorker") as worker_cls, \
+             patch("app.main.settings.ingest_enabled", True), \
+             patch("app.main.settings.ingest_feeds", ["https://news.com/rss.xml"]), \
+             patch("app.main.settings.neardup_threshold", threshold):
+            worker_cls.return_value.run = AsyncMock()
+            with TestClient(app):
+                assert (app.state.ingest_worker is not None) == started
+
+
+class TestTokenBudget:
+    def test_redis_budget_uses_hourly_counter(self):
+        redis = MagicMock()
+        redis.eval.return_value = 1500
+        budget = TokenBudget(redis, tokens_per_hour=2000)
+        hour = budget.reserve(1500)
+        assert hour is not None
+        script, keys, args = redis.eval.call_args[0]
+        assert keys == [f"ingest:tokens:{hour}"]
+        assert args == [1500, 2000]
+
+    def test_redis_budget_exhausted(self):
+        redis = MagicMock()
+        redis.eval.return_value = -1
+        assert TokenBudget(redis, tokens_per_hour=2000).reserve(1500) is None
@@ -0,0 +1,201 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+from neo4j.exceptions import AuthError, ConstraintError, ServiceUnavailable, TokenExpired
+
+from app.graph.journal import GraphJournal, JournalReplayer
+
+NODES = [
+    {"id": "paradigm", "label": "Paradigm", "type": "Investor", "properties": {"aum": "$4B"}},
+    {"id": "uniswap", "label": "Uniswap", "type": "Project", "properties": {}},
+]
+EDGES = [{"source": "paradigm", "target": "uniswap", "relationship": "INVESTED_IN"}]
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = GraphJournal(str(tmp_path / "journal.sqlite3"))
+    yield journal
+    journal.close()
+
+
+class TestGraphJournal:
+    def test_append_and_get(self, journal):
+        journal.append("s1", NODES, EDGES, "user_abc")
+        entry = journal.get("s1")
+        assert (entry.session_id, entry.user_id, entry.nodes, entry.edges) == ("s1", "user_abc", NODES, EDGES)
+        assert journal.get("missing") is None
+
+    def test_survives_reopen(self, tmp_path):
+        path = str(tmp_path / "journal.sqlite3")
+        first = GraphJournal(path)
+        first.append("s1", NODES, EDGES, "user_abc")
+        first.close()
+        reopened = GraphJournal(path)
+        assert [e.session_id for e in reopened.pending(10)] == ["s1"]
+        reopened.close()
+
+    def test_pending_is_oldest_first_and_skips_failed(self, journal):
+        for session_id in ("a", "b", "c"):
+            journal.append(session_id, NODES, EDGES, "u")
+        journal.mark_failed("a", "rejected")
+        assert [e.session_id for e in journal.pending(10)] == ["b", "c"]
+        assert journal.get("a") is not None  # still readable
+        journal.remove(["b"])
+        assert journal.counts() == {"pending": 1, "failed": 1}
+
+
+    def test_claims_are_exclusive_until_the_lease_runs_out(self, journal):
+        for session_id in ("a", "b", "c"):
+            journal.append(session_id, NODES, EDGES, "u")
+        assert [e.session_id for e in journal.claim("w1", 2, lease=60)] == ["a", "b"]
+        assert [e.session_id for e in journal.claim("w2", 10, lease=60)] == ["c"]
+        assert journal.claim("w3", 10, lease=60) == []
+        with patch("app.graph.journal.time.time", return_value=10**10):
+            assert len(journal.claim("w3", 10, lease=60)) == 3  # leases expired
+
+    def test_reappended_graph_survives_the_old_replay(self, journal):
+        journal.append("s1", NODES, EDGES, "u")
+        journal.claim("w1", 10, lease=60)
+        journal.append("s1", NODES[:1], [], "u")  # regenerated mid-replay
+        journal.remove(["s1"], "w1")
+        assert journal.get("s1").nodes == NODES[:1]
+
+
+class TestJournalReplayer:
+    @pytest.mark.asyncio
+    async def test_drains_in_batches(self, journal):
+        for i in range(5):
+            journal.append(f"s{i}", NODES, EDGES, "u")
+        replayer = JournalReplayer(journal, MagicMock(), batch_size=2)
+        with patch("app.graph.journal.persist_graphs", new=AsyncMock()) as write:
+            assert await replayer.drain() == 5
+        assert write.await_count == 3
+        first_batch = write.call_args_list[0][0][1]
+        assert [g["session_id"] for g in first_batch] == ["s0", "s1"]
+        assert first_batch[0]["nodes"][0]["properties"] == '{"aum": "$4B"}'
+        assert journal.counts() == {"pending": 0, "failed": 0}
+
+    @pytest.mark.asyncio
+    async def test_two_workers_replay_each_graph_once(self, tmp_path):
+        import asyncio
+
+        path = str(tmp_path / "shared.sqlite3")
+        journals = [GraphJournal(path), GraphJournal(path)]
+        for i in range(10):
+            journals[0].append(f"s{i}", NODES, EDGES, "u")
+        written = []
+
+        async def write(driver, graphs):
+            await asyncio.sleep(0.01)
+            written.extend(g["session_id"] for g in graphs)
+
+        with patch("app.graph.journal.persist_graphs", new=AsyncMock(side_effect=write)):
+            await asyncio.gather(*(JournalReplayer(j, MagicMock(), batch_size=2).drain() for j in journals))
+        assert sorted(written) == sorted(f"s{i}" for i in range(10))
+        assert journals[0].counts() == {"pending": 0, "failed": 0}
+        for j in journals:
+            j.close()
+
+    @pytest.mark.asyncio
+    async def test_failed_replay_releases_its_claim(self, journal):
+        journal.append("s1", NODES, EDGES, "u")
+        replayer = JournalReplayer(journal, MagicMock())
+        with patch("app.graph.journal.persist_graphs", new=AsyncMock(side_effect=ServiceUnavailable("down"))):
+            with pytest.raises(ServiceUnavailable):
+                await replayer.drain()
+        assert [e.session_id for e in journal.claim("other", 10, lease=60)] == ["s1"]
+
+    @pytest.mark.asyncio
+    async def test_connection_failure_keeps_graphs_journaled(self, journal):
+        journal.append("s1", NODES, EDGES, "u")
+        replayer = JournalReplayer(journal, MagicMock())
+        with patch("app.graph.journal.persist_graphs", new=AsyncMock(side_effect=ServiceUnavailable("down"))):
+            with pytest.raises(ServiceUnavailable):
+                await replayer.drain()
+        assert journal.counts() == {"pending": 1, "failed": 0}
+
+    @pytest.mark.asyncio
+    async def test_rejected_graph_is_parked(self, journal):
+        for session_id in ("a", "bad", "b"):
+            journal.append(session_id, NODES, EDGES, "u")
+
+        async def write(driver, graphs):
+            if any(g["session_id"] == "bad" for g in graphs):
+                raise ConstraintError("rejected")
+
+        replayer = JournalReplayer(journal, MagicMock())
+        with patch("app.graph.journal.persist_graphs", new=AsyncMock(side_effect=write)):
+            assert await replayer.drain() == 2
+        assert journal.counts() == {"pending": 0, "failed": 1}
+        assert replayer.stats["failed"] == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("error", [AuthError("bad credentials"), TokenExpired("token expired")])
+    async def test_auth_failure_is_retried_not_parked(self, journal, error):
+        journal.append("s1", NODES, EDGES, "u")
+        journal.append("s2", NODES, EDGES, "u")
+        replayer = JournalReplayer(journal, MagicMock())
+        with patch("app.graph.journal.persist_graphs", new=AsyncMock(side_effect=error)) as write:
+            with pytest.raises(type(error)):
+                await replayer.drain()
+        assert write.await_count == 1  # not split graph by graph
+        assert journal.counts() == {"pending": 2, "failed": 0}
+
+
+class TestWriteBehindPipeline:
+    @pytest.mark.asyncio
+    async def test_responds_without_touching_neo4j(self, journal):
+        from app.generate import service
+        with patch.object(service, "_extract_graph", new=AsyncMock(return_value=(NODES, EDGES, 100))), \
+             patch.object(service, "persist_graph", new=AsyncMock(side_effect=ServiceUnavailable("down"))) as persist:
+            result = await service.run_generate_pipeline(
+                "Paradigm Capital led a round. " * 10, MagicMock(), graph_journal=journal,
+            )
+        persist.assert_not_awaited()
+        assert journal.get(result["meta"]["session_id"]).nodes == NODES
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_direct_write_when_journal_fails(self, journal):
+        from app.generate import service
+        journal.close()  # appends now raise sqlite3.ProgrammingError
+        with patch.object(service, "_extract_graph", new=AsyncMock(return_value=(NODES, EDGES, 100))), \
+             patch.object(service, "persist_graph", new=AsyncMock()) as persist:
+            await service.run_generate_pipeline("Paradigm Capital led a round. " * 10, MagicMock(), graph_journal=journal)
+        persist.assert_awaited_once()
+
+    def test_pending_session_is_served_from_journal(self, journal):
+        from app.dependencies import get_current_user, get_graph_journal, get_neo4j_driver
+        from app.generate import router
+        from app.main import app
+
+        journal.append("s1", NODES, EDGES, "user_abc")
+        app.dependency_overrides[get_current_user] = lambda: {"sub": "user_abc"}
+        app.dependency_overrides[get_graph_journal] = lambda: journal
+        app.dependency_overrides[get_neo4j_driver] = lambda: MagicMock()
+        driver = MagicMock(verify_connectivity=AsyncMock(), close=AsyncMock())
+        try:
+            with patch("app.main.AsyncGraphDatabase.driver", return_value=driver), \
+                 patch("app.main.ensure_schema", new=AsyncMock(return_value=[])), \
+                 patch.object(router, "get_graph_by_session", new=AsyncMock(return_value=None)) as neo4j_read, \
+                 TestClient(app) as client:
+                response = client.get("/api/generate/session/s1")
+                other = client.get("/api/generate/session/s2")
+        finally:
+            app.dependency_overrides.clear()
+        assert response.status_code == 200
+        assert response.json()["graph"] == {"nodes": NODES, "edges": EDGES}
+        neo4j_read.assert_awaited_once()  # only for s2, which is not journaled
+        assert other.status_code == 404
+
+    def test_unwritable_journal_path_fails_startup_clearly(self, tmp_path):
+        from app.main import app
+
+        driver = MagicMock(verify_connectivity=AsyncMock(), close=AsyncMock())
+        with patch("app.main.AsyncGraphDatabase.driver", return_value=driver), \
+             patch("app.main.ensure_schema", new=AsyncMock(return_value=[])), \
+             patch("app.main.settings.neo4j_write_behind", True), \
+             patch("app.main.settings.neo4j_journal_path", str(tmp_path / "missing" / "journal.sqlite3")):
+            with pytest.raises(RuntimeError, match="NEO4J_JOURNAL_PATH"):
+                with TestClient(app):
+                    pass
@@ -1,7 +1,26 @@
 import pytest
 from unittest.mock import MagicMock, patch
 from fastapi import HTTPException
-from app.ratelimit.limiter import check_rate_limit, get_usage, _build_limiters
+from upstash_ratelimit import Ratelimit
+from upstash_ratelimit.limiter import Response
+
+from app.ratelimit.limiter import check_rate_limit, get_usage, build_limiters, HybridRatelimit
+
+
+class TestBuildLimiters:
+    def test_none_when_redis_is_none(self):
+        assert build_limiters(None) is None
+
+    def test_builds_anon_and_auth(self):
+        anon, auth = build_limiters(MagicMock())
+        assert isinstance(anon, Ratelimit)
+        assert isinstance(auth, Ratelimit)
+
+    def test_hybrid_wraps_limiters(self):
+        with patch("app.ratelimit.limiter.settings.ratelimit_hybrid", True):
+            anon, auth = build_limiters(MagicMock())
+        assert isinstance(anon, HybridRatelimit)
+        assert isinstance(auth, HybridRatelimit)
 
 
 class TestCheckRateLimit:
@@ -9,64 +28,48 @@ class TestCheckRateLimit:
         check_rate_limit(None, "user_123", "1.2.3.4")  # should not raise
 
     def test_raises_429_when_not_allowed(self):
-        redis = MagicMock()
         mock_result = MagicMock()
         mock_result.allowed = False
         mock_result.reset = 1000000000 + 3600  # future timestamp
+        mock_limiter = MagicMock()
+        mock_limiter.limit.return_value = mock_result
 
-        with patch("app.ratelimit.limiter._build_limiters") as mock_build:
-            mock_limiter = MagicMock()
-            mock_limiter.limit.return_value = mock_result
-            mock_build.return_value = (mock_limiter, mock_limiter)
-
-            with pytest.raises(HTTPException) as exc_info:
-                check_rate_limit(redis, "user_123", "1.2.3.4")
-            assert exc_info.value.status_code == 429
-            assert exc_info.value.detail["error"] == "rate_limited"
-            assert "retry_after" in exc_info.value.detail
-            assert "Retry-After" in exc_info.value.headers
+        with pytest.raises(HTTPException) as exc_info:
+            check_rate_limit((mock_limiter, mock_limiter), "user_123", "1.2.3.4")
+        assert exc_info.value.status_code == 429
+        assert exc_info.value.detail["error"] == "rate_limited"
+        assert "retry_after" in exc_info.value.detail
+        assert "Retry-After" in exc_info.value.headers
 
     def test_passes_when_allowed(self):
-        redis = MagicMock()
         mock_result = MagicMock()
         mock_result.allowed = True
+        mock_limiter = MagicMock()
+        mock_limiter.limit.return_value = mock_result
 
-        with patch("app.ratelimit.limiter._build_limiters") as mock_build:
-            mock_limiter = MagicMock()
-            mock_limiter.limit.return_value = mock_result
-            mock_build.return_value = (mock_limiter, mock_limiter)
-
-            check_rate_limit(redis, "user_123", "1.2.3.4")  # should not raise
+        check_rate_limit((mock_limiter, mock_limiter), "user_123", "1.2.3.4")  # should not raise
 
     def test_anon_uses_ip_as_identifier(self):
-        redis = MagicMock()
         mock_result = MagicMock()
         mock_result.allowed = True
+        anon_limiter = MagicMock()
+        auth_limiter = MagicMock()
+        anon_limiter.limit.return_value = mock_result
 
-        with patch("app.ratelimit.limiter._build_limiters") as mock_build:
-            anon_limiter = MagicMock()
-            auth_limiter = MagicMock()
-            anon_limiter.limit.return_value = mock_result
-            mock_build.return_value = (anon_limiter, auth_limiter)
-
-            check_rate_limit(redis, "anonymous", "1.2.3.4")
-            anon_limiter.limit.assert_called_once_with("1.2.3.4")
-            auth_limiter.limit.assert_not_called()
+        check_rate_limit((anon_limiter, auth_limiter), "anonymous", "1.2.3.4")
+        anon_limiter.limit.assert_called_once_with("1.2.3.4")
+        auth_limiter.limit.assert_not_called()
 
     def test_auth_uses_user_id_as_identifier(self):
-        redis = MagicMock()
         mock_result = MagicMock()
         mock_result.allowed = True
+        anon_limiter = MagicMock()
+        auth_limiter = MagicMock()
+        auth_limiter.limit.return_value = mock_result
 
-        with patch("app.ratelimit.limiter._build_limiters") as mock_build:
-            anon_limiter = MagicMock()
-            auth_limiter = MagicMock()
-            auth_limiter.limit.return_value = mock_result
-            mock_build.return_value = (anon_limiter, auth_limiter)
-
-            check_rate_limit(redis, "user_abc", "1.2.3.4")
-            auth_limiter.limit.assert_called_once_with("user_abc")
-            anon_limiter.limit.assert_not_called()
+        check_rate_limit((anon_limiter, auth_limiter), "user_abc", "1.2.3.4")
+        auth_limiter.limit.assert_called_once_with("user_abc")
+        anon_limiter.limit.assert_not_called()
 
 
 class TestGetUsage:
@@ -75,14 +78,84 @@ class TestGetUsage:
         assert result == {"used": 0, "limit": 0, "reset": 0}
 
     def test_returns_usage_info(self):
-        redis = MagicMock()
-        with patch("app.ratelimit.limiter._build_limiters") as mock_build:
-            mock_limiter = MagicMock()
-            mock_limiter.get_remaining.return_value = 1
-            mock_limiter.get_reset.return_value = 1000000
-            mock_build.return_value = (mock_limiter, mock_limiter)
-
-            result = get_usage(redis, "user_123", "1.2.3.4")
-            assert result["used"] == 2  # 3 - 1
-            assert result["limit"] == 3
-            assert result["reset"] == 1000000
+        mock_limiter = MagicMock()
+        mock_limiter.get_remaining.return_value = 1
+        mock_limiter.get_reset.return_value = 1000000
+
+        result = get_usage((mock_limiter, mock_limiter), "user_123", "1.2.3.4")
+        assert result["used"] == 2  # 3 - 1
+        assert result["limit"] == 3
+        assert result["reset"] == 1000000
+
+
+def _remote(max_requests=3):
+    """Mock Ratelimit that counts like a FixedWindow in Redis."""
+    remote = MagicMock()
+    remote.count = 0
+
+    def limit(identifier, rate=1):
+        remote.count += rate
+        return Response(
+            allowed=remote.count <= max_requests,
+            limit=max_requests,
+            remaining=max(0, max_requests - remote.count),
+            reset=0.0,
+        )
+
+    remote.limit.side_effect = limit
+    remote.get_remaining.side_effect = lambda identifier: max(0, max_requests - remote.count)
+    return remote
+
+
+class TestHybridRatelimit:
+    def test_first_request_goes_to_redis(self):
+        remote = _remote()
+        hybrid = HybridRatelimit(remote, 3, 86400, local_margin=1)
+        assert hybrid.limit("user").allowed
+        remote.limit.assert_called_once_with("user", rate=1)
+
+    def test_clearly_allowed_is_local(self):
+        remote = _remote(max_requests=10)
+        hybrid = HybridRatelimit(remote, 10, 86400, local_margin=1)
+        for _ in range(9):
+            assert hybrid.limit("user").allowed
+        # 1 sync + 8 local allows (9 remaining at sync, stops at margin)
+        assert remote.limit.call_count == 1
+
+    def test_boundary_reconciles_pending_with_redis(self):
+        remote = _remote(max_requests=3)
+        hybrid = HybridRatelimit(remote, 3, 86400, local_margin=1)
+        assert hybrid.limit("user").allowed   # remote, count=1, remaining=2
+        assert hybrid.limit("user").allowed   # local (2 > margin)
+        assert hybrid.limit("user").allowed   # boundary: remote rate=2, count=3
+        assert remote.limit.call_args_list[-1].kwargs == {"rate": 2}
+        assert remote.count == 3
+
+    def test_clearly_denied_is_local(self):
+        remote = _remote(max_requests=3)
+        hybrid = HybridRatelimit(remote, 3, 86400, local_margin=1)
+        for _ in range(3):
+            hybrid.limit("user")
+        calls = remote.limit.call_count
+        for _ in range(5):
+            assert not hybrid.limit("user").allowed
+        assert remote.limit.call_count == calls
+        assert remote.count == 3  # never over the limit on a single worker
+
+    def test_new_window_goes_back_to_redis(self):
+        remote = _remote(max_requests=3)
+        hybrid = HybridRatelimit(remote, 3, 86400, local_margin=1)
+        with patch("app.ratelimit.limiter.time.time", return_value=86400 * 10 + 5):
+            for _ in range(3):
+                hybrid.limit("user")
+        remote.count = 0  # Redis key expired with the window
+        with patch("app.ratelimit.limiter.time.time", return_value=86400 * 11 + 5):
+            assert hybrid.limit("user").allowed
+        assert remote.limit.call_args_list[-1].kwargs == {"rate": 1}
+
+    def test_get_remaining_subtracts_pending(self):
+        remote = _remote(max_requests=10)
+        hybrid = HybridRatelimit(remote, 10, 86400, local_margin=1)
+        hybrid.limit("user")
+        hybrid.limit("user")  # local
+        assert hybrid.get_remaining("user") == 8
@@ -0,0 +1,69 @@
+from unittest.mock import patch
+
+from app.localcache import LocalTTLCache
+
+
+class TestLocalTTLCache:
+    def test_get_returns_stored_value(self):
+        cache = LocalTTLCache(max_bytes=100, ttl=60)
+        cache.set("a", "hello")
+        assert cache.get("a") == "hello"
+        assert cache.stats()["hits"] == 1
+
+    def test_miss_counts(self):
+        cache = LocalTTLCache(max_bytes=100, ttl=60)
+        assert cache.get("missing") is None
+        assert cache.stats()["misses"] == 1
+
+    def test_expires_after_ttl(self):
+        cache = LocalTTLCache(max_bytes=100, ttl=60)
+        with patch("app.localcache.time.monotonic", return_value=1000.0):
+            cache.set("a", "hello")
+        with patch("app.localcache.time.monotonic", return_value=1061.0):
+            assert cache.get("a") is None
+        assert cache.bytes == 0
+
+    def test_per_entry_ttl_cannot_exceed_default(self):
+        cache = LocalTTLCache(max_bytes=100, ttl=10)
+        with patch("app.localcache.time.monotonic", return_value=1000.0):
+            cache.set("a", "hello", ttl=3600)
+        with patch("app.localcache.time.monotonic", return_value=1011.0):
+            assert cache.get("a") is None
+
+    def test_evicts_least_recently_used_by_bytes(self):
+        cache = LocalTTLCache(max_bytes=10, ttl=60)
+        cache.set("a", "aaaa")
+        cache.set("b", "bbbb")
+        cache.get("a")  # a is now most recently used
+        cache.set("c", "cccc")
+        assert cache.get("b") is None
+        assert cache.get("a") == "aaaa"
+        assert cache.get("c") == "cccc"
+        assert cache.stats()["evictions"] == 1
+        assert cache.bytes == 8
+
+    def test_oversized_value_is_not_stored(self):
+        cache = LocalTTLCache(max_bytes=4, ttl=60)
+        cache.set("a", "too long")
+        assert cache.get("a") is None
+        assert cache.bytes == 0
+
+    def test_zero_bytes_disables(self):
+        cache = LocalTTLCache(max_bytes=0, ttl=60)
+        cache.set("a", "x")
+        assert cache.get("a") is None
+
+    def test_overwrite_updates_size(self):
+        cache = LocalTTLCache(max_bytes=100, ttl=60)
+        cache.set("a", "xx")
+        cache.set("a", "xxxxx")
+        assert cache.bytes == 5
+        cache.pop("a")
+        assert cache.bytes == 0
+
+    def test_str_is_sized_in_utf8_bytes(self):
+        cache = LocalTTLCache(max_bytes=10, ttl=60)
+        cache.set("a", "€€€€")  # 4 characters, 12 bytes
+        assert cache.get("a") is None
+        cache.set("b", "€€")
+        assert cache.bytes == 6
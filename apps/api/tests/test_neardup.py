@@ -0,0 +1,65 @@
+import json
+from unittest.mock import MagicMock, patch
+
+from app.generate import neardup
+from app.generate.neardup import (
+    find_near_duplicate, index_extraction, neardup_stats, simhash, similarity, _bands,
+)
+from tests.conftest import FakeRedis
+
+RELEASE = " ".join(
+    f"Paragraph {i}: Paradigm led a $50 million Series B round in restaking protocol number {i * 7}, "
+    f"with participation from Coinbase Ventures and fund {i * 13} across Europe and Asia."
+    for i in range(40)
+)
+NODES = [{"id": "paradigm", "label": "Paradigm", "type": "Investor", "properties": {}}]
+EDGES = []
+
+
+class TestSimHash:
+    def test_syndicated_copy_is_similar(self):
+        copy = "Originally published by The Block. " + RELEASE + " Subscribe to our newsletter."
+        assert similarity(simhash(RELEASE), simhash(copy)) >= 0.92
+
+    def test_different_articles_are_not(self):
+        other = "Uniswap Labs announced a new governance proposal to turn on the protocol fee switch. " * 5
+        assert similarity(simhash(RELEASE), simhash(other)) < 0.8
+
+    def test_bands_cover_all_bits(self):
+        bands = _bands(0.92)
+        assert len(bands) == 6  # up to 5 differing bits
+        assert sum(width for _, width in bands) == 64
+
+
+class TestIndex:
+    def test_reuses_graph_for_near_duplicate(self):
+        redis = FakeRedis()
+        index_extraction(redis, RELEASE, NODES, EDGES)
+        found = find_near_duplicate(redis, "Originally published by The Block. " + RELEASE)
+        assert found.nodes == NODES
+        assert found.similarity >= 0.92
+        assert neardup_stats()["hits"] == 1
+
+    def test_miss_for_unrelated_content(self):
+        redis = FakeRedis()
+        index_extraction(redis, RELEASE, NODES, EDGES)
+        assert find_near_duplicate(redis, "Completely unrelated text about the weather in Lisbon. " * 10) is None
+
+    def test_disabled_with_zero_threshold(self):
+        redis = MagicMock()
+        with patch("app.generate.neardup.settings.neardup_threshold", 0):
+            index_extraction(redis, RELEASE, NODES, EDGES)
+            assert find_near_duplicate(redis, RELEASE) is None
+        redis.set.assert_not_called()
+
+    def test_redis_error_is_a_miss(self):
+        redis = MagicMock()
+        redis.eval.side_effect = ConnectionError("down")
+        assert find_near_duplicate(redis, RELEASE) is None
+
+    def test_entry_expires_with_ttl(self):
+        redis = MagicMock()
+        index_extraction(redis, RELEASE, NODES, EDGES)
+        key, value = redis.set.call_args[0]
+        assert redis.set.call_args[1]["ex"] == 7 * 86400
+        assert json.loads(value)["nodes"] == NODES
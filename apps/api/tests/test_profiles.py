@@ -0,0 +1,64 @@
+import pytest
+from lxml import etree
+
+from app.scraper.profiles import compile_selector, profile_for, _profile
+from app.scraper.scraper import _TextExtractor, _extract_text
+
+ARTICLE = "Paradigm Capital led a $50M Series B. " * 5
+
+
+def _el(html):
+    return etree.fromstring(html, etree.HTMLParser()).find(".//body/*")
+
+
+class TestSelectors:
+    def test_tag_class_and_id(self):
+        selector = compile_selector("div.article-body.main#content")
+        assert selector.matches(_el('<div class="x article-body main" id="content"></div>'))
+        assert not selector.matches(_el('<div class="article-body" id="content"></div>'))
+        assert not selector.matches(_el('<section class="article-body main" id="content"></section>'))
+
+    def test_class_only(self):
+        assert compile_selector(".newsletter").matches(_el('<aside class="newsletter"></aside>'))
+
+    @pytest.mark.parametrize("selector", ["div p", "[data-x=1]", "", "#a#b"])
+    def test_rejects_unsupported(self, selector):
+        with pytest.raises(ValueError):
+            compile_selector(selector)
+
+
+class TestProfileFor:
+    def test_matches_host_and_www(self):
+        assert profile_for("https://www.coindesk.com/markets/a") is profile_for("https://coindesk.com/b")
+        assert profile_for("https://coindesk.com/b") is not None
+
+    def test_matches_subdomain(self):
+        assert profile_for("https://markets.techcrunch.com/a") is profile_for("https://techcrunch.com/a")
+
+    def test_no_profile_for_unknown_host(self):
+        assert profile_for("https://example.com/a") is None
+        assert profile_for("https://notcoindesk.com/a") is None
+
+
+class TestProfileExtraction:
+    def test_keeps_title_and_content_drops_widgets(self):
+        html = (
+            "<html><body><h1>Raise</h1><article><div class='document-body'>"
+            f"<p>{ARTICLE}</p><div class='newsletter-signup'><p>Sign up now</p></div></div>"
+            "<div class='related-articles'><h3>Other story</h3></div></article></body></html>"
+        )
+        text = _extract_text(html, "https://www.coindesk.com/a")
+        assert text == "Raise " + ARTICLE.strip()
+        # Generic extraction keeps the widgets
+        assert "Other story" in _extract_text(html)
+
+    def test_falls_back_to_generic_without_content_match(self):
+        html = f"<html><body><h1>Raise</h1><article><p>{ARTICLE}</p><div class='related-articles'>More</div></article></body></html>"
+        assert _extract_text(html, "https://coindesk.com/a") == "Raise " + ARTICLE.strip()
+
+    def test_stops_after_max_sections(self):
+        profile = _profile(hosts=["x.com"], content=["div.body"], max_sections=1)
+        extractor = _TextExtractor(profile=profile)
+        assert extractor.feed(f"<html><body><div class='body'><p>{ARTICLE}</p></div>")
+        extractor.feed("<div class='body'><p>Second section</p></div></body></html>")
+        assert extractor.close() == ARTICLE.strip()
@@ -0,0 +1,77 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.graph.properties import (
+    PROPERTY_KEYS, migrate_to_native, native_properties, parse_amount_usd, read_properties,
+)
+from tests.conftest import FakeResult
+
+
+class TestParseAmountUsd:
+    @pytest.mark.parametrize("amount, value", [
+        ("$50M", 50e6),
+        ("$1.5B", 1.5e9),
+        ("$4.5bn", 4.5e9),
+        ("USD 500K", 500e3),
+        ("$2.3 billion", 2.3e9),
+        ("$12,500,000", 12.5e6),
+        ("$10M-$15M", 10e6),
+        ("up to $20 million", 20e6),
+    ])
+    def test_parses(self, amount, value):
+        assert parse_amount_usd(amount) == pytest.approx(value)
+
+    @pytest.mark.parametrize("amount", [None, "", "undisclosed"])
+    def test_no_number(self, amount):
+        assert parse_amount_usd(amount) is None
+
+
+class TestNativeProperties:
+    def test_all_keys_present_for_clearing(self):
+        native = native_properties({"stage": "Seed"})
+        assert set(native) == {*PROPERTY_KEYS, "amount_usd_value"}
+        assert native["stage"] == "Seed" and native["chain"] is None
+
+    def test_rejects_unknown_keys_and_nested_values(self):
+        assert native_properties({"extra": "x"}) is None
+        assert native_properties({"stage": {"name": "Seed"}}) is None
+
+    def test_read_properties_handles_both_layouts(self):
+        assert read_properties({"properties": '{"stage": "Seed"}'}) == {"stage": "Seed"}
+        assert read_properties({"properties": None, "stage": "Seed", "chain": None}) == {"stage": "Seed"}
+
+
+class TestMigrateToNative:
+    @pytest.mark.asyncio
+    async def test_converts_in_batches_and_skips_unconvertible(self):
+        legacy = {
+            "n1": json.dumps({"amount_usd": "$50M", "stage": "Series B"}),
+            "n2": json.dumps({"chain": "Ethereum"}),
+            "n3": json.dumps({"extra": {"nested": True}}),
+        }
+        written = []
+
+        async def run(query, limit):
+            return FakeResult(
+                {"element_id": element_id, "properties": properties}
+                for element_id, properties in list(legacy.items())[:limit]
+            )
+
+        async def execute_write(fn, rows):
+            for row in rows:
+                written.append(row)
+                legacy.pop(row["element_id"])
+
+        session = MagicMock(run=AsyncMock(side_effect=run), execute_write=AsyncMock(side_effect=execute_write))
+        driver = MagicMock()
+        driver.session.return_value.__aenter__ = AsyncMock(return_value=session)
+        driver.session.return_value.__aexit__ = AsyncMock(return_value=False)
+
+        counts = await migrate_to_native(driver, batch_size=2)
+
+        assert counts == {"migrated": 2, "skipped": 1}
+        assert list(legacy) == ["n3"]  # left as JSON
+        first = next(row for row in written if row["element_id"] == "n1")
+        assert first["native"]["amount_usd_value"] == 50e6
+        assert first["native"]["stage"] == "Series B"
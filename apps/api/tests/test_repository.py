@@ -1,9 +1,15 @@
 import json
 import pytest
-from unittest.mock import MagicMock, patch, call
+from unittest.mock import AsyncMock, MagicMock, patch
 from neo4j.exceptions import ServiceUnavailable, SessionExpired
 
-from app.graph.repository import persist_graph, get_graph_by_session
+from app.graph.canonical import canonical_slug
+from app.graph.properties import PROPERTY_KEYS
+from app.graph.repository import (
+    ENTITY_SESSIONS_CYPHER, GET_GRAPH_CYPHER, PERSIST_GRAPH_CYPHER,
+    find_entity_sessions, get_graph_by_session, graph_params, persist_graph, persist_graphs,
+)
+from tests.conftest import FakeResult
 
 
 SAMPLE_NODES = [
@@ -16,184 +22,275 @@ SAMPLE_EDGES = [
 ]
 
 
+def _make_session():
+    session = MagicMock()
+    session.run = AsyncMock(return_value=FakeResult([]))
+    # Managed transactions: execute_write calls the transaction function once
+    # with a tx whose run() is recorded on session.tx
+    session.tx = MagicMock()
+    session.tx.run = AsyncMock(return_value=MagicMock(consume=AsyncMock()))
+
+    async def execute_write(fn, *args, **kwargs):
+        return await fn(session.tx, *args, **kwargs)
+
+    session.execute_write = AsyncMock(side_effect=execute_write)
+    return session
+
+
 def _make_driver():
-    """Creates a mock Neo4j driver with session context manager."""
+    """Creates a mock AsyncDriver whose session() is an async context manager."""
     driver = MagicMock()
-    session = MagicMock()
-    driver.session.return_value.__enter__ = MagicMock(return_value=session)
-    driver.session.return_value.__exit__ = MagicMock(return_value=False)
+    session = _make_session()
+    driver.session.return_value.__aenter__ = AsyncMock(return_value=session)
+    driver.session.return_value.__aexit__ = AsyncMock(return_value=False)
     return driver, session
 
 
+def _flaky_driver(error):
+    """Driver whose first session fails with error, later sessions return no records."""
+    driver = MagicMock()
+    calls = 0
+
+    async def enter():
+        nonlocal calls
+        calls += 1
+        session = _make_session()
+        if calls == 1:
+            session.run.side_effect = error
+        return session
+
+    driver.session.return_value.__aenter__ = AsyncMock(side_effect=enter)
+    driver.session.return_value.__aexit__ = AsyncMock(return_value=False)
+    return driver
+
+
 class TestPersistGraph:
-    def test_persists_nodes_and_edges(self):
+    @pytest.mark.asyncio
+    async def test_persists_nodes_and_edges_in_one_transaction(self):
         driver, session = _make_driver()
-        persist_graph(driver, session_id="sess-1", nodes=SAMPLE_NODES, edges=SAMPLE_EDGES, user_id="user_abc")
-
-        assert session.run.call_count == 2
-        # First call: nodes UNWIND
-        node_call = session.run.call_args_list[0]
-        assert "UNWIND $nodes" in node_call[0][0]
-        assert node_call[1]["session_id"] == "sess-1"
-        assert node_call[1]["user_id"] == "user_abc"
+        await persist_graph(driver, session_id="sess-1", nodes=SAMPLE_NODES, edges=SAMPLE_EDGES, user_id="user_abc")
+
+        session.execute_write.assert_awaited_once()
+        session.run.assert_not_called()  # no auto-commit queries
+        session.tx.run.assert_awaited_once()
+        query, params = session.tx.run.call_args[0][0], session.tx.run.call_args[1]
+        assert query == PERSIST_GRAPH_CYPHER
+        assert "UNWIND g.nodes" in query and "UNWIND g.edges" in query
+        [graph] = params["graphs"]
+        assert graph["session_id"] == "sess-1"
+        assert graph["user_id"] == "user_abc"
+        assert graph["edges"] == SAMPLE_EDGES
         # Nodes should have properties serialized as JSON strings
-        for n in node_call[1]["nodes"]:
+        for n in graph["nodes"]:
             assert isinstance(n["properties"], str)
             json.loads(n["properties"])  # should not raise
+        session.tx.run.return_value.consume.assert_awaited_once()
 
-        # Second call: edges UNWIND
-        edge_call = session.run.call_args_list[1]
-        assert "UNWIND $edges" in edge_call[0][0]
-        assert edge_call[1]["session_id"] == "sess-1"
-
-    def test_serializes_properties_to_json(self):
+    @pytest.mark.asyncio
+    async def test_persist_graphs_writes_many_graphs_in_one_transaction(self):
+        driver, session = _make_driver()
+        graphs = [graph_params(f"s{i}", SAMPLE_NODES, SAMPLE_EDGES) for i in range(3)]
+        await persist_graphs(driver, graphs)
+        session.execute_write.assert_awaited_once()
+        assert session.tx.run.call_args[1]["graphs"] == graphs
+
+    def test_cypher_is_idempotent_on_session_and_id(self):
+        assert "CREATE (" not in PERSIST_GRAPH_CYPHER
+        assert "MERGE (n:Entity {session_id: g.session_id, id: node.id})" in PERSIST_GRAPH_CYPHER
+        assert "MERGE (s)-[:RELATES_TO" in PERSIST_GRAPH_CYPHER
+
+    @pytest.mark.asyncio
+    async def test_serializes_properties_to_json(self):
         driver, session = _make_driver()
         nodes = [{"id": "a", "label": "A", "type": "Investor", "properties": {"key": "val"}}]
-        persist_graph(driver, session_id="s1", nodes=nodes, edges=[], user_id="u1")
+        await persist_graph(driver, session_id="s1", nodes=nodes, edges=[], user_id="u1")
 
-        persisted_nodes = session.run.call_args_list[0][1]["nodes"]
+        persisted_nodes = session.tx.run.call_args[1]["graphs"][0]["nodes"]
         assert persisted_nodes[0]["properties"] == '{"key": "val"}'
 
-    def test_handles_empty_properties(self):
+    @pytest.mark.asyncio
+    async def test_handles_empty_properties(self):
         driver, session = _make_driver()
         nodes = [{"id": "a", "label": "A", "type": "Investor"}]
-        persist_graph(driver, session_id="s1", nodes=nodes, edges=[], user_id="u1")
+        await persist_graph(driver, session_id="s1", nodes=nodes, edges=[], user_id="u1")
 
-        persisted_nodes = session.run.call_args_list[0][1]["nodes"]
+        persisted_nodes = session.tx.run.call_args[1]["graphs"][0]["nodes"]
         assert persisted_nodes[0]["properties"] == "{}"
 
-    def test_retries_on_service_unavailable(self):
-        driver = MagicMock()
-        call_count = 0
-
-        def side_effect():
-            nonlocal call_count
-            call_count += 1
-            session = MagicMock()
-            if call_count == 1:
-                session.run.side_effect = ServiceUnavailable("Neo4j down")
-            else:
-                session.run.return_value = MagicMock()
-            return session
-
-        ctx = MagicMock()
-        ctx.__enter__ = MagicMock(side_effect=lambda: side_effect())
-        ctx.__exit__ = MagicMock(return_value=False)
-        driver.session.return_value = ctx
-
-        # Mock time.sleep to avoid real delay
-        with patch("app.graph.repository.time.sleep"):
-            persist_graph(driver, session_id="s1", nodes=SAMPLE_NODES, edges=SAMPLE_EDGES)
-
-    def test_raises_after_retry_exhausted(self):
-        driver = MagicMock()
-        session = MagicMock()
-        session.run.side_effect = ServiceUnavailable("still down")
-        driver.session.return_value.__enter__ = MagicMock(return_value=session)
-        driver.session.return_value.__exit__ = MagicMock(return_value=False)
-
-        with patch("app.graph.repository.time.sleep"):
-            with pytest.raises(ServiceUnavailable):
-                persist_graph(driver, session_id="s1", nodes=SAMPLE_NODES, edges=SAMPLE_EDGES)
+    @pytest.mark.asyncio
+    async def test_transient_retries_are_left_to_the_driver(self):
+        # execute_write raises only after its own retries are exhausted — no
+        # second, hand-rolled retry round on top
+        driver, session = _make_driver()
+        session.execute_write.side_effect = ServiceUnavailable("still down")
 
-    def test_default_user_id_is_anonymous(self):
+        with patch("app.graph.repository.asyncio.sleep", new=AsyncMock()) as sleep:
+            with pytest.raises(ServiceUnavailable):
+                await persist_graph(driver, session_id="s1", nodes=SAMPLE_NODES, edges=SAMPLE_EDGES)
+        sleep.assert_not_awaited()
+        assert session.execute_write.await_count == 1
+
+    def test_native_storage_writes_typed_properties(self):
+        with patch("app.graph.repository.settings.neo4j_property_storage", "native"):
+            [node] = graph_params("s1", [
+                {"id": "uniswap", "label": "Uniswap", "type": "Project", "properties": {"token_ticker": "UNI"}},
+            ], [])["nodes"]
+        assert node["properties"] is None  # clears any JSON string
+        assert node["native"]["token_ticker"] == "UNI"
+        assert node["native"]["aum"] is None  # cleared, not left stale
+        assert node["native"]["amount_usd_value"] is None
+
+    def test_native_storage_keeps_json_for_unknown_keys(self):
+        with patch("app.graph.repository.settings.neo4j_property_storage", "native"):
+            [node] = graph_params("s1", [
+                {"id": "a", "label": "A", "type": "Project", "properties": {"extra": {"nested": 1}}},
+            ], [])["nodes"]
+        assert json.loads(node["properties"]) == {"extra": {"nested": 1}}
+        assert node["native"] == {}
+
+    def test_native_storage_parses_amount(self):
+        with patch("app.graph.repository.settings.neo4j_property_storage", "native"):
+            [node] = graph_params("s1", [
+                {"id": "round", "label": "Series B", "type": "Round", "properties": {"amount_usd": "$50M"}},
+            ], [])["nodes"]
+        assert node["native"]["amount_usd"] == "$50M"
+        assert node["native"]["amount_usd_value"] == 50_000_000
+
+    def test_json_storage_is_the_default(self):
+        [node] = graph_params("s1", SAMPLE_NODES[:1], [])["nodes"]
+        assert json.loads(node["properties"]) == {"aum": "$4B"}
+        assert node["native"] == {}
+
+    @pytest.mark.asyncio
+    async def test_default_user_id_is_anonymous(self):
         driver, session = _make_driver()
-        persist_graph(driver, session_id="s1", nodes=SAMPLE_NODES, edges=SAMPLE_EDGES)
-        node_call = session.run.call_args_list[0]
-        assert node_call[1]["user_id"] == "anonymous"
+        await persist_graph(driver, session_id="s1", nodes=SAMPLE_NODES, edges=SAMPLE_EDGES)
+        assert session.tx.run.call_args[1]["graphs"][0]["user_id"] == "anonymous"
 
 
 class TestGetGraphBySession:
-    def test_returns_none_when_no_nodes(self):
+    @pytest.mark.asyncio
+    async def test_returns_none_when_no_record(self):
+        # Empty sessions and graphs owned by someone else both return no record
         driver, session = _make_driver()
-        session.run.return_value = iter([])  # empty result
-        result = get_graph_by_session(driver, "nonexistent-session")
+        session.run.return_value = FakeResult([])
+        result = await get_graph_by_session(driver, "nonexistent-session")
         assert result is None
 
-    def test_returns_graph_dict(self):
+    @pytest.mark.asyncio
+    async def test_returns_graph_dict_from_one_query(self):
         driver, session = _make_driver()
-        node_records = [
-            {"id": "paradigm", "label": "Paradigm", "type": "Investor",
-             "properties": '{"aum": "$4B"}', "session_id": "s1", "created_by": "user_abc"},
-        ]
-        edge_records = [
-            {"source": "paradigm", "target": "uniswap", "relationship": "INVESTED_IN"},
-        ]
-        # First run call returns nodes, second returns edges
-        session.run.side_effect = [iter(node_records), iter(edge_records)]
-
-        result = get_graph_by_session(driver, "s1", user_id="user_abc")
-        assert result is not None
-        assert len(result["nodes"]) == 1
-        assert result["nodes"][0]["properties"] == {"aum": "$4B"}
-        assert len(result["edges"]) == 1
-
-    def test_ownership_check_rejects_different_user(self):
+        record = {
+            "nodes": [{"id": "paradigm", "label": "Paradigm", "type": "Investor", "properties": '{"aum": "$4B"}'}],
+            "edges": [{"source": "paradigm", "target": "uniswap", "relationship": "INVESTED_IN"}],
+            "created_by": "user_abc",
+        }
+        session.run.return_value = FakeResult([record])
+
+        result = await get_graph_by_session(driver, "s1", user_id="user_abc")
+        assert session.run.await_count == 1
+        assert session.run.call_args[0][0] == GET_GRAPH_CYPHER
+        assert result == {
+            "nodes": [{"id": "paradigm", "label": "Paradigm", "type": "Investor", "properties": {"aum": "$4B"}}],
+            "edges": [{"source": "paradigm", "target": "uniswap", "relationship": "INVESTED_IN"}],
+            "created_by": "user_abc",
+        }
+
+    @pytest.mark.asyncio
+    async def test_ownership_is_checked_in_cypher(self):
         driver, session = _make_driver()
-        node_records = [
-            {"id": "paradigm", "label": "Paradigm", "type": "Investor",
-             "properties": "{}", "session_id": "s1", "created_by": "user_other"},
-        ]
-        session.run.return_value = iter(node_records)
-
-        result = get_graph_by_session(driver, "s1", user_id="user_abc")
-        assert result is None
-
-    def test_ownership_allows_anonymous_graphs(self):
+        await get_graph_by_session(driver, "s1", user_id="user_abc")
+        params = session.run.call_args[1]
+        assert params["session_id"] == "s1"
+        # Own graphs, anonymous trial graphs and legacy dev-user graphs
+        assert params["owners"] == ["user_abc", "anonymous", "dev-user"]
+        assert "n.created_by IN $owners" in GET_GRAPH_CYPHER
+
+    def test_query_returns_only_api_fields(self):
+        # Per node only the API fields; the owner once, for the read cache
+        projection = GET_GRAPH_CYPHER.split("[n IN nodes | n {")[1].split("}]")[0]
+        fields = [f.strip().lstrip(".") for f in projection.split(",")]
+        assert fields == ["id", "label", "type", "properties", *PROPERTY_KEYS]
+        assert "head(nodes).created_by AS created_by" in GET_GRAPH_CYPHER
+        assert "session_id AS" not in GET_GRAPH_CYPHER
+
+    @pytest.mark.asyncio
+    async def test_handles_missing_properties(self):
         driver, session = _make_driver()
-        node_records = [
-            {"id": "a", "label": "A", "type": "Investor",
-             "properties": "{}", "session_id": "s1", "created_by": "anonymous"},
-        ]
-        edge_records = []
-        session.run.side_effect = [iter(node_records), iter(edge_records)]
-
-        result = get_graph_by_session(driver, "s1", user_id="user_abc")
-        assert result is not None
+        record = {"nodes": [{"id": "a", "label": "A", "type": "Investor", "properties": None}], "edges": [], "created_by": "u1"}
+        session.run.return_value = FakeResult([record])
+        result = await get_graph_by_session(driver, "s1")
+        assert result["nodes"][0]["properties"] == {}
 
-    def test_ownership_allows_dev_user_legacy(self):
+    @pytest.mark.asyncio
+    async def test_reads_native_properties(self):
         driver, session = _make_driver()
-        node_records = [
-            {"id": "a", "label": "A", "type": "Investor",
-             "properties": "{}", "session_id": "s1", "created_by": "dev-user"},
-        ]
-        edge_records = []
-        session.run.side_effect = [iter(node_records), iter(edge_records)]
-
-        result = get_graph_by_session(driver, "s1", user_id="user_abc")
-        assert result is not None
-
-    def test_retries_on_session_expired(self):
-        driver = MagicMock()
-        call_count = 0
-
-        def side_effect():
-            nonlocal call_count
-            call_count += 1
-            session = MagicMock()
-            if call_count == 1:
-                session.run.side_effect = SessionExpired("session expired")
-            else:
-                session.run.return_value = iter([])
-            return session
-
-        ctx = MagicMock()
-        ctx.__enter__ = MagicMock(side_effect=lambda: side_effect())
-        ctx.__exit__ = MagicMock(return_value=False)
-        driver.session.return_value = ctx
-
-        with patch("app.graph.repository.time.sleep"):
-            result = get_graph_by_session(driver, "s1")
+        native = {key: None for key in PROPERTY_KEYS} | {"amount_usd": "$50M", "stage": "Series B"}
+        record = {"nodes": [{"id": "r", "label": "R", "type": "Round", "properties": None, **native}],
+                  "edges": [], "created_by": "u1"}
+        session.run.return_value = FakeResult([record])
+        result = await get_graph_by_session(driver, "s1")
+        assert result["nodes"][0]["properties"] == {"amount_usd": "$50M", "stage": "Series B"}
+
+    @pytest.mark.asyncio
+    async def test_retries_on_session_expired(self):
+        driver = _flaky_driver(SessionExpired("session expired"))
+        with patch("app.graph.repository.asyncio.sleep", new=AsyncMock()):
+            result = await get_graph_by_session(driver, "s1")
             assert result is None  # empty = not found
 
-    def test_no_user_id_skips_ownership_check(self):
+    @pytest.mark.asyncio
+    async def test_no_user_id_skips_ownership_check(self):
+        driver, session = _make_driver()
+        await get_graph_by_session(driver, "s1")  # no user_id
+        assert session.run.call_args[1]["owners"] is None
+
+
+class TestCanonicalEntities:
+    @pytest.mark.parametrize("name, slug", [
+        ("Paradigm", "paradigm"),
+        ("Paradigm Capital, Inc.", "paradigm-capital"),
+        ("  PARADIGM   capital LLC ", "paradigm-capital"),
+        ("Uniswap Labs", "uniswap-labs"),
+        ("Crème Fund", "creme-fund"),
+        ("Co", "co"),  # a suffix alone is still a name
+    ])
+    def test_slug(self, name, slug):
+        assert canonical_slug(name) == slug
+
+    def test_slug_none_when_nothing_left(self):
+        assert canonical_slug("—") is None
+
+    def test_off_by_default(self):
+        [node] = graph_params("s1", SAMPLE_NODES[:1], [])["nodes"]
+        assert node["canonical_slug"] is None
+
+    def test_graph_params_sets_slug_from_label(self):
+        with patch("app.graph.repository.settings.neo4j_canonical_entities", True):
+            [node] = graph_params("s1", [
+                {"id": "p1", "label": "Paradigm Capital, Inc.", "type": "Investor", "properties": {}},
+            ], [])["nodes"]
+        assert node["canonical_slug"] == "paradigm-capital"
+
+    def test_link_is_merged_in_the_persist_transaction(self):
+        assert "MERGE (c:Canonical {type: node.type, slug: node.canonical_slug})" in PERSIST_GRAPH_CYPHER
+        assert "MERGE (n)-[:INSTANCE_OF]->(c)" in PERSIST_GRAPH_CYPHER
+
+    @pytest.mark.asyncio
+    async def test_find_entity_sessions(self):
+        driver, session = _make_driver()
+        session.run.return_value = FakeResult([{"session_id": "s1"}, {"session_id": "s2"}])
+        result = await find_entity_sessions(driver, "Investor", "Paradigm Capital Inc", user_id="user_abc")
+
+        assert result == ["s1", "s2"]
+        assert session.run.call_args[0][0] == ENTITY_SESSIONS_CYPHER
+        params = session.run.call_args[1]
+        assert params["type"] == "Investor"
+        assert params["slug"] == "paradigm-capital"
+        assert params["owners"] == ["user_abc", "anonymous", "dev-user"]
+
+    @pytest.mark.asyncio
+    async def test_find_entity_sessions_without_slug_skips_query(self):
         driver, session = _make_driver()
-        node_records = [
-            {"id": "a", "label": "A", "type": "Investor",
-             "properties": "{}", "session_id": "s1", "created_by": "anyone"},
-        ]
-        edge_records = []
-        session.run.side_effect = [iter(node_records), iter(edge_records)]
-
-        result = get_graph_by_session(driver, "s1")  # no user_id
-        assert result is not None
+        assert await find_entity_sessions(driver, "Investor", "!!") == []
+        session.run.assert_not_awaited()
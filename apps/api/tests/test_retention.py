@@ -0,0 +1,112 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.graph.cache import cache_graph, get_cached_graph
+from app.graph.retention import RetentionSweeper
+from tests.conftest import FakeResult
+
+
+class FakeGraphDb:
+    """Answers the sweeper's queries from a dict of session_id -> (owner, node count)."""
+
+    def __init__(self, sessions):
+        self.sessions = dict(sessions)
+        self.deletes = []
+        self.canonical_cleanups = 0
+        self.driver = MagicMock()
+        session = MagicMock()
+        session.run = AsyncMock(side_effect=self.run)
+        self.driver.session.return_value.__aenter__ = AsyncMock(return_value=session)
+        self.driver.session.return_value.__aexit__ = AsyncMock(return_value=False)
+
+    async def run(self, query, **params):
+        if "Canonical" in query:
+            self.canonical_cleanups += 1
+            return FakeResult(nodes_deleted=1)
+        if "DETACH DELETE" in query:
+            assert "IN TRANSACTIONS OF $batch_rows ROWS" in query
+            self.deletes.append(params["session_ids"])
+            nodes = sum(self.sessions.pop(s)[1] for s in params["session_ids"])
+            return FakeResult(nodes_deleted=nodes, relationships_deleted=nodes - 1)
+        if "= 'anonymous'" in query:
+            ids = sorted(s for s, (owner, _) in self.sessions.items() if owner == "anonymous")
+        else:
+            ids = sorted(
+                s for s, (owner, _) in self.sessions.items()
+                if owner != "anonymous" and s > params["after"]
+            )
+        return FakeResult({"session_id": s} for s in ids[: params["limit"]])
+
+
+def _supabase(listed):
+    supabase = MagicMock()
+    query = supabase.table.return_value.select.return_value.in_
+    query.side_effect = lambda column, ids: MagicMock(
+        execute=MagicMock(return_value=MagicMock(data=[{"neo4j_session_id": s} for s in ids if s in listed]))
+    )
+    return supabase
+
+
+@pytest.fixture(autouse=True)
+def _no_pause():
+    with patch("app.graph.retention.asyncio.sleep", new=AsyncMock()):
+        yield
+
+
+class TestRetentionSweeper:
+    @pytest.mark.asyncio
+    async def test_deletes_expired_anonymous_sessions_in_rounds(self):
+        db = FakeGraphDb({f"anon-{i}": ("anonymous", 10) for i in range(5)} | {"user-1": ("user_abc", 10)})
+        sweeper = RetentionSweeper(db.driver, sessions_per_round=2)
+        run = await sweeper.sweep()
+
+        assert db.deletes == [["anon-0", "anon-1"], ["anon-2", "anon-3"], ["anon-4"]]
+        assert run["anonymous_sessions"] == 5
+        assert run["nodes_deleted"] == 50
+        assert "run_ms" in run
+        assert list(db.sessions) == ["user-1"]  # no Supabase — no orphan sweep
+
+    @pytest.mark.asyncio
+    async def test_deletes_only_sessions_missing_from_supabase(self):
+        db = FakeGraphDb({"a": ("user_abc", 3), "b": ("user_abc", 3), "c": ("user_xyz", 3)})
+        sweeper = RetentionSweeper(db.driver, supabase=_supabase({"a", "c"}), anonymous_days=0, sessions_per_round=2)
+        run = await sweeper.sweep()
+
+        assert db.deletes == [["b"]]
+        assert run["orphaned_sessions"] == 1
+        assert sorted(db.sessions) == ["a", "c"]
+
+    @pytest.mark.asyncio
+    async def test_supabase_failure_deletes_nothing(self):
+        db = FakeGraphDb({"a": ("user_abc", 3)})
+        supabase = MagicMock()
+        supabase.table.side_effect = ConnectionError("down")
+        sweeper = RetentionSweeper(db.driver, supabase=supabase, anonymous_days=0)
+        await sweeper.sweep()
+        assert db.deletes == []
+
+    @pytest.mark.asyncio
+    async def test_max_rounds_bounds_one_run(self):
+        db = FakeGraphDb({f"anon-{i}": ("anonymous", 1) for i in range(10)})
+        sweeper = RetentionSweeper(db.driver, sessions_per_round=2, max_rounds=2)
+        run = await sweeper.sweep()
+        assert run["anonymous_sessions"] == 4
+        assert sweeper.stats["runs"] == 1
+
+    @pytest.mark.asyncio
+    async def test_unused_canonicals_are_cleaned_up_after_deletes(self):
+        db = FakeGraphDb({"anon-1": ("anonymous", 2)})
+        run = await RetentionSweeper(db.driver).sweep()
+        assert db.canonical_cleanups == 1
+        assert run["canonicals_deleted"] == 1
+
+        idle = FakeGraphDb({})
+        await RetentionSweeper(idle.driver).sweep()
+        assert idle.canonical_cleanups == 0
+
+    @pytest.mark.asyncio
+    async def test_deleted_graphs_leave_the_read_cache(self):
+        db = FakeGraphDb({"anon-1": ("anonymous", 2)})
+        cache_graph(None, "anon-1", "anonymous", {"nodes": [], "edges": []})
+        await RetentionSweeper(db.driver).sweep()
+        assert get_cached_graph(None, "anon-1") is None
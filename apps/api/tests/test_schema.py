@@ -0,0 +1,114 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+from neo4j.exceptions import ClientError
+
+from app.graph.schema import FALLBACKS, SCHEMA, ensure_schema, missing_schema
+from tests.conftest import FakeResult
+
+
+def _make_driver(online=(), failing=()):
+    """Driver whose SHOW INDEXES lists `online` as ONLINE and whose CREATE
+    statements containing any of `failing` raise ClientError when consumed —
+    the async driver only reports them after RUN."""
+    driver = MagicMock()
+    session = MagicMock()
+
+    async def run(statement, **params):
+        if statement.startswith("SHOW INDEXES"):
+            return FakeResult({"name": name, "state": "ONLINE"} for name in online)
+        if any(f" {name} " in statement for name in failing):
+            return FakeResult(error=ClientError("constraint violated"))
+        return FakeResult([])
+
+    session.run = AsyncMock(side_effect=run)
+    driver.session.return_value.__aenter__ = AsyncMock(return_value=session)
+    driver.session.return_value.__aexit__ = AsyncMock(return_value=False)
+    return driver, session
+
+
+KEY_INDEXES = ("entity_session_key", "relates_to_session_id")
+
+
+def _all_but(*names):
+    return [name for name in SCHEMA if name not in names]
+
+
+def _statements(session):
+    return [c.args[0] for c in session.run.call_args_list]
+
+
+class TestEnsureSchema:
+    @pytest.mark.asyncio
+    async def test_creates_composite_constraint_and_relationship_index(self):
+        driver, session = _make_driver(online=SCHEMA)
+        assert await ensure_schema(driver) == []
+
+        statements = _statements(session)
+        assert all("IF NOT EXISTS" in s for s in statements[:-1])
+        assert any("REQUIRE (n.session_id, n.id) IS UNIQUE" in s for s in statements)
+        assert any("FOR ()-[r:RELATES_TO]-() ON (r.session_id)" in s for s in statements)
+        # No fallback needed
+        assert not any(FALLBACKS["entity_session_key"][0] in s for s in statements)
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_composite_index_when_constraint_fails(self):
+        fallback_name = FALLBACKS["entity_session_key"][0]
+        driver, session = _make_driver(
+            online=[name for name in SCHEMA if name != "entity_session_key"] + [fallback_name],
+            failing=["entity_session_key"],
+        )
+        assert await ensure_schema(driver) == []
+        assert any("ON (n.session_id, n.id)" in s for s in _statements(session))
+
+    @pytest.mark.asyncio
+    async def test_failed_statement_does_not_skip_the_next(self):
+        driver, session = _make_driver(online=SCHEMA, failing=["entity_session_key"])
+        await ensure_schema(driver)
+        statements = _statements(session)
+        failed = next(i for i, s in enumerate(statements) if " entity_session_key " in s)
+        assert FALLBACKS["entity_session_key"][0] in statements[failed + 1]
+        assert all(any(f" {name} " in s for s in statements) for name in SCHEMA)
+
+    @pytest.mark.asyncio
+    async def test_reports_missing_schema_without_raising(self):
+        driver, _ = _make_driver(online=_all_but(*KEY_INDEXES), failing=["relates_to_session_id"])
+        missing = await ensure_schema(driver)
+        assert set(missing) == {"entity_session_key", "relates_to_session_id"}
+
+
+class TestMissingSchema:
+    @pytest.mark.asyncio
+    async def test_populating_indexes_count_as_missing(self):
+        driver, session = _make_driver()
+        session.run.side_effect = None
+        session.run.return_value = FakeResult(
+            [{"name": name, "state": "POPULATING"} for name in SCHEMA]
+        )
+        assert await missing_schema(driver) == list(SCHEMA)
+
+
+class TestHealth:
+    def _patched_app(self, online):
+        from app.main import app
+
+        driver, _ = _make_driver(online=online)
+        driver.verify_connectivity = AsyncMock()
+        driver.close = AsyncMock()
+        return patch("app.main.AsyncGraphDatabase.driver", return_value=driver), app
+
+    def test_ok_when_schema_complete(self):
+        patcher, app = self._patched_app(online=SCHEMA)
+        with patcher, TestClient(app) as client:
+            response = client.get("/health")
+        assert response.status_code == 200
+        assert response.json() == {"status": "ok", "neo4j": "ok", "neo4j_schema": {"missing": []}}
+
+    def test_degraded_but_serving_when_schema_missing(self):
+        patcher, app = self._patched_app(online=_all_but(*KEY_INDEXES))
+        with patcher, TestClient(app) as client:
+            response = client.get("/health")
+        assert response.status_code == 200
+        body = response.json()
+        assert body["status"] == "degraded"
+        assert set(body["neo4j_schema"]["missing"]) == {"entity_session_key", "relates_to_session_id"}
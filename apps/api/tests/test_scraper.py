@@ -1,7 +1,8 @@
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
 from fastapi import HTTPException
-from app.scraper.scraper import scrape_url, _extract_text
+from app.scraper.hosts import circuit_breaker, host_limiter
+from app.scraper.scraper import scrape_url, _extract_text, ScrapeFailed, MAX_CONTENT_CHARS, MAX_RESPONSE_BYTES
 
 
 class TestExtractText:
@@ -41,56 +42,86 @@ class TestExtractText:
         result = _extract_text(html)
         assert "Paragraph content only" in result
 
+    def test_skips_headings_inside_nav(self):
+        html = "<html><body><nav><h2>Sections</h2></nav><h1>Real Title</h1><p>Body.</p></body></html>"
+        result = _extract_text(html)
+        assert "Sections" not in result
+        assert "Real Title" in result
+
+    def test_incremental_feed_matches_whole_document(self):
+        from app.scraper.scraper import _TextExtractor
+        html = (
+            "<html><body><header>Top</header><h1>Title</h1><article><p>One <b>bold</b> claim.</p>"
+            "<script>x()</script><p>Two.</p></article><footer>Bottom</footer></body></html>"
+        )
+        extractor = _TextExtractor()
+        for i in range(0, len(html), 5):
+            extractor.feed(html[i:i + 5])
+        assert extractor.close() == _extract_text(html)
+        assert _extract_text(html) == "Title One bold claim. Two."
+
     def test_caps_at_32000_chars(self):
         long_html = "<html><body>" + "<p>" + "a" * 100 + "</p>" * 400 + "</body></html>"
         result = _extract_text(long_html)
         assert isinstance(result, str)
 
 
+def _make_response(html: str, content_type: str = "text/html; charset=utf-8", chunk_size: int = 0):
+    """Builds a mock streamed httpx.Response yielding html in chunks."""
+    import httpx
+
+    body = html.encode()
+    chunk_size = chunk_size or len(body) or 1
+    mock_response = MagicMock(spec=httpx.Response)
+    mock_response.is_redirect = False
+    mock_response.headers = {"content-type": content_type}
+    mock_response.charset_encoding = "utf-8"
+    mock_response.raise_for_status.return_value = None
+    mock_response.aclose = AsyncMock()
+    mock_response.chunks_read = 0
+
+    async def aiter_bytes():
+        for i in range(0, len(body), chunk_size):
+            mock_response.chunks_read += 1
+            yield body[i:i + chunk_size]
+
+    mock_response.aiter_bytes = aiter_bytes
+    return mock_response
+
+
+def _mock_client(mock_client_cls, response=None, side_effect=None):
+    """Wires a mock httpx.AsyncClient whose send() returns response."""
+    mock_client = AsyncMock()
+    mock_client.build_request = MagicMock(side_effect=lambda method, url, **kw: MagicMock(url=url))
+    if side_effect is not None:
+        mock_client.send.side_effect = side_effect
+    else:
+        mock_client.send.return_value = response
+    mock_client.__aenter__ = AsyncMock(return_value=mock_client)
+    mock_client.__aexit__ = AsyncMock(return_value=False)
+    mock_client_cls.return_value = mock_client
+    return mock_client
+
+
 class TestScrapeUrl:
     @pytest.mark.asyncio
     @patch("app.scraper.scraper.validate_url", return_value=("https://techcrunch.com/article", "104.18.20.100"))
     async def test_returns_extracted_text(self, mock_validate):
-        import httpx
-
-        mock_response = MagicMock(spec=httpx.Response)
-        mock_response.is_redirect = False
-        mock_response.headers = {"content-type": "text/html; charset=utf-8"}
         html = "<html><body><article><p>" + "Paradigm Capital led a $50M Series B. " * 20 + "</p></article></body></html>"
-        mock_response.text = html
-        mock_response.content = html.encode()
-        mock_response.raise_for_status.return_value = None
-
         with patch("app.scraper.scraper.httpx.AsyncClient") as mock_client_cls:
-            mock_client = AsyncMock()
-            mock_client.get.return_value = mock_response
-            mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-            mock_client.__aexit__ = AsyncMock(return_value=False)
-            mock_client_cls.return_value = mock_client
+            _mock_client(mock_client_cls, _make_response(html))
 
             result = await scrape_url("https://techcrunch.com/article")
-            assert "Paradigm" in result
+            assert "Paradigm" in result.text
+            assert result.final_url == "https://techcrunch.com/article"
             mock_validate.assert_called_once_with("https://techcrunch.com/article")
 
     @pytest.mark.asyncio
     @patch("app.scraper.scraper.validate_url", return_value=("https://paywalled.com/article", "1.2.3.4"))
     async def test_rejects_low_content_page(self, mock_validate):
-        import httpx
-
-        mock_response = MagicMock(spec=httpx.Response)
-        mock_response.is_redirect = False
-        mock_response.headers = {"content-type": "text/html; charset=utf-8"}
         html = "<html><body><p>Short.</p></body></html>"
-        mock_response.text = html
-        mock_response.content = html.encode()
-        mock_response.raise_for_status.return_value = None
-
         with patch("app.scraper.scraper.httpx.AsyncClient") as mock_client_cls:
-            mock_client = AsyncMock()
-            mock_client.get.return_value = mock_response
-            mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-            mock_client.__aexit__ = AsyncMock(return_value=False)
-            mock_client_cls.return_value = mock_client
+            _mock_client(mock_client_cls, _make_response(html))
 
             with pytest.raises(HTTPException) as exc_info:
                 await scrape_url("https://paywalled.com/article")
@@ -100,27 +131,15 @@ class TestScrapeUrl:
     @pytest.mark.asyncio
     @patch("app.scraper.scraper.validate_url", return_value=("https://example.com/article", "93.184.216.34"))
     async def test_uses_follow_redirects_false(self, mock_validate):
-        import httpx
-
-        mock_response = MagicMock(spec=httpx.Response)
-        mock_response.is_redirect = False
-        mock_response.headers = {"content-type": "text/html; charset=utf-8"}
         html = "<html><body>" + "<p>Content. " * 100 + "</p></body></html>"
-        mock_response.text = html
-        mock_response.content = html.encode()
-        mock_response.raise_for_status.return_value = None
-
         with patch("app.scraper.scraper.httpx.AsyncClient") as mock_client_cls:
-            mock_client = AsyncMock()
-            mock_client.get.return_value = mock_response
-            mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-            mock_client.__aexit__ = AsyncMock(return_value=False)
-            mock_client_cls.return_value = mock_client
+            mock_client = _mock_client(mock_client_cls, _make_response(html))
 
             await scrape_url("https://example.com/article")
 
-            call_kwargs = mock_client.get.call_args[1]
+            call_kwargs = mock_client.send.call_args[1]
             assert call_kwargs.get("follow_redirects") is False
+            assert call_kwargs.get("stream") is True
 
     @pytest.mark.asyncio
     @patch("app.scraper.scraper.validate_url", return_value=("https://slow-site.com/article", "1.2.3.4"))
@@ -128,12 +147,205 @@ class TestScrapeUrl:
         import httpx
 
         with patch("app.scraper.scraper.httpx.AsyncClient") as mock_client_cls:
-            mock_client = AsyncMock()
-            mock_client.get.side_effect = httpx.TimeoutException("timed out")
-            mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-            mock_client.__aexit__ = AsyncMock(return_value=False)
-            mock_client_cls.return_value = mock_client
+            _mock_client(mock_client_cls, side_effect=httpx.TimeoutException("timed out"))
 
             with pytest.raises(HTTPException) as exc_info:
                 await scrape_url("https://slow-site.com/article")
             assert exc_info.value.status_code == 503
+
+    @pytest.mark.asyncio
+    @patch("app.scraper.scraper.validate_url", return_value=("https://huge.com/article", "1.2.3.4"))
+    async def test_stops_reading_once_budget_met(self, mock_validate):
+        html = "<html><body>" + ("<p>" + "Paradigm Capital led a $50M Series B. " * 5 + "</p>") * 2000 + "</body></html>"
+        response = _make_response(html, chunk_size=4096)
+        with patch("app.scraper.scraper.httpx.AsyncClient") as mock_client_cls:
+            _mock_client(mock_client_cls, response)
+
+            result = (await scrape_url("https://huge.com/article")).text
+
+        total_chunks = -(-len(html.encode()) // 4096)
+        assert len(result) == MAX_CONTENT_CHARS
+        assert response.chunks_read < total_chunks
+        response.aclose.assert_awaited()
+
+    @pytest.mark.asyncio
+    @patch("app.scraper.scraper.validate_url", return_value=("https://huge.com/blob", "1.2.3.4"))
+    async def test_rejects_oversized_body_without_content(self, mock_validate):
+        html = "<html><body><div>" + "x" * (MAX_RESPONSE_BYTES + 1024) + "</div></body></html>"
+        response = _make_response(html, chunk_size=1024 * 1024)
+        with patch("app.scraper.scraper.httpx.AsyncClient") as mock_client_cls:
+            _mock_client(mock_client_cls, response)
+
+            with pytest.raises(HTTPException) as exc_info:
+                await scrape_url("https://huge.com/blob")
+            assert exc_info.value.status_code == 400
+            assert "too large" in exc_info.value.detail["message"]
+
+    @pytest.mark.asyncio
+    @patch("app.scraper.scraper.validate_url", return_value=("https://example.com/notes.txt", "93.184.216.34"))
+    async def test_plain_text_passes_through(self, mock_validate):
+        text = "Paradigm Capital led a $50M Series B in Uniswap. " * 20
+        with patch("app.scraper.scraper.httpx.AsyncClient") as mock_client_cls:
+            _mock_client(mock_client_cls, _make_response(text, content_type="text/plain; charset=utf-8"))
+
+            result = await scrape_url("https://example.com/notes.txt")
+            assert result.text == text.strip()
+
+    @pytest.mark.asyncio
+    @patch("app.scraper.scraper.validate_url", return_value=("https://short.link/a", "1.2.3.4"))
+    async def test_reports_final_url_after_redirect(self, mock_validate):
+        import httpx
+
+        redirect = MagicMock(spec=httpx.Response)
+        redirect.is_redirect = True
+        redirect.headers = {"location": "/story"}
+        redirect.url = "https://short.link/a"
+        redirect.aclose = AsyncMock()
+        html = "<html><body><article>" + "Paradigm Capital led a $50M Series B. " * 20 + "</article></body></html>"
+        with patch("app.scraper.scraper.httpx.AsyncClient") as mock_client_cls:
+            _mock_client(mock_client_cls, side_effect=[redirect, _make_response(html)])
+
+            result = await scrape_url("https://short.link/a")
+
+        assert result.final_url == "https://short.link/story"
+        mock_validate.assert_called_with("https://short.link/story")
+        redirect.aclose.assert_awaited()
+
+    @pytest.mark.asyncio
+    @patch("app.scraper.scraper.validate_url", return_value=("https://www.coindesk.com/a?utm_source=x", "1.2.3.4"))
+    async def test_reports_rel_canonical(self, mock_validate):
+        html = (
+            '<html><head><link rel="canonical" href="/markets/2024/a"></head><body><article>'
+            + "Paradigm Capital led a $50M Series B. " * 20 + "</article></body></html>"
+        )
+        with patch("app.scraper.scraper.httpx.AsyncClient") as mock_client_cls:
+            _mock_client(mock_client_cls, _make_response(html))
+            result = await scrape_url("https://www.coindesk.com/a?utm_source=x")
+        assert result.canonical_url == "https://www.coindesk.com/markets/2024/a"
+
+    @pytest.mark.asyncio
+    @patch("app.scraper.scraper.validate_url", return_value=("https://gone.com/a", "1.2.3.4"))
+    async def test_4xx_raises_scrape_failed(self, mock_validate):
+        import httpx
+
+        response = _make_response("")
+        response.raise_for_status.side_effect = httpx.HTTPStatusError(
+            "404", request=MagicMock(), response=MagicMock(status_code=404),
+        )
+        with patch("app.scraper.scraper.httpx.AsyncClient") as mock_client_cls:
+            _mock_client(mock_client_cls, response)
+            with pytest.raises(ScrapeFailed) as exc_info:
+                await scrape_url("https://gone.com/a")
+        assert exc_info.value.detail["error"] == "scrape_failed"
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("status", [408, 429])
+    @patch("app.scraper.scraper.validate_url", return_value=("https://busy.com/a", "1.2.3.4"))
+    async def test_throttling_is_transient(self, mock_validate, status):
+        import httpx
+
+        response = _make_response("")
+        response.raise_for_status.side_effect = httpx.HTTPStatusError(
+            str(status), request=MagicMock(), response=MagicMock(status_code=status),
+        )
+        with patch("app.scraper.scraper.httpx.AsyncClient") as mock_client_cls:
+            _mock_client(mock_client_cls, response)
+            with pytest.raises(HTTPException) as exc_info:
+                await scrape_url("https://busy.com/a")
+        assert not isinstance(exc_info.value, ScrapeFailed)  # not negative-cached
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.detail["error"] == "service_unavailable"
+
+    @pytest.mark.asyncio
+    @patch("app.scraper.scraper.validate_url", return_value=("https://slow-site.com/article", "1.2.3.4"))
+    async def test_breaker_fails_fast_after_repeated_timeouts(self, mock_validate):
+        import httpx
+
+        with patch("app.scraper.scraper.httpx.AsyncClient") as mock_client_cls:
+            mock_client = _mock_client(mock_client_cls, side_effect=httpx.TimeoutException("timed out"))
+            for _ in range(circuit_breaker.threshold):
+                with pytest.raises(HTTPException):
+                    await scrape_url("https://slow-site.com/article")
+            sends = mock_client.send.call_count
+
+            with pytest.raises(HTTPException) as exc_info:
+                await scrape_url("https://slow-site.com/other")
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.detail["error"] == "service_unavailable"
+        assert mock_client.send.call_count == sends
+
+    @pytest.mark.asyncio
+    @patch("app.scraper.scraper.validate_url", return_value=("https://slow-site.com/article", "1.2.3.4"))
+    async def test_cancelled_probe_does_not_block_the_host(self, mock_validate):
+        import asyncio
+
+        with patch.object(circuit_breaker, "threshold", 1), patch.object(circuit_breaker, "cooldown", 0):
+            circuit_breaker.record_failure("slow-site.com")
+            with patch("app.scraper.scraper.host_limiter.acquire", new=AsyncMock(side_effect=asyncio.CancelledError)):
+                with pytest.raises(asyncio.CancelledError):
+                    await scrape_url("https://slow-site.com/article")
+            assert circuit_breaker.check("slow-site.com") is True  # a new trial, not a fast failure
+
+    @pytest.mark.asyncio
+    @patch("app.scraper.scraper.validate_url", return_value=("https://short.link/a", "1.2.3.4"))
+    async def test_host_slot_follows_redirect_and_is_released(self, mock_validate):
+        import httpx
+
+        redirect = MagicMock(spec=httpx.Response)
+        redirect.is_redirect = True
+        redirect.headers = {"location": "https://news.com/story"}
+        redirect.url = "https://short.link/a"
+        redirect.aclose = AsyncMock()
+        html = "<html><body><article>" + "Paradigm Capital led a $50M Series B. " * 20 + "</article></body></html>"
+        with patch("app.scraper.scraper.httpx.AsyncClient") as mock_client_cls:
+            _mock_client(mock_client_cls, side_effect=[redirect, _make_response(html)])
+            await scrape_url("https://short.link/a")
+
+        stats = host_limiter.stats()
+        assert stats["short.link"]["acquired"] == 1
+        assert stats["news.com"]["acquired"] == 1
+        assert host_limiter._slots == {}
+
+    @pytest.mark.asyncio
+    @patch("app.scraper.scraper.validate_url", return_value=("https://news.com/a", "1.2.3.4"))
+    async def test_conditional_request_304_skips_body(self, mock_validate):
+        response = _make_response("")
+        response.status_code = 304
+        response.headers = {"etag": '"v2"'}
+        with patch("app.scraper.scraper.httpx.AsyncClient") as mock_client_cls:
+            mock_client = _mock_client(mock_client_cls, response)
+            page = await scrape_url("https://news.com/a", etag='"v1"', last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+
+        headers = mock_client.build_request.call_args[1]["headers"]
+        assert headers["If-None-Match"] == '"v1"'
+        assert headers["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+        assert page.not_modified
+        assert page.etag == '"v2"'
+        assert page.last_modified == "Mon, 01 Jan 2024 00:00:00 GMT"
+        assert response.chunks_read == 0
+        response.aclose.assert_awaited()
+
+    @pytest.mark.asyncio
+    @patch("app.scraper.scraper.validate_url", return_value=("https://news.com/a", "1.2.3.4"))
+    async def test_reports_validators(self, mock_validate):
+        html = "<html><body><article>" + "Paradigm Capital led a $50M Series B. " * 20 + "</article></body></html>"
+        response = _make_response(html)
+        response.headers = {"content-type": "text/html", "etag": '"v1"', "last-modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+        with patch("app.scraper.scraper.httpx.AsyncClient") as mock_client_cls:
+            mock_client = _mock_client(mock_client_cls, response)
+            page = await scrape_url("https://news.com/a")
+
+        assert "If-None-Match" not in mock_client.build_request.call_args[1]["headers"]
+        assert (page.etag, page.last_modified) == ('"v1"', "Mon, 01 Jan 2024 00:00:00 GMT")
+        assert not page.not_modified
+
+    @pytest.mark.asyncio
+    @patch("app.scraper.scraper.validate_url", return_value=("https://news.com/a", "1.2.3.4"))
+    async def test_successful_page_feeds_boilerplate_model(self, mock_validate):
+        from app.scraper.boilerplate import boilerplate_model
+
+        html = "<html><body><article><p>" + "Paradigm Capital led a $50M Series B. " * 20 + "</p></article></body></html>"
+        with patch("app.scraper.scraper.httpx.AsyncClient") as mock_client_cls:
+            _mock_client(mock_client_cls, _make_response(html))
+            await scrape_url("https://news.com/a")
+        assert boilerplate_model.stats()["news.com"]["pages"] == 1